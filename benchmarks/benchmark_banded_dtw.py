@@ -0,0 +1,86 @@
+"""
+Compares the clustering with the Sakoe-Chiba band and LB_Keogh pruning
+with the unconstrained DTW of tslearn on the growth rate of the US test
+dataset and of the global dataset, if it exists. Prints the time of the
+fits, how many DTW distances were skipped and how many time series are in
+the same cluster with both.
+Run from the main folder of the repository with:
+python -m benchmarks.benchmark_banded_dtw
+"""
+import os
+import time
+
+from src.model.seaweed_model import SeaweedModel
+from src.processing.clustering import (
+    fit_time_series_kmeans,
+    label_agreement,
+    scale_time_series,
+)
+
+DATASETS = {
+    "US": "data/interim_data/150tg/data_gridded_all_parameters_US.pkl",
+    "global": "data/interim_data/150tg/data_gridded_all_parameters_global.pkl",
+}
+N_CLUSTERS = 4
+RADII = [3, 6, 12, 24]
+
+
+def create_growth_df(file):
+    """
+    Runs the model for a gridded dataset
+    Arguments:
+        file: the path of the gridded data
+    Returns:
+        the growth rate with one time series per row
+    """
+    model = SeaweedModel()
+    model.add_data_by_grid(file)
+    model.calculate_factors()
+    model.calculate_growth_rate()
+    return model.construct_df_for_parameter("seaweed_growth_rate").transpose()
+
+
+def main():
+    """
+    Clusters every dataset without a band and with several band radii
+    Arguments:
+        None
+    Returns:
+        None
+    """
+    for global_or_US, file in DATASETS.items():
+        if not os.path.exists(file):
+            print("{}: {} does not exist, skipped".format(global_or_US, file))
+            continue
+        timeseries_ds, _ = scale_time_series(create_growth_df(file))
+        print("{}: {} time series".format(global_or_US, len(timeseries_ds)))
+        cores = None if global_or_US == "US" else -1
+        start = time.perf_counter()
+        reference_labels, km = fit_time_series_kmeans(
+            timeseries_ds, N_CLUSTERS, cores, random_state=42
+        )
+        print(
+            "unconstrained: {:.1f} s, inertia {:.4f}".format(
+                time.perf_counter() - start, km.inertia_
+            )
+        )
+        for radius in RADII:
+            start = time.perf_counter()
+            labels, km = fit_time_series_kmeans(
+                timeseries_ds, N_CLUSTERS, random_state=42, sakoe_chiba_radius=radius
+            )
+            n_distances = km.n_dtw_computed_ + km.n_dtw_pruned_
+            print(
+                "radius {}: {:.1f} s, inertia {:.4f}, {:.0%} of the DTW distances "
+                "skipped, {:.1%} of the labels agree".format(
+                    radius,
+                    time.perf_counter() - start,
+                    km.inertia_,
+                    km.n_dtw_pruned_ / n_distances,
+                    label_agreement(labels, reference_labels),
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmarks drawing the countries on the US and the global map from the
+shapefile and from the clipped countries in the cache, and checks that
+the maps are the same. The maps are written to a temporary folder.
+Run from the main folder of the repository with:
+python -m benchmarks.benchmark_basemap
+"""
+import os
+import tempfile
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import geopandas as gpd  # noqa: E402
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+
+from src.plotting import basemap  # noqa: E402
+from src.plotting.raster import EXTENTS  # noqa: E402
+
+REPEATS = 5
+
+
+def draw_map(draw_countries, extent, file):
+    """
+    Draws the countries on top of a random raster, like the maps of plotter_grid
+    Arguments:
+        draw_countries: a function that draws the countries on the axes
+        extent: the extent of the map as (west, east, south, north)
+        file: the path of the png file
+    Returns:
+        None
+    """
+    fig, ax = plt.subplots()
+    image = np.random.default_rng(0).random((100, 100))
+    ax.imshow(image, extent=extent, origin="lower", interpolation="nearest")
+    draw_countries(ax)
+    west, east, south, north = extent
+    ax.set_xlim(west, east)
+    ax.set_ylim(south, north)
+    plt.savefig(file, dpi=350, bbox_inches="tight")
+    plt.close(fig)
+
+
+def main():
+    """
+    Times reading and drawing the countries for both extents
+    Arguments:
+        None
+    Returns:
+        None
+    """
+    with tempfile.TemporaryDirectory() as path:
+        for global_or_US, extent in EXTENTS.items():
+            start = time.perf_counter()
+            for _ in range(REPEATS):
+                countries = gpd.read_file(basemap.COUNTRIES_FILE)
+            read_seconds = (time.perf_counter() - start) / REPEATS
+            # Create the cache once, then time reading it like a new process does
+            basemap.read_basemap(extent)
+            start = time.perf_counter()
+            for _ in range(REPEATS):
+                basemap.read_basemap.cache_clear()
+                basemap.read_basemap(extent)
+            cache_seconds = (time.perf_counter() - start) / REPEATS
+            files = {}
+            seconds = {}
+            for name, draw_countries in [
+                (
+                    "shapefile",
+                    lambda ax: countries.plot(
+                        ax=ax, color="lightgrey", edgecolor="black", linewidth=0.2
+                    ),
+                ),
+                ("cache", lambda ax: basemap.draw_basemap(ax, extent)),
+            ]:
+                files[name] = os.path.join(path, name + "_" + global_or_US + ".png")
+                start = time.perf_counter()
+                draw_map(draw_countries, extent, files[name])
+                seconds[name] = time.perf_counter() - start
+            print(
+                "{}: reading the shapefile {:.3f} s, the cache {:.3f} s, "
+                "map with all countries {:.2f} s, with the clipped {:.2f} s".format(
+                    global_or_US,
+                    read_seconds,
+                    cache_seconds,
+                    seconds["shapefile"],
+                    seconds["cache"],
+                )
+            )
+            assert np.array_equal(
+                plt.imread(files["shapefile"]), plt.imread(files["cache"])
+            ), "the maps differ"
+
+
+if __name__ == "__main__":
+    main()
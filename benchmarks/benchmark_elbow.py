@@ -0,0 +1,59 @@
+"""
+Benchmarks the elbow sweep on the growth rate of the US test dataset.
+The previous implementation scaled the data again for every number of
+clusters and fitted them one after another.
+Run from the main folder of the repository with:
+python -m benchmarks.benchmark_elbow
+"""
+import os
+import time
+
+from src.model.seaweed_model import SeaweedModel
+from src.processing.clustering import elbow_sweep, time_series_analysis
+
+CLUSTER_NUMBERS = range(2, 7)
+
+
+def create_growth_df():
+    """
+    Runs the model for the US test dataset
+    Arguments:
+        None
+    Returns:
+        the growth rate with one time series per row
+    """
+    model = SeaweedModel()
+    model.add_data_by_grid("data/interim_data/150tg/data_gridded_all_parameters_US.pkl")
+    model.calculate_factors()
+    model.calculate_growth_rate()
+    return model.construct_df_for_parameter("seaweed_growth_rate").transpose()
+
+
+def main():
+    """
+    Times the sweep over the numbers of clusters one after another as before,
+    with the shared scaled data and with all cores
+    Arguments:
+        None
+    Returns:
+        None
+    """
+    growth_df = create_growth_df()
+    print("{} time series, {} months".format(*growth_df.shape))
+    start = time.perf_counter()
+    for n_clusters in CLUSTER_NUMBERS:
+        time_series_analysis(growth_df, n_clusters, "US", random_state=42)
+    print("one after another: {:.1f} s".format(time.perf_counter() - start))
+    for n_jobs in sorted({1, os.cpu_count()}):
+        start = time.perf_counter()
+        sweep_df = elbow_sweep(growth_df, CLUSTER_NUMBERS, "US", n_jobs=n_jobs)
+        print(
+            "sweep with {} workers: {:.1f} s".format(
+                n_jobs, time.perf_counter() - start
+            )
+        )
+    print(sweep_df)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmarks how long importing the modules of src.model and src.processing
+takes in a new Python process, as every worker process pays this again.
+numpy and pandas are needed by all modules, so only the time on top of
+importing them is compared to the budget. Exits with an error if a module
+takes longer than its budget or loads one of the heavy dependencies.
+Run from the main folder of the repository with:
+python -m benchmarks.benchmark_import_time
+"""
+import subprocess
+import sys
+
+# The modules and the time in seconds their import may take on top of numpy and pandas
+BUDGETS = {
+    "src.model.parallel": 0.1,
+    "src.model.seaweed_growth": 0.1,
+    "src.model.ocean_section": 0.1,
+    "src.model.ocean_grid": 0.1,
+    "src.model.seaweed_model": 0.2,
+    "src.processing.dtw": 0.1,
+    "src.processing.read_files": 0.1,
+    "src.processing.preprocessing": 0.2,
+    "src.processing.scenario_store": 0.2,
+    "src.processing.sensitivity": 0.2,
+    "src.processing.postprocessing": 0.3,
+    # Clusters with tslearn, so it is the one module that has to load it
+    "src.processing.clustering": 3.0,
+}
+# Dependencies that take long to import and are only loaded when needed
+HEAVY_MODULES = [
+    "geopandas",
+    "matplotlib",
+    "numba",
+    "scipy.stats",
+    "shapely",
+    "sklearn",
+    "statsmodels",
+    "tslearn",
+    "xarray",
+]
+BASELINE = "numpy, pandas"
+REPEATS = 5
+
+
+def import_seconds(module):
+    """
+    Imports a module in a new Python process
+    Arguments:
+        module: the name of the module
+    Returns:
+        the time of importing numpy and pandas, the time the module took on
+        top of them in seconds and the heavy modules it loaded
+    """
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import {}\n"
+        "middle = time.perf_counter()\n"
+        "import {}\n"
+        "print(middle - start, time.perf_counter() - middle)\n"
+        "print(' '.join(m for m in {} if m in sys.modules))\n"
+    ).format(BASELINE, module, HEAVY_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    seconds, loaded = result.stdout.split("\n")[:2]
+    baseline, extra = map(float, seconds.split())
+    return baseline, extra, loaded.split()
+
+
+def main():
+    """
+    Times the imports and compares them to the budgets. Every import is
+    repeated and the fastest is used, as the first ones also read the files
+    from disk
+    Arguments:
+        None
+    Returns:
+        None, but exits with an error if a budget is exceeded
+    """
+    failures = []
+    for module, budget in BUDGETS.items():
+        runs = [import_seconds(module) for _ in range(REPEATS)]
+        baseline = min(run[0] for run in runs)
+        extra = min(run[1] for run in runs)
+        loaded = runs[0][2]
+        print(
+            "{}: {:.3f} s + {:.3f} s for {} (budget {:.1f} s){}".format(
+                module,
+                extra,
+                baseline,
+                BASELINE,
+                budget,
+                ", loads " + ", ".join(loaded) if loaded else "",
+            )
+        )
+        if extra > budget:
+            failures.append("{} takes {:.3f} s".format(module, extra))
+        if loaded and module != "src.processing.clustering":
+            failures.append("{} loads {}".format(module, ", ".join(loaded)))
+    if failures:
+        sys.exit("Over the import budget: " + "; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmarks the calculation of the factors of the grid with different numbers
+of worker processes. The US test dataset is repeated to get closer to the
+size of the global grid.
+Run from the main folder of the repository with:
+python -m benchmarks.benchmark_parallel_model
+"""
+import os
+import time
+
+import numpy as np
+
+from src.model.ocean_grid import ENVIRONMENT_NAMES, OceanGrid
+from src.processing.read_files import DataGrid
+
+# How often the cells and months of the US dataset are repeated
+CELL_REPEATS = 10
+MONTH_REPEATS = 6
+
+
+def create_benchmark_grid():
+    """
+    Creates a grid of the size of the global grid from the US test dataset
+    Arguments:
+        None
+    Returns:
+        an OceanGrid
+    """
+    data_grid = DataGrid("data/interim_data/150tg/data_gridded_all_parameters_US.pkl")
+    lat_lons, data = data_grid.provide_data_array(ENVIRONMENT_NAMES)
+    data = np.tile(data, (CELL_REPEATS, MONTH_REPEATS, 1))
+    # The cells only need different names, not real coordinates
+    lat_lons = np.tile(lat_lons, (CELL_REPEATS, 1))
+    lat_lons[:, 0] += np.repeat(
+        np.arange(CELL_REPEATS) * 1000, len(data_grid.grid_dict)
+    )
+    return OceanGrid(lat_lons, data)
+
+
+def main():
+    """
+    Times the calculation of the factors with 1, 2, 4 and all cores,
+    makes sure they give the same result and prints the speedup
+    Arguments:
+        None
+    Returns:
+        None
+    """
+    grid = create_benchmark_grid()
+    print("{} cells, {} months".format(*grid.data.shape[:2]))
+    reference = None
+    timings = {}
+    for n_jobs in sorted({1, 2, 4, os.cpu_count()}):
+        start = time.perf_counter()
+        grid.calculate_factors(n_jobs=n_jobs)
+        timings[n_jobs] = time.perf_counter() - start
+        if reference is None:
+            reference = grid.factors.copy()
+        np.testing.assert_array_equal(grid.factors, reference)
+        print(
+            "{} workers: {:.2f} s, speedup {:.1f}x".format(
+                n_jobs, timings[n_jobs], timings[1] / timings[n_jobs]
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
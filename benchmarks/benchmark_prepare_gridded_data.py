@@ -0,0 +1,102 @@
+"""
+Benchmarks the reshaping of the gridded data in preprocessing against
+the previous implementation, which grouped every parameter by latitude
+and longitude and built the dataframe of each grid cell one by one.
+Run from the main folder of the repository with:
+python -m benchmarks.benchmark_prepare_gridded_data
+"""
+import os
+import time
+
+import pandas as pd
+
+from src.processing.preprocessing import (
+    ENV_PARAMS,
+    create_gridded_data_dict,
+    read_gridded_data,
+)
+
+
+def create_gridded_data_dict_groupby(path, folder, scenario, file_ending):
+    """
+    The previous implementation of prepare_gridded_data, without saving
+    the result. Only used as a reference for the benchmark
+    """
+    dict_env_dfs = {}
+    for science_name in ENV_PARAMS.keys():
+        full_path = (
+            path + os.sep + "data" + os.sep + folder + os.sep + scenario + os.sep
+        )
+        env_df = pd.read_pickle(
+            full_path + "nw_" + science_name + "_" + file_ending + ".pkl"
+        )
+        env_df.reset_index(inplace=True)
+        env_df.columns = ["time", "TLONG", "TLAT", ENV_PARAMS[science_name]]
+        dict_env_dfs[science_name] = env_df
+    dict_env_dfs_grouped = {
+        env_param: dict_env_dfs[env_param].groupby(["TLAT", "TLONG"])
+        for env_param in ENV_PARAMS.keys()
+    }
+    data_dict = {}
+    for lat_lon in dict_env_dfs_grouped["NO3"].groups.keys():
+        list_env_param_latlon_df = []
+        for env_param in ENV_PARAMS.keys():
+            env_param_latlon_df = dict_env_dfs_grouped[env_param].get_group(lat_lon)
+            env_param_latlon_df = env_param_latlon_df.set_index("time")
+            if env_param in ["NO3", "NH4", "PO4"]:
+                column = ENV_PARAMS[env_param]
+                env_param_latlon_df.loc[env_param_latlon_df[column] < 0, column] = 0
+            list_env_param_latlon_df.append(pd.DataFrame(env_param_latlon_df))
+        concat_latlon_dfs = pd.concat(list_env_param_latlon_df, axis=1)
+        concat_latlon_dfs = concat_latlon_dfs.loc[
+            :, ~concat_latlon_dfs.columns.duplicated()
+        ].copy()
+        concat_latlon_dfs["months_since_war"] = list(
+            range(-4, concat_latlon_dfs.shape[0] - 4, 1)
+        )
+        data_dict[lat_lon] = concat_latlon_dfs
+    return data_dict
+
+
+def create_gridded_data_dict_vectorized(path, folder, scenario, file_ending):
+    """
+    The current implementation of prepare_gridded_data, without saving the result
+    """
+    return create_gridded_data_dict(
+        *read_gridded_data(path, folder, scenario, file_ending)
+    )
+
+
+def main():
+    """
+    Times both implementations on the US test dataset, makes sure
+    they give the same result and prints the speedup
+    Arguments:
+        None
+    Returns:
+        None
+    """
+    arguments = (".", "gridded_data_test_dataset_US_only", "150tg", "36_months_150tg")
+    timings = {}
+    results = {}
+    for name, function in [
+        ("groupby", create_gridded_data_dict_groupby),
+        ("vectorized", create_gridded_data_dict_vectorized),
+    ]:
+        start = time.perf_counter()
+        results[name] = function(*arguments)
+        timings[name] = time.perf_counter() - start
+        print("{}: {:.2f} s".format(name, timings[name]))
+    # Make sure both give the same result
+    assert list(results["groupby"].keys()) == list(results["vectorized"].keys())
+    for lat_lon, cell_df in results["groupby"].items():
+        pd.testing.assert_frame_equal(cell_df, results["vectorized"][lat_lon])
+    print(
+        "Speedup for {} grid cells: {:.1f}x".format(
+            len(results["groupby"]), timings["groupby"] / timings["vectorized"]
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Benchmarks the maps of the clusters and the yearly growth rate. The previous
+implementation made a shapely Point of every cell, reprojected them and drew
+them with GeoDataFrame.plot. The raster finds the cell of every pixel once
+and draws every map as one image. The US test dataset and random data on a
+global grid of 1 degree are used. The maps are written to a temporary folder.
+Run from the main folder of the repository with:
+python -m benchmarks.benchmark_raster_maps
+"""
+import os
+import tempfile
+import time
+
+import geopandas as gpd
+import matplotlib
+import numpy as np
+import pandas as pd
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+
+from src.plotting.plotter_grid import (  # noqa: E402
+    cluster_spatial,
+    growth_rate_spatial_by_year,
+)
+from src.plotting.raster import cell_raster  # noqa: E402
+from src.utilities import prepare_geometry  # noqa: E402
+
+OPTIMAL_GROWTH_RATE = 30
+SCENARIO = "benchmark"
+
+
+def growth_rate_points_by_year(growth_df, global_or_US, scenario, optimal_growth_rate):
+    """
+    The previous implementation of growth_rate_spatial_by_year
+    Arguments:
+        growth_df: a dataframe of the growth rate with a geometry column
+        global_or_US: a string of either "global" or "US" that indicates the scale
+        scenario: the scenario to plot
+        optimal_growth_rate: the maximum growth rate [% per day]
+    Returns:
+        None, but saves the plots
+    """
+    global_map = gpd.read_file(
+        "data/geospatial_information/Countries/ne_50m_admin_0_countries.shp"
+    )
+    # Without the columns prepare_geometry added
+    n_columns = len(growth_df.columns) - 4
+    for year, i in enumerate(np.arange(-4, n_columns - 10, 12)):
+        growth_df_year = growth_df.loc[:, i + 1 : i + 12]
+        growth_df_year = growth_df_year.mean(axis=1).to_frame()
+        growth_df_year.columns = ["growth_rate"]
+        growth_df_year["growth_rate"] = (
+            growth_df_year["growth_rate"] * optimal_growth_rate
+        )
+        growth_df_year["geometry"] = growth_df["geometry"]
+        growth_df_year = gpd.GeoDataFrame(growth_df_year)
+        growth_df_year.set_crs(epsg=4326, inplace=True)
+        growth_df_year.to_crs(global_map.crs, inplace=True)
+        ax = growth_df_year.plot(
+            column="growth_rate",
+            legend=True,
+            cmap="viridis",
+            vmin=0,
+            vmax=optimal_growth_rate,
+            legend_kwds={
+                "label": "Mean Daily Growth Rate [%]",
+                "orientation": "vertical",
+            },
+        )
+        global_map.plot(ax=ax, color="lightgrey", edgecolor="black", linewidth=0.2)
+        ax.set_title("Year " + str(year + 1))
+        plt.savefig(
+            os.path.join(
+                "results",
+                "grid",
+                scenario,
+                "points_year_{}_{}.png".format(year + 1, global_or_US),
+            ),
+            dpi=350,
+            bbox_inches="tight",
+        )
+        plt.close()
+
+
+def create_global_df():
+    """
+    Creates random growth rates on a global grid of 1 degree over 123 months
+    Arguments:
+        None
+    Returns:
+        a dataframe with the (lat, lon) of the cells as index
+    """
+    lats, lons = np.meshgrid(np.arange(-74.5, 85), np.arange(0.5, 360))
+    index = pd.MultiIndex.from_arrays([lats.ravel(), lons.ravel()])
+    rng = np.random.default_rng(1)
+    growth_df = pd.DataFrame(
+        rng.random((len(index), 123)), index=index, columns=range(-3, 120)
+    )
+    growth_df["cluster"] = rng.integers(1, 4, len(index))
+    return growth_df
+
+
+def main():
+    """
+    Times the previous and the raster maps of both datasets
+    Arguments:
+        None
+    Returns:
+        None
+    """
+    datasets = {
+        "US": pd.read_pickle(
+            "data/interim_data/150tg/seaweed_growth_rate_clustered_US.pkl"
+        ),
+        "global": create_global_df(),
+    }
+    data_path = os.path.abspath("data")
+    with tempfile.TemporaryDirectory() as path:
+        os.chdir(path)
+        os.symlink(data_path, "data")
+        os.makedirs(os.path.join("results", "grid", SCENARIO))
+        for global_or_US, growth_df in datasets.items():
+            n_years = len(np.arange(-4, len(growth_df.columns) - 10, 12))
+            start = time.perf_counter()
+            points_df = prepare_geometry(growth_df.copy())
+            growth_rate_points_by_year(
+                points_df, global_or_US, SCENARIO, OPTIMAL_GROWTH_RATE
+            )
+            points_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            raster = cell_raster(growth_df, global_or_US)
+            raster_seconds = time.perf_counter() - start
+            growth_rate_spatial_by_year(
+                growth_df, global_or_US, SCENARIO, OPTIMAL_GROWTH_RATE, raster
+            )
+            cluster_spatial(growth_df, global_or_US, SCENARIO, raster)
+            print(
+                "{}: {} cells, {} yearly maps: points {:.1f} s, raster {:.1f} s "
+                "including the cluster map and {:.1f} s to find the pixels".format(
+                    global_or_US,
+                    len(growth_df),
+                    n_years,
+                    points_seconds,
+                    time.perf_counter() - start,
+                    raster_seconds,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmarks drawing the 66 LME figures and the yearly growth rate maps of the
+US test dataset one after another and in worker processes, and checks that
+the files are the same. The figures are written to a temporary folder.
+Run from the main folder of the repository with:
+python -m benchmarks.benchmark_render
+"""
+import os
+import tempfile
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import pandas as pd  # noqa: E402
+
+from src.plotting import plotter_grid, plotter_lme  # noqa: E402
+
+OPTIMAL_GROWTH_RATE = 30
+SCENARIO = "benchmark"
+
+
+def read_files(folder):
+    """
+    Reads all files of a folder
+    Arguments:
+        folder: the folder
+    Returns:
+        a dictionary with the file names as keys and their content as values
+    """
+    return {
+        file: open(os.path.join(folder, file), "rb").read()
+        for file in os.listdir(folder)
+    }
+
+
+def main():
+    """
+    Times the figures with one worker and with all cores
+    Arguments:
+        None
+    Returns:
+        None
+    """
+    growth_df = pd.read_pickle(
+        "data/interim_data/150tg/seaweed_growth_rate_clustered_US.pkl"
+    )
+    data_path = os.path.abspath("data")
+    results = {}
+    with tempfile.TemporaryDirectory() as path:
+        os.chdir(path)
+        os.symlink(data_path, "data")
+        for n_jobs in sorted({1, os.cpu_count()}):
+            os.makedirs(os.path.join(str(n_jobs), "results", "lme"))
+            os.makedirs(os.path.join(str(n_jobs), "results", "grid", SCENARIO))
+            os.symlink(data_path, os.path.join(str(n_jobs), "data"))
+            os.chdir(str(n_jobs))
+            start = time.perf_counter()
+            plotter_lme.main(n_jobs=n_jobs)
+            lme_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            plotter_grid.growth_rate_spatial_by_year(
+                growth_df, "US", SCENARIO, OPTIMAL_GROWTH_RATE, n_jobs=n_jobs
+            )
+            print(
+                "{} workers: LME figures {:.1f} s, yearly maps {:.1f} s".format(
+                    n_jobs, lme_seconds, time.perf_counter() - start
+                )
+            )
+            results[n_jobs] = [
+                read_files(os.path.join("results", "lme")),
+                read_files(os.path.join("results", "grid", SCENARIO)),
+            ]
+            os.chdir(path)
+    assert all(result == results[1] for result in results.values())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Benchmarks fitting the clusters on a sample of the cells and assigning all
+cells afterwards against fitting them on all cells, on the growth rate of
+the US test dataset. Prints the time of the fits and how many cells are in
+the same cluster with both.
+Run from the main folder of the repository with:
+python -m benchmarks.benchmark_sample_then_assign
+"""
+import time
+
+from benchmarks.benchmark_elbow import create_growth_df
+from src.processing.clustering import label_agreement, time_series_analysis
+
+N_CLUSTERS = 4
+SAMPLE_SIZES = [250, 500, 1000]
+
+
+def main():
+    """
+    Clusters all cells and samples of several sizes
+    Arguments:
+        None
+    Returns:
+        None
+    """
+    growth_df = create_growth_df()
+    print("{} time series".format(len(growth_df)))
+    start = time.perf_counter()
+    labels, _ = time_series_analysis(growth_df, N_CLUSTERS, "US", random_state=42)
+    print("all cells: {:.1f} s".format(time.perf_counter() - start))
+    for sample_size in SAMPLE_SIZES:
+        start = time.perf_counter()
+        sample_labels, _ = time_series_analysis(
+            growth_df, N_CLUSTERS, "US", random_state=42, sample_size=sample_size
+        )
+        print(
+            "sample of {}: {:.1f} s, {:.1%} of the labels agree".format(
+                sample_size,
+                time.perf_counter() - start,
+                label_agreement(sample_labels, labels),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
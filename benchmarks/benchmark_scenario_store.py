@@ -0,0 +1,158 @@
+"""
+Benchmarks the comparison of the nuclear war scenarios. The previous
+implementation read the results of one scenario after another, merged them
+with the area table on the rounded coordinates and then calculated the
+weighted median. The store keeps all scenarios in one array and can also
+be saved as memory-mapped arrays with cache=True. Random data of the size of the global results
+is written to a temporary folder, so no result files are needed.
+Run from the main folder of the repository with:
+python -m benchmarks.benchmark_scenario_store
+"""
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.processing.scenario_store import SCENARIOS, read_scenario_store
+from src.utilities import weighted_quantiles
+
+N_CELLS = 40_000
+N_MONTHS = 123
+
+
+def write_results(path, scenarios):
+    """
+    Writes random results in the same format as postprocessing.grid
+    Arguments:
+        path: the folder of the interim data
+        scenarios: the names of the scenarios
+    Returns:
+        the area table of the cells
+    """
+    rng = np.random.default_rng(1)
+    lats = np.round(rng.uniform(-80, 80, N_CELLS), 6)
+    lons = np.round(rng.uniform(0, 360, N_CELLS), 6)
+    index = pd.MultiIndex.from_arrays([lats, lons])
+    for scenario in scenarios:
+        os.makedirs(os.path.join(path, scenario))
+        pd.DataFrame(
+            rng.random((N_CELLS, N_MONTHS)),
+            index=index,
+            columns=range(-3, N_MONTHS - 3),
+        ).to_pickle(os.path.join(path, scenario, "seaweed_growth_rate_global.pkl"))
+    return pd.DataFrame(
+        {
+            "TLONG": lons,
+            "TLAT": lats,
+            "TAREA": rng.uniform(1, 2, N_CELLS),
+            "cell_id": np.arange(N_CELLS),
+        }
+    ).set_index(["TLONG", "TLAT"])
+
+
+def medians_one_after_another(path, scenarios, areas):
+    """
+    The previous implementation of the comparison of the scenarios
+    Arguments:
+        path: the folder of the interim data
+        scenarios: the names of the scenarios
+        areas: the area table
+    Returns:
+        an array of the shape (scenarios, 1, months)
+    """
+    medians = []
+    for scenario in scenarios:
+        growth_df = pd.read_pickle(
+            os.path.join(path, scenario, "seaweed_growth_rate_global.pkl")
+        )
+        areas_reset = areas.reset_index()
+        growth_df = growth_df.reset_index()
+        growth_df = growth_df[growth_df["level_0"] > -45]
+        growth_df = growth_df[growth_df["level_0"] < 45]
+        growth_df["level_0"] = growth_df["level_0"].round(4)
+        growth_df["level_1"] = growth_df["level_1"].round(4)
+        areas_reset["TLAT"] = areas_reset["TLAT"].round(4)
+        areas_reset["TLONG"] = areas_reset["TLONG"].round(4)
+        growth_df = pd.merge(
+            growth_df,
+            areas_reset,
+            left_on=["level_0", "level_1"],
+            right_on=["TLAT", "TLONG"],
+        )
+        weights = growth_df["TAREA"]
+        growth_df = growth_df.drop(
+            columns=["TLAT", "TLONG", "level_0", "level_1", "TAREA", "cell_id"]
+        )
+        medians.append(weighted_quantiles(growth_df, weights, [0.5]).to_numpy())
+    return np.stack(medians)
+
+
+def medians_with_store(path, scenarios, areas, cache=False):
+    """
+    The comparison of the scenarios with the store
+    Arguments:
+        path: the folder of the interim data
+        scenarios: the names of the scenarios
+        areas: the area table
+        cache: if True, the saved store is used
+    Returns:
+        an array of the shape (scenarios, 1, months)
+    """
+    store = read_scenario_store(
+        "seaweed_growth_rate", "global", scenarios, path, cache=cache
+    )
+    lats = store.lat_lons[:, 0]
+    return store.weighted_quantiles(
+        store.cell_areas(areas), [0.5], (lats > -45) & (lats < 45)
+    )
+
+
+def cached_medians(path, scenarios, areas):
+    """
+    The comparison of the scenarios with the saved store
+    """
+    return medians_with_store(path, scenarios, areas, cache=True)
+
+
+def main():
+    """
+    Times the comparison of 7 and 21 scenarios with the previous implementation,
+    with the store and with the saved store when it is created and when it
+    already exists
+    Arguments:
+        None
+    Returns:
+        None
+    """
+    for n_repeats in [1, 3]:
+        scenarios = [
+            scenario + "_" + str(i) for i in range(n_repeats) for scenario in SCENARIOS
+        ]
+        with tempfile.TemporaryDirectory() as path:
+            areas = write_results(path, scenarios)
+            timings = {}
+            results = {}
+            for name, function in [
+                ("one after another", medians_one_after_another),
+                ("store", medians_with_store),
+                ("saved store, created", cached_medians),
+                ("saved store, loaded", cached_medians),
+            ]:
+                start = time.perf_counter()
+                results[name] = function(path, scenarios, areas)
+                timings[name] = time.perf_counter() - start
+            for name, result in results.items():
+                np.testing.assert_array_equal(result, results["one after another"])
+            print(
+                "{} scenarios: ".format(len(scenarios))
+                + ", ".join(
+                    "{} {:.2f} s".format(name, timing)
+                    for name, timing in timings.items()
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
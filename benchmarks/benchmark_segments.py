@@ -0,0 +1,34 @@
+"""
+Benchmarks the clustering of the growth rate of the US test dataset with
+the time series reduced to fewer segments with the piecewise aggregate
+approximation. Prints the time of the fit, the error of the approximation
+and how many time series are in the same cluster as with all months.
+Run from the main folder of the repository with:
+python -m benchmarks.benchmark_segments
+"""
+from benchmarks.benchmark_elbow import create_growth_df
+from src.processing.clustering import resolution_diagnostics, time_series_analysis
+
+N_CLUSTERS = 4
+
+
+def main():
+    """
+    Clusters the time series with all months, seasons and years
+    Arguments:
+        None
+    Returns:
+        None
+    """
+    growth_df = create_growth_df()
+    n_months = growth_df.shape[1]
+    print("{} time series, {} months".format(*growth_df.shape))
+    # Months, seasons of 3 months, half years and years
+    segment_counts = [n_months, n_months // 3, n_months // 6, n_months // 12]
+    # Compile the DTW of tslearn first, so it is not part of the first timing
+    time_series_analysis(growth_df.iloc[:50], N_CLUSTERS, "US")
+    print(resolution_diagnostics(growth_df, N_CLUSTERS, segment_counts, "US"))
+
+
+if __name__ == "__main__":
+    main()
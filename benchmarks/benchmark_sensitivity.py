@@ -0,0 +1,83 @@
+"""
+Benchmarks the sensitivity analysis against the previous implementation,
+which evaluated the growth model with the single value functions
+for every row of the Saltelli sample.
+Run from the main folder of the repository with:
+python -m benchmarks.benchmark_sensitivity
+"""
+import time
+
+import numpy as np
+
+from src.model.seaweed_growth import (
+    ammonium_subfactor,
+    growth_factor_combination_single_value,
+    illumination_single_value,
+    nitrate_subfactor,
+    phosphate_subfactor,
+    salinity_single_value,
+    temperature_single_value,
+)
+from src.processing.sensitivity import (
+    GROWTH_MODEL_PROBLEM,
+    growth_model_array,
+    run_sobol_analysis,
+    saltelli_sample,
+)
+
+# The number of base samples used in scripts/Sensitivity_Analysis.ipynb
+NOTEBOOK_SAMPLES = 100_000
+# The loop is too slow to run for all samples, so it is extrapolated
+LOOP_SAMPLES = 2_000
+
+
+def growth_model(nitrate, phosphate, ammonium, salinity, temperature, illumination):
+    """
+    The growth model as it was defined in the notebook. Only used as a reference
+    """
+    nutrient_factor_value = min(
+        nitrate_subfactor(nitrate),
+        phosphate_subfactor(phosphate),
+        ammonium_subfactor(ammonium),
+    )
+    return growth_factor_combination_single_value(
+        nutrient_factor_value,
+        salinity_single_value(salinity),
+        temperature_single_value(temperature),
+        illumination_single_value(illumination),
+    )
+
+
+def main():
+    """
+    Times the loop over the rows and the vectorized analysis for the sample
+    size of the notebook and ten times that
+    Arguments:
+        None
+    Returns:
+        None
+    """
+    samples = saltelli_sample(GROWTH_MODEL_PROBLEM, LOOP_SAMPLES, seed=1)
+    start = time.perf_counter()
+    loop_results = np.array([growth_model(*row) for row in samples])
+    loop_time = (time.perf_counter() - start) * NOTEBOOK_SAMPLES / LOOP_SAMPLES
+    np.testing.assert_allclose(growth_model_array(samples), loop_results, rtol=1e-14)
+    print(
+        "loop, {} base samples: {:.1f} s (extrapolated, model runs only)".format(
+            NOTEBOOK_SAMPLES, loop_time
+        )
+    )
+    for n in [NOTEBOOK_SAMPLES, 10 * NOTEBOOK_SAMPLES]:
+        start = time.perf_counter()
+        results = run_sobol_analysis(n=n, seed=1)
+        print(
+            "vectorized, {} base samples: {:.1f} s (including indices and bootstrap)".format(
+                n, time.perf_counter() - start
+            )
+        )
+    for name, total, conf in zip(results["names"], results["ST"], results["ST_conf"]):
+        print("ST {}: {:.3f} +- {:.3f}".format(name, total, conf))
+
+
+if __name__ == "__main__":
+    main()
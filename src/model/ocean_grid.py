@@ -0,0 +1,274 @@
+"""
+File contains the class OceanGrid, which is used to represent all
+cells of a global grid at once. Instead of one OceanSection per grid cell
+it stores the data of all cells in one dense array and calculates the
+factors for the whole grid in one vectorized step.
+"""
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from src.model import parallel
+from src.model import seaweed_growth as sg
+from src.model.ocean_section import OceanSection
+
+# The environmental parameters the model needs, in the order they are stored
+# in the last dimension of the data array of the grid
+ENVIRONMENT_NAMES = [
+    "salinity",
+    "temperature",
+    "nitrate",
+    "ammonium",
+    "phosphate",
+    "illumination",
+]
+
+
+def calculate_grid_factors(chunk, out=None):
+    """
+    Calculates the factors and the growth rate for a block of cells
+    Arguments:
+        chunk: a tuple of the data of the shape (cells, months, variables)
+            and the names of the variables
+        out: an array of the shape (cells, months, factors) to write to.
+            If None, a new one is created
+    Returns:
+        the factors in the order of FACTOR_NAMES
+    """
+    data, variables = chunk
+    if out is None:
+        out = np.empty(data.shape[:2] + (len(sg.FACTOR_NAMES),))
+    sg.calculate_factors_into(
+        *[data[:, :, variables.index(name)] for name in ENVIRONMENT_NAMES],
+        out={name: out[:, :, i] for i, name in enumerate(sg.FACTOR_NAMES)},
+    )
+    return out
+
+
+class OceanGrid:
+    """
+    Class that represents all cells of a grid.
+    The environmental data is stored as an array of the shape
+    (cells, months, environmental parameters) and the factors as an array
+    of the shape (cells, months, factors), so the time series of a single
+    cell is always one contiguous block
+    """
+
+    def __init__(
+        self, lat_lons, data, months_since_war=None, variables=None, cell_ids=None
+    ):
+        """
+        Arguments:
+            lat_lons: an array of the shape (cells, 2) with the latitude and
+                longitude of each cell
+            data: an array of the shape (cells, months, variables) with the
+                environmental parameters
+            months_since_war: the months since war for each month. If None,
+                the months start at -3, like in OceanSection
+            variables: the names of the environmental parameters in data.
+                If None, data contains all of them in the order of ENVIRONMENT_NAMES
+            cell_ids: the integer cell id of each cell in the area table, if known
+        """
+        self.lat_lons = np.asarray(lat_lons, dtype=np.float64).reshape(-1, 2)
+        self.data = np.asarray(data)
+        if variables is None:
+            variables = ENVIRONMENT_NAMES
+        self.variables = list(variables)
+        assert self.data.ndim == 3, "data has to be (cells, months, parameters)"
+        assert self.data.shape[0] == self.lat_lons.shape[0]
+        assert self.data.shape[2] == len(self.variables)
+        if months_since_war is None:
+            months_since_war = range(-3, self.data.shape[1] - 3)
+        self.months_since_war = pd.Index(months_since_war, name="months_since_war")
+        assert len(self.months_since_war) == self.data.shape[1]
+        self.cell_ids = None
+        if cell_ids is not None:
+            self.cell_ids = np.asarray(cell_ids, dtype=np.int64)
+            assert self.cell_ids.shape == (len(self.lat_lons),)
+        # Add the factors
+        self.factors = None
+        # Lookup from the lat_lon tuple to the position of the cell
+        self._positions = None
+
+    def __len__(self):
+        return self.lat_lons.shape[0]
+
+    @property
+    def names(self):
+        """
+        The lat_lon tuples of all cells, in the order they are stored
+        """
+        return [tuple(lat_lon) for lat_lon in self.lat_lons.tolist()]
+
+    def position(self, lat_lon):
+        """
+        Finds where a cell is stored in the arrays
+        Arguments:
+            lat_lon: the lat_lon coordinates as tuple of floats
+        Returns:
+            the index of the cell in the first dimension of the arrays
+        """
+        if self._positions is None:
+            self._positions = {name: i for i, name in enumerate(self.names)}
+        return self._positions[lat_lon]
+
+    def calculate_factors(self, n_jobs=1, executor=None):
+        """
+        Calculates the factors and the growth rate for all cells of the grid
+        in one vectorized pass
+        Arguments:
+            n_jobs: the number of worker processes. With more than one, the
+                cells are split into one chunk per worker. -1 uses all cores
+            executor: an existing concurrent.futures executor to use instead.
+                The cells are then split into n_jobs chunks
+        Returns:
+            None
+        """
+        missing = set(ENVIRONMENT_NAMES) - set(self.variables)
+        assert not missing, "the factors need the parameters {}".format(sorted(missing))
+        self.factors = np.empty(self.data.shape[:2] + (len(sg.FACTOR_NAMES),))
+        n_chunks = parallel.resolve_n_jobs(n_jobs)
+        if n_chunks == 1 and executor is None:
+            calculate_grid_factors((self.data, self.variables), out=self.factors)
+            return
+        # Only the data of the cells in a chunk is sent to the workers
+        cell_chunks = parallel.split_into_chunks(len(self), n_chunks)
+        results = parallel.map_chunks(
+            calculate_grid_factors,
+            [(self.data[cells], self.variables) for cells in cell_chunks],
+            n_jobs=n_jobs,
+            executor=executor,
+        )
+        for cells, factors in zip(cell_chunks, results):
+            self.factors[cells] = factors
+
+    def growth_rate_ensemble(self, parameter_sets):
+        """
+        Calculates the growth rate of all cells for several sets of the
+        empirical constants at once, without changing the factors of the grid
+        Arguments:
+            parameter_sets: list of GrowthParameters
+        Returns:
+            an array of the shape (sets, cells, months)
+        """
+        return sg.growth_rate_ensemble(
+            *[self.parameter_array(name) for name in ENVIRONMENT_NAMES],
+            parameter_sets=parameter_sets,
+        )["seaweed_growth_rate"]
+
+    def calculate_growth_rate(self):
+        """
+        The growth rate is calculated in the same pass as the factors,
+        so this only makes sure that this has happened
+        Arguments:
+            None
+        Returns:
+            None
+        """
+        assert self.factors is not None
+
+    def parameter_array(self, parameter):
+        """
+        Provides the values of a parameter for all cells and months
+        Arguments:
+            parameter: the name of an environmental parameter or a factor
+        Returns:
+            a view of the shape (cells, months) on the data of the grid
+        """
+        if parameter in self.variables:
+            return self.data[:, :, self.variables.index(parameter)]
+        # check if the factors have been calculated
+        assert self.factors is not None
+        return self.factors[:, :, sg.FACTOR_NAMES.index(parameter)]
+
+    def _cell_index(self):
+        """
+        Creates the index of the cells used for the dataframes, which is
+        the same as the one pandas creates from the lat_lon tuples
+        """
+        return pd.MultiIndex.from_arrays([self.lat_lons[:, 0], self.lat_lons[:, 1]])
+
+    def construct_df_for_parameter(self, parameter):
+        """
+        Constructs a dataframe that contains complete time series of a given
+        parameter for all cells of the grid.
+        Arguments:
+            parameter: the parameter to construct the dataframe for
+        Returns:
+            a dataframe with the date as index and the cells as columns. It is
+            a copy, so changing it does not change the data of the grid
+        """
+        return pd.DataFrame(
+            self.parameter_array(parameter).T,
+            index=self.months_since_war,
+            columns=self._cell_index(),
+            copy=True,
+        )
+
+    def construct_df_from_sections_for_date(self, months):
+        """
+        Constructs a dataframe from the data of all cells for a given date.
+        Arguments:
+            months: the months since the beginning of the nuclear war
+        Returns:
+            a dataframe for the values at the given month
+        """
+        # check if the factors have been calculated
+        assert self.factors is not None
+        month = self.months_since_war.get_loc(months)
+        values = np.concatenate(
+            [self.data[:, month, :].astype(np.float64), self.factors[:, month, :]],
+            axis=1,
+        )
+        return pd.DataFrame(
+            values,
+            index=self._cell_index(),
+            columns=self.variables + sg.FACTOR_NAMES,
+        )
+
+    def section(self, lat_lon):
+        """
+        Creates an OceanSection for a single cell. Its series are views
+        on the arrays of the grid, so this is cheap, but the section should
+        only be used to look at the cell.
+        Arguments:
+            lat_lon: the lat_lon coordinates as tuple of floats
+        Returns:
+            an OceanSection of the cell
+        """
+        position = self.position(lat_lon)
+        # Parameters that are not loaded are None in the section
+        data = dict.fromkeys(ENVIRONMENT_NAMES)
+        for i, name in enumerate(self.variables):
+            data[name] = pd.Series(self.data[position, :, i], name=name, copy=False)
+        section = OceanSection(lat_lon, data)
+        if self.factors is not None:
+            for i, name in enumerate(sg.FACTOR_NAMES):
+                setattr(
+                    section,
+                    name,
+                    pd.Series(self.factors[position, :, i], name=name, copy=False),
+                )
+            section.create_section_df(self.months_since_war)
+        return section
+
+
+class GridSections(Mapping):
+    """
+    Read only mapping from the lat_lon tuples to the OceanSection of each
+    cell of an OceanGrid. The sections are only created when they are accessed,
+    so the grid can be used everywhere the dictionary of sections was used
+    """
+
+    def __init__(self, grid):
+        self.grid = grid
+
+    def __getitem__(self, lat_lon):
+        return self.grid.section(lat_lon)
+
+    def __iter__(self):
+        return iter(self.grid.names)
+
+    def __len__(self):
+        return len(self.grid)
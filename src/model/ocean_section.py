@@ -3,6 +3,7 @@ File contains the class OceanSection, which is used to represent
 a section of the ocean. This can be either a large marine ecosystem
 or simply a part of a global grid.
 """
+import numpy as np
 import pandas as pd
 
 from src.model import seaweed_growth as sg
@@ -45,17 +46,31 @@ class OceanSection:
         Returns:
             None
         """
-        # Calculate the factors
-        self.salinity_factor = sg.calculate_salinity_factor(self.salinity)
-        nutrients = sg.calculate_nutrient_factor(
-            self.nitrate, self.ammonium, self.phosphate
+        # Calculate all factors in one pass into a single preallocated block
+        factor_names = sg.FACTOR_NAMES[:-1]
+        factors = np.empty((len(factor_names), len(self.salinity)))
+        sg.calculate_factors_into(
+            self.salinity,
+            self.temperature,
+            self.nitrate,
+            self.ammonium,
+            self.phosphate,
+            self.illumination,
+            out=dict(zip(factor_names, factors)),
         )
-        self.nutrient_factor = nutrients[0]
-        self.nitrate_subfactor = nutrients[1]
-        self.ammonium_subfactor = nutrients[2]
-        self.phosphate_subfactor = nutrients[3]
-        self.illumination_factor = sg.calculate_illumination_factor(self.illumination)
-        self.temp_factor = sg.calculate_temperature_factor(self.temperature)
+        # Wrap the rows of the block as series without copying them
+        (
+            self.salinity_factor,
+            self.nutrient_factor,
+            self.nitrate_subfactor,
+            self.ammonium_subfactor,
+            self.phosphate_subfactor,
+            self.illumination_factor,
+            self.temp_factor,
+        ) = [
+            pd.Series(factor, index=self.salinity.index, name=name, copy=False)
+            for factor, name in zip(factors, factor_names)
+        ]
 
     def calculate_growth_rate(self):
         """
@@ -73,12 +88,13 @@ class OceanSection:
             self.salinity_factor,
         )
 
-    def create_section_df(self):
+    def create_section_df(self, months_since_war=None):
         """
         Creates a dataframe that contains all the data for a given section
         This can only be run once the factors have been calculated
         Arguments:
-            None
+            months_since_war: the months since war for each month. If None,
+                the data starts three months before the war
         Returns:
             None
         """
@@ -109,7 +125,9 @@ class OceanSection:
             }
         )
         # Add a column with the month since war
-        section_df["months_since_war"] = list(range(-3, section_df.shape[0] - 3, 1))
+        if months_since_war is None:
+            months_since_war = range(-3, section_df.shape[0] - 3, 1)
+        section_df["months_since_war"] = list(months_since_war)
         section_df.set_index("months_since_war", inplace=True)
         # Add the dataframe to the class
         section_df.name = self.name
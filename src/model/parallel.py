@@ -0,0 +1,66 @@
+"""
+Helpers to run the stages of the model on chunks of the ocean sections
+or grid cells in worker processes
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+def resolve_n_jobs(n_jobs):
+    """
+    Translates the number of jobs into the number of workers
+    Arguments:
+        n_jobs: the number of workers. -1 uses all cores
+    Returns:
+        the number of workers as positive int
+    """
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max(os.cpu_count() + 1 + n_jobs, 1)
+    assert n_jobs > 0, "n_jobs has to be positive or negative, not 0"
+    return n_jobs
+
+
+def split_into_chunks(n_items, n_chunks):
+    """
+    Splits a number of items into contiguous chunks of nearly equal size
+    Arguments:
+        n_items: the number of items
+        n_chunks: the number of chunks to create at most
+    Returns:
+        a list of slices, one for each chunk that is not empty
+    """
+    borders = np.linspace(0, n_items, min(n_chunks, max(n_items, 1)) + 1).astype(int)
+    return [
+        slice(start, stop)
+        for start, stop in zip(borders[:-1], borders[1:])
+        if stop > start
+    ]
+
+
+def map_chunks(function, chunks, n_jobs=1, executor=None):
+    """
+    Applies a function to every chunk. With more than one job or an executor
+    the chunks are processed in worker processes. The results are always
+    returned in the order of the chunks. The workers only get the name of
+    the function, so it has to be defined on module level, and they import
+    its module, so that module should not import slow dependencies that
+    the function does not need
+    Arguments:
+        function: a function that can be pickled, e.g. defined on module level
+        chunks: list of the arguments for the function
+        n_jobs: the number of worker processes to start if no executor is given
+        executor: an existing concurrent.futures executor to use instead
+    Returns:
+        a list with the result for each chunk
+    """
+    if executor is not None:
+        return list(executor.map(function, chunks))
+    n_workers = min(resolve_n_jobs(n_jobs), len(chunks))
+    if n_workers <= 1:
+        return [function(chunk) for chunk in chunks]
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        return list(pool.map(function, chunks))
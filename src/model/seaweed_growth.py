@@ -2,11 +2,14 @@
 Contains all functions needed to calculate the growth of
 seaweed.
 
-The calculation for each factor is split into two functions.
+The calculation for each factor is split into three functions.
 The first function with "single_value" in the name calculates
-the factor for a single value. While the second function with
-"calculate" in the name calculates the factor for a whole pandas series,
-for which it uses the first function.
+the factor for a single value and is the reference implementation
+of the equations. The second function with "array" in the name
+calculates the factor for a numpy array or pandas series of any shape
+in one vectorized step. The third function with "calculate" in the
+name calculates the factor for a whole pandas series, for which it
+uses the array function.
 
 The actual based is based on the publication:
 James, S.C. and Boriah, V. (2010), Modeling algae growth
@@ -17,11 +20,134 @@ The paper shows an empirical model for the growth of algae.
 See there for detailed information about the model.
 """
 import math
+from dataclasses import dataclass, fields
 
 import numpy as np
 import pandas as pd
 
 
+@dataclass(frozen=True)
+class GrowthParameters:
+    """
+    The empirical constants of the growth model. The defaults are the values
+    from James and Boriah (2010). For the array functions every constant can
+    also be an array, which is broadcast against the environmental data, so
+    several sets of constants can be evaluated at once (see stack_parameters)
+    """
+
+    # Temperature factor: exp(-kt1 * (lower - T)²) below and
+    # exp(-kt2 * (T - upper)²) above the optimal range in °C.
+    # These coefficients were determined by fitting the equation such that
+    # g(15°C) = 0.25 and g(36°C) = 0.1
+    kt1: float = 0.017
+    kt2: float = 0.064
+    temperature_lower: float = 24
+    temperature_upper: float = 30
+    # Salinity factor, same shape as the temperature factor, in ppt
+    kS1: float = 0.007
+    kS2: float = 0.063
+    salinity_lower: float = 24
+    salinity_upper: float = 36
+    # Illumination factor: below the saturation it follows Steele's equation,
+    # above the inhibition it decreases with 1 / illumination, in W/m²
+    illumination_saturation: float = 21.9
+    illumination_inhibition: float = 109.5
+    # Half saturation constants of the nutrient subfactors in mmol/m³
+    kno3: float = 0.4
+    knh4: float = 0.3
+    kpo4: float = 0.1
+
+
+DEFAULT_PARAMETERS = GrowthParameters()
+
+
+def stack_parameters(parameter_sets, ndim):
+    """
+    Combines several sets of constants into one, whose constants are arrays
+    of the shape (sets, 1, ..., 1). Used with the array functions, this
+    evaluates all sets at once and adds a first dimension for the sets
+    to the results
+    Arguments:
+        parameter_sets: list of GrowthParameters
+        ndim: the number of dimensions of the environmental data
+    Returns:
+        GrowthParameters with array constants
+    """
+    shape = (len(parameter_sets),) + (1,) * ndim
+    return GrowthParameters(
+        **{
+            field.name: np.array(
+                [getattr(parameters, field.name) for parameters in parameter_sets],
+                dtype=np.float64,
+            ).reshape(shape)
+            for field in fields(GrowthParameters)
+        }
+    )
+
+
+def _result_shape(data, *constants):
+    """
+    Calculates the shape of a result, which is the shape of the data
+    broadcast with the constants used
+    Arguments:
+        data: numpy array of the environmental data
+        constants: the constants used, floats or arrays
+    Returns:
+        the shape as tuple
+    """
+    return np.broadcast_shapes(data.shape, *[np.shape(c) for c in constants])
+
+
+def _as_float_array(values):
+    """
+    Converts the input to a numpy array of float64, which is the precision
+    the single value functions calculate in
+    Arguments:
+        values: a numpy array, pandas series or anything array like
+    Returns:
+        the values as a numpy array of float64
+    """
+    return np.asarray(values, dtype=np.float64)
+
+
+def _assert_in_range(values, lower, upper, name):
+    """
+    Makes sure that all values that are not nan are in a reasonable range.
+    This is the array version of the assertions in the single value functions
+    Arguments:
+        values: numpy array of the values to check
+        lower: the lowest allowed value
+        upper: the highest allowed value
+        name: the name of the values, used in the error message
+    Returns:
+        None
+    """
+    # nan fails both comparisons, so it never counts as out of range
+    out_of_range = (values < lower) | (values > upper)
+    assert not out_of_range.any(), "{} has the value {}".format(
+        name, values[out_of_range][0]
+    )
+
+
+def _output_array(out, shape):
+    """
+    Provides the array the result of an array function is written to.
+    This is either the array supplied by the caller or a new one
+    Arguments:
+        out: a float64 numpy array of the right shape or None
+        shape: the shape of the result
+    Returns:
+        the array to write the result to
+    """
+    if out is None:
+        return np.empty(shape, dtype=np.float64)
+    assert out.shape == shape, "out has the shape {} instead of {}".format(
+        out.shape, shape
+    )
+    assert out.dtype == np.float64, "out has the dtype {}".format(out.dtype)
+    return out
+
+
 def growth_factor_combination_single_value(
     illumination_factor: float,
     temperature_factor: float,
@@ -60,6 +186,43 @@ def growth_factor_combination_single_value(
     return illumination_factor * temperature_factor * nutrient_factor * salinity_factor
 
 
+def growth_factor_combination_array(
+    illumination_factor, temperature_factor, nutrient_factor, salinity_factor, out=None
+):
+    """
+    Calculates the actual production rate of the seaweed for arrays of any shape
+    Arguments:
+        illumination_factor: the illumination factor
+        temperature_factor: the temperature factor
+        nutrient_factor: the nutrient factor
+        salinity_factor: the salinity factor
+        out: optional float64 array the result is written to
+    Returns:
+        fraction of the actual production rate the seaweed could
+        reach in optimal circumstances as a numpy array
+    """
+    factors = [
+        _as_float_array(factor)
+        for factor in [
+            illumination_factor,
+            temperature_factor,
+            nutrient_factor,
+            salinity_factor,
+        ]
+    ]
+    growth = _output_array(out, np.broadcast_shapes(*[f.shape for f in factors]))
+    # Calculate the actual production rate. The product is nan
+    # exactly where any of the factors is nan
+    np.multiply(factors[0], factors[1], out=growth)
+    growth *= factors[2]
+    growth *= factors[3]
+    has_nan = np.isnan(growth)
+    # Make sure all factors are between 0 and 1 where they are used
+    for factor in factors:
+        _assert_in_range(np.where(has_nan, 0, factor), 0, 1, "factor")
+    return growth
+
+
 def growth_factor_combination(
     illumination_factor: pd.Series,
     temperature_factor: pd.Series,
@@ -77,34 +240,20 @@ def growth_factor_combination(
     Returns:
         fraction of the actual production rate the seaweed could
     """
-    factors_combined_df = pd.concat(
-        [illumination_factor, temperature_factor, nutrient_factor, salinity_factor],
-        axis=1,
+    growth = growth_factor_combination_array(
+        illumination_factor, temperature_factor, nutrient_factor, salinity_factor
+    )
+    return pd.Series(
+        growth, index=illumination_factor.index, name="growth_factor_combination"
     )
-    factors_combined_df.columns = [
-        "illumination_factor",
-        "temperature_factor",
-        "nutrient_factor",
-        "salinity_factor",
-    ]  # Rename the columns
-
-    factors_combined_df["growth_factor_combination"] = factors_combined_df.apply(
-        lambda x: growth_factor_combination_single_value(
-            x["illumination_factor"],
-            x["temperature_factor"],
-            x["nutrient_factor"],
-            x["salinity_factor"],
-        ),
-        axis=1,
-    )  # Calculate the growth factor combination
-    return pd.Series(factors_combined_df["growth_factor_combination"])
 
 
-def illumination_single_value(illumination: float):
+def illumination_single_value(illumination: float, parameters=DEFAULT_PARAMETERS):
     """
     Calculates the illumination factor for a single value based on an empirical model
     Arguments:
         illumination: the illumination of the algae in W/m²
+        parameters: the empirical constants
     Returns:
         The illumination factor
     """
@@ -116,14 +265,50 @@ def illumination_single_value(illumination: float):
     assert 0 <= illumination <= 1361, "illumination has the value {}".format(
         illumination
     )
-    if illumination < 21.9:
-        return (illumination / 21.9) * math.exp(1 - (illumination / 21.9))
-    elif illumination > 109.5:
-        return 109.5 / illumination
+    saturation = parameters.illumination_saturation
+    inhibition = parameters.illumination_inhibition
+    if illumination < saturation:
+        return (illumination / saturation) * math.exp(1 - (illumination / saturation))
+    elif illumination > inhibition:
+        return inhibition / illumination
     else:
         return 1
 
 
+def illumination_array(illumination, out=None, parameters=DEFAULT_PARAMETERS):
+    """
+    Calculates the illumination factor for an array of any shape
+    based on an empirical model
+    Arguments:
+        illumination: the illumination of the algae in W/m²
+        out: optional float64 array the result is written to
+        parameters: the empirical constants
+    Returns:
+        The illumination factor as a numpy array
+    """
+    illumination = _as_float_array(illumination)
+    # 1361 is the maximum illumination that reaches the atmosphere
+    _assert_in_range(illumination, 0, 1361, "illumination")
+    saturation = parameters.illumination_saturation
+    inhibition = parameters.illumination_inhibition
+    factor = _output_array(out, _result_shape(illumination, saturation, inhibition))
+    factor.fill(1)
+    # Calculate both branches for the whole array in one scratch array and
+    # only copy them where they apply
+    relative = np.broadcast_to(illumination / saturation, factor.shape)
+    scratch = np.subtract(1, relative)
+    np.exp(scratch, out=scratch)
+    scratch *= relative
+    np.copyto(factor, scratch, where=illumination < saturation)
+    # Zero illumination is only used in the lower branch, so the division
+    # by zero in the upper branch never counts
+    with np.errstate(divide="ignore"):
+        np.divide(inhibition, illumination, out=scratch)
+    np.copyto(factor, scratch, where=illumination > inhibition)
+    np.copyto(factor, np.nan, where=np.isnan(illumination))
+    return factor
+
+
 def calculate_illumination_factor(illumination: pd.Series):
     """
     Calculates the illumination factor for a whole series
@@ -132,14 +317,67 @@ def calculate_illumination_factor(illumination: pd.Series):
     Returns:
         The illumination factor as a pandas series
     """
-    return pd.Series(illumination.apply(illumination_single_value))
+    return pd.Series(
+        illumination_array(illumination),
+        index=illumination.index,
+        name=illumination.name,
+    )
+
+
+def _exponential_decay(distance, coefficient, out):
+    """
+    Calculates exp(-coefficient * distance ** 2), which is the shape of both
+    the temperature and the salinity factor outside of their optimal range
+    Arguments:
+        distance: array of the distances to the optimal range
+        coefficient: the empirical coefficient
+        out: float64 array the result is written to
+    Returns:
+        out
+    """
+    np.square(distance, out=out)
+    out *= -coefficient
+    return np.exp(out, out=out)
 
 
-def temperature_single_value(temperature: float):
+def _optimal_range_array(
+    values, lower, upper, coefficient_lower, coefficient_upper, out
+):
+    """
+    Calculates a factor that is 1 in the optimal range and decays
+    exponentially outside of it, like the temperature and the salinity factor
+    Arguments:
+        values: float64 array of the environmental data
+        lower: the lower end of the optimal range
+        upper: the upper end of the optimal range
+        coefficient_lower: the coefficient of the decay below the range
+        coefficient_upper: the coefficient of the decay above the range
+        out: optional float64 array the result is written to
+    Returns:
+        The factor as a numpy array
+    """
+    factor = _output_array(
+        out,
+        _result_shape(values, lower, upper, coefficient_lower, coefficient_upper),
+    )
+    factor.fill(1)
+    scratch = np.empty_like(factor)
+    np.subtract(lower, values, out=scratch)
+    _exponential_decay(scratch, coefficient_lower, scratch)
+    np.copyto(factor, scratch, where=values < lower)
+    np.subtract(values, upper, out=scratch)
+    _exponential_decay(scratch, coefficient_upper, scratch)
+    np.copyto(factor, scratch, where=values > upper)
+    np.copyto(factor, np.nan, where=np.isnan(values))
+    return factor
+
+
+def temperature_single_value(temperature: float, parameters=DEFAULT_PARAMETERS):
     """
     Calculates the temperature factor for a single value based on an empirical model
     Arguments:
         temperature: the temperature of the water in °C
+        parameters: the empirical constants
     Returns:
         The temperature factor as a float
     """
@@ -148,19 +386,39 @@ def temperature_single_value(temperature: float):
         return np.nan
     # make sure the temperature is in a reasonable range
     assert -20 <= temperature <= 50, "temperature has the value {}".format(temperature)
-    # where Kt1 = 0.017°C−2 and Kt2 = 0.06°C−2. These coefficients were determined by
-    # fitting the preceding equation such that g(15°C) = 0.25 and g(36°C) = 0.1
-    kt1 = 0.017
-    kt2 = 0.064
-
-    if temperature < 24:
-        return math.exp(-kt1 * (24 - temperature) ** 2)
-    elif temperature > 30:
-        return math.exp(-kt2 * (temperature - 30) ** 2)
+    lower = parameters.temperature_lower
+    upper = parameters.temperature_upper
+    if temperature < lower:
+        return math.exp(-parameters.kt1 * (lower - temperature) ** 2)
+    elif temperature > upper:
+        return math.exp(-parameters.kt2 * (temperature - upper) ** 2)
     else:
         return 1
 
 
+def temperature_array(temperature, out=None, parameters=DEFAULT_PARAMETERS):
+    """
+    Calculates the temperature factor for an array of any shape
+    based on an empirical model
+    Arguments:
+        temperature: the temperature of the water in °C
+        out: optional float64 array the result is written to
+        parameters: the empirical constants
+    Returns:
+        The temperature factor as a numpy array
+    """
+    temperature = _as_float_array(temperature)
+    _assert_in_range(temperature, -20, 50, "temperature")
+    return _optimal_range_array(
+        temperature,
+        parameters.temperature_lower,
+        parameters.temperature_upper,
+        parameters.kt1,
+        parameters.kt2,
+        out,
+    )
+
+
 def calculate_temperature_factor(temperature: pd.Series):
     """
     Calculates the temperature factor for a whole dataframe column
@@ -169,44 +427,97 @@ def calculate_temperature_factor(temperature: pd.Series):
     Returns:
         The temperature factor as a pandas series
     """
-    # Apply the function to the salinity dataframe
-    return pd.Series(temperature.apply(temperature_single_value))
+    return pd.Series(
+        temperature_array(temperature),
+        index=temperature.index,
+        name=temperature.name,
+    )
 
 
-def nitrate_subfactor(nitrate):
+def nitrate_subfactor(nitrate, parameters=DEFAULT_PARAMETERS):
     """
     Calculates the nitrate subfactor for a single value
     Arguments:
         nitrate: the nitrate concentration in mmol/m³
+        parameters: the empirical constants
     Returns:
         The nitrate subfactor as a float
     """
-    kno3 = 0.4  # empirical constant
-    return nitrate / (kno3 + nitrate)
+    return nitrate / (parameters.kno3 + nitrate)
 
 
-def phosphate_subfactor(phosphate):
+def phosphate_subfactor(phosphate, parameters=DEFAULT_PARAMETERS):
     """
     Calculates the phosphate subfactor for a single value
     Arguments:
         phosphate: the phosphate concentration in mmol/m³
+        parameters: the empirical constants
     Returns:
         The phosphate subfactor as a float
     """
-    kpo4 = 0.1  # empirical constant
-    return phosphate / (kpo4 + phosphate)
+    return phosphate / (parameters.kpo4 + phosphate)
 
 
-def ammonium_subfactor(ammonium):
+def ammonium_subfactor(ammonium, parameters=DEFAULT_PARAMETERS):
     """
     Calculates the ammonium subfactor for a single value
     Arguments:
         ammonium: the ammonium concentration in mmol/m³
+        parameters: the empirical constants
     Returns:
         The ammonium subfactor as a float
     """
-    knh4 = 0.3  # empirical constant
-    return ammonium / (knh4 + ammonium)
+    return ammonium / (parameters.knh4 + ammonium)
+
+
+def nutrient_array(
+    nitrate, ammonium, phosphate, out=None, parameters=DEFAULT_PARAMETERS
+):
+    """
+    Calculates the nutrient factor and the nutrient subfactors
+    for arrays of any shape
+    Arguments:
+        nitrate: the nitrate concentration in mmol/m³
+        ammonium: the ammonium concentration in mmol/m³
+        phosphate: the phosphate concentration in mmol/m³
+        out: optional list of four float64 arrays the results are written to,
+            in the same order as they are returned
+        parameters: the empirical constants
+    Returns:
+        List of numpy arrays:
+            nutrient_factor: The nutrient factor
+            nitrate_subfactor: The nitrate subfactor
+            ammonium_subfactor: The ammonium subfactor
+            phosphate_subfactor: The phosphate subfactor
+    """
+    nitrate = _as_float_array(nitrate)
+    ammonium = _as_float_array(ammonium)
+    phosphate = _as_float_array(phosphate)
+    shape = np.broadcast_shapes(
+        _result_shape(nitrate, parameters.kno3),
+        _result_shape(ammonium, parameters.knh4),
+        _result_shape(phosphate, parameters.kpo4),
+    )
+    if out is None:
+        out = [None] * 4
+    nutrient_factor, nitrate_factor, ammonium_factor, phosphate_factor = [
+        _output_array(array, shape) for array in out
+    ]
+    # Same calculation as in the subfactor functions
+    for nutrient, constant, subfactor in [
+        (nitrate, parameters.kno3, nitrate_factor),
+        (ammonium, parameters.knh4, ammonium_factor),
+        (phosphate, parameters.kpo4, phosphate_factor),
+    ]:
+        np.add(constant, nutrient, out=subfactor)
+        np.divide(nutrient, subfactor, out=subfactor)
+    # The nutrient factor is the minimum available nutrient. This mirrors
+    # the builtin min, which is nan if the nitrate is nan and otherwise
+    # skips nan values
+    np.fmin(ammonium_factor, phosphate_factor, out=nutrient_factor)
+    np.fmin(nitrate_factor, nutrient_factor, out=nutrient_factor)
+    nutrient_factor[np.isnan(nitrate_factor)] = np.nan
+    return [nutrient_factor, nitrate_factor, ammonium_factor, phosphate_factor]
 
 
 def calculate_nutrient_factor(
@@ -226,35 +537,25 @@ def calculate_nutrient_factor(
             ammonium_subfactor: The ammonium subfactor as a pd.Series
             phosphate_subfactor: The phosphate subfactor as a pd.Series
     """
-    nutrient_df = pd.concat([nitrate, ammonium, phosphate], axis=1)
-    nutrient_df.columns = ["nitrate", "ammonium", "phosphate"]
-    nutrient_df["nitrate_subfactor"] = nutrient_df["nitrate"].apply(nitrate_subfactor)
-    nutrient_df["ammonium_subfactor"] = nutrient_df["ammonium"].apply(
-        ammonium_subfactor
-    )
-    nutrient_df["phosphate_subfactor"] = nutrient_df["phosphate"].apply(
-        phosphate_subfactor
-    )
-    # Calculate the nutrient factor as the minimum available nutrient
-    nutrient_df["nutrient_factor"] = nutrient_df.apply(
-        lambda x: min(
-            x["nitrate_subfactor"], x["ammonium_subfactor"], x["phosphate_subfactor"]
-        ),
-        axis=1,
-    )
+    factors = nutrient_array(nitrate, ammonium, phosphate)
+    names = [
+        "nutrient_factor",
+        "nitrate_subfactor",
+        "ammonium_subfactor",
+        "phosphate_subfactor",
+    ]
     return [
-        pd.Series(nutrient_df["nutrient_factor"]),
-        pd.Series(nutrient_df["nitrate_subfactor"]),
-        pd.Series(nutrient_df["ammonium_subfactor"]),
-        pd.Series(nutrient_df["phosphate_subfactor"]),
+        pd.Series(factor, index=nitrate.index, name=name)
+        for factor, name in zip(factors, names)
     ]
 
 
-def salinity_single_value(salinity: float):
+def salinity_single_value(salinity: float, parameters=DEFAULT_PARAMETERS):
     """
     Calculates the salinity factor for a single salinity value based on an empirical model
     Arguments:
         salinity: the salinity of the water
+        parameters: the empirical constants
     Returns:
         The salinity factor as a float
     """
@@ -263,17 +564,39 @@ def salinity_single_value(salinity: float):
         return np.nan
     # Make sure the salinity is in a reasonable range
     assert 0 <= salinity <= 100, "salinity has the value {}".format(salinity)
-    # with  = 0.007 ppt−2 and = 0.063 ppt−2.
-    kS1 = 0.007
-    kS2 = 0.063
-    if salinity < 24:
-        return math.exp(-kS1 * (24 - salinity) ** 2)
-    elif salinity > 36:
-        return math.exp(-kS2 * (salinity - 36) ** 2)
+    lower = parameters.salinity_lower
+    upper = parameters.salinity_upper
+    if salinity < lower:
+        return math.exp(-parameters.kS1 * (lower - salinity) ** 2)
+    elif salinity > upper:
+        return math.exp(-parameters.kS2 * (salinity - upper) ** 2)
     else:
         return 1
 
 
+def salinity_array(salinity, out=None, parameters=DEFAULT_PARAMETERS):
+    """
+    Calculates the salinity factor for an array of any shape
+    based on an empirical model
+    Arguments:
+        salinity: the salinity of the water in ppt
+        out: optional float64 array the result is written to
+        parameters: the empirical constants
+    Returns:
+        The salinity factor as a numpy array
+    """
+    salinity = _as_float_array(salinity)
+    _assert_in_range(salinity, 0, 100, "salinity")
+    return _optimal_range_array(
+        salinity,
+        parameters.salinity_lower,
+        parameters.salinity_upper,
+        parameters.kS1,
+        parameters.kS2,
+        out,
+    )
+
+
 def calculate_salinity_factor(salinity: pd.Series):
     """
     Calculates the salinity factor for a whole dataframe
@@ -282,5 +605,148 @@ def calculate_salinity_factor(salinity: pd.Series):
     Returns:
         The salinity factor as a pandas series
     """
-    # Apply the function to the salinity dataframe
-    return pd.Series(salinity.apply(salinity_single_value))
+    return pd.Series(salinity_array(salinity), index=salinity.index, name=salinity.name)
+
+
+# The names of all the factors calculate_factors_into can fill,
+# in the same order as they appear in the dataframe of an ocean section
+FACTOR_NAMES = [
+    "salinity_factor",
+    "nutrient_factor",
+    "nitrate_subfactor",
+    "ammonium_subfactor",
+    "phosphate_subfactor",
+    "illumination_factor",
+    "temp_factor",
+    "seaweed_growth_rate",
+]
+# The largest number of values of one factor that growth_rate_ensemble
+# calculates at once, which limits the memory of the factors it does not return
+ENSEMBLE_CHUNK_VALUES = 2**22
+
+
+def calculate_factors_into(
+    salinity,
+    temperature,
+    nitrate,
+    ammonium,
+    phosphate,
+    illumination,
+    out,
+    parameters=DEFAULT_PARAMETERS,
+):
+    """
+    Calculates all factors and the growth rate in a single pass and writes
+    them into arrays supplied by the caller, so no intermediate series or
+    dataframes are created. The environmental data can have any shape, as
+    long as all parameters have the same one
+    Arguments:
+        salinity: the salinity of the water in ppt
+        temperature: the temperature of the water in °C
+        nitrate: the nitrate concentration in mmol/m³
+        ammonium: the ammonium concentration in mmol/m³
+        phosphate: the phosphate concentration in mmol/m³
+        illumination: the illumination of the algae in W/m²
+        out: a dictionary with the names from FACTOR_NAMES as keys and
+            float64 arrays of the same shape as the data as values. The
+            growth rate is only calculated if "seaweed_growth_rate" is a key.
+            With stacked parameters the arrays need the additional first
+            dimension for the parameter sets
+        parameters: the empirical constants
+    Returns:
+        out
+    """
+    missing = [name for name in FACTOR_NAMES[:-1] if name not in out]
+    assert not missing, "out is missing the arrays for {}".format(missing)
+    salinity_array(salinity, out=out["salinity_factor"], parameters=parameters)
+    nutrient_array(
+        nitrate,
+        ammonium,
+        phosphate,
+        out=[
+            out["nutrient_factor"],
+            out["nitrate_subfactor"],
+            out["ammonium_subfactor"],
+            out["phosphate_subfactor"],
+        ],
+        parameters=parameters,
+    )
+    illumination_array(
+        illumination, out=out["illumination_factor"], parameters=parameters
+    )
+    temperature_array(temperature, out=out["temp_factor"], parameters=parameters)
+    if "seaweed_growth_rate" in out:
+        growth_factor_combination_array(
+            out["illumination_factor"],
+            out["temp_factor"],
+            out["nutrient_factor"],
+            out["salinity_factor"],
+            out=out["seaweed_growth_rate"],
+        )
+    return out
+
+
+def growth_rate_ensemble(
+    salinity,
+    temperature,
+    nitrate,
+    ammonium,
+    phosphate,
+    illumination,
+    parameter_sets,
+    factor_names=("seaweed_growth_rate",),
+    chunk_values=ENSEMBLE_CHUNK_VALUES,
+):
+    """
+    Calculates the growth rate for several sets of empirical constants at once.
+    The sets are evaluated in chunks, each in one broadcast computation on the
+    same environmental data, which can have any shape, e.g. (cells, months).
+    Only the returned factors are kept for all sets
+    Arguments:
+        salinity: the salinity of the water in ppt
+        temperature: the temperature of the water in °C
+        nitrate: the nitrate concentration in mmol/m³
+        ammonium: the ammonium concentration in mmol/m³
+        phosphate: the phosphate concentration in mmol/m³
+        illumination: the illumination of the algae in W/m²
+        parameter_sets: list of GrowthParameters
+        factor_names: the names from FACTOR_NAMES to return
+        chunk_values: the largest number of values of one factor in a chunk.
+            A chunk has at least one set
+    Returns:
+        a dictionary with the factor names as keys and arrays of the shape
+        (sets,) + the shape of the data as values
+    """
+    data = [
+        _as_float_array(values)
+        for values in [
+            salinity,
+            temperature,
+            nitrate,
+            ammonium,
+            phosphate,
+            illumination,
+        ]
+    ]
+    data_shape = np.broadcast_shapes(*[d.shape for d in data])
+    sets_per_chunk = max(1, chunk_values // max(1, int(np.prod(data_shape))))
+    results = {
+        name: np.empty((len(parameter_sets),) + data_shape) for name in factor_names
+    }
+    # The other factors are only needed for the calculation and reused for every chunk
+    names = FACTOR_NAMES if "seaweed_growth_rate" in results else FACTOR_NAMES[:-1]
+    scratch = {
+        name: np.empty((min(sets_per_chunk, len(parameter_sets)),) + data_shape)
+        for name in names
+        if name not in results
+    }
+    for start in range(0, len(parameter_sets), sets_per_chunk):
+        chunk = parameter_sets[start : start + sets_per_chunk]
+        out = {name: array[: len(chunk)] for name, array in scratch.items()}
+        out.update(
+            {name: array[start : start + len(chunk)] for name, array in results.items()}
+        )
+        calculate_factors_into(
+            *data, out=out, parameters=stack_parameters(chunk, len(data_shape))
+        )
+    return results
@@ -3,9 +3,40 @@ Main Interface
 """
 import pandas as pd
 
+from src.model import ocean_grid as oc_gr
 from src.model import ocean_section as oc_se
+from src.model import parallel
+from src.model import seaweed_growth as sg
 from src.processing import read_files
 
+# The attributes of an OceanSection that are set by each stage of the model
+STAGE_ATTRIBUTES = {
+    "calculate_factors": sg.FACTOR_NAMES[:-1],
+    "calculate_growth_rate": ["seaweed_growth_rate"],
+    "create_section_df": ["section_df"],
+}
+
+
+def run_section_stage(chunk):
+    """
+    Runs a stage of the model for a chunk of ocean sections
+    Arguments:
+        chunk: a tuple of the name of the stage and a list of ocean sections
+    Returns:
+        a list with a dictionary of the attributes the stage set for each section
+    """
+    stage, sections = chunk
+    results = []
+    for section in sections:
+        getattr(section, stage)()
+        results.append(
+            {
+                attribute: getattr(section, attribute)
+                for attribute in STAGE_ATTRIBUTES[stage]
+            }
+        )
+    return results
+
 
 class SeaweedModel:
     """
@@ -17,6 +48,8 @@ class SeaweedModel:
         self.sections = {}
         self.lme_or_grid = None
         self.data = None
+        # Only used for gridded data, which is stored as one OceanGrid
+        self.grid = None
 
     def add_data_by_lme(self, lme_names, file):
         """
@@ -38,61 +71,132 @@ class SeaweedModel:
             )
         self.lme_or_grid = "lme"
 
-    def add_data_by_grid(self, file):
+    def add_data_by_grid(
+        self, file, bounding_box=None, variables=None, month_range=None
+    ):
         """
         Adds data from the database to the model.
-        Based on a grid.
+        Based on a grid. All grid cells are stored in one OceanGrid,
+        the sections of the single cells are only created when accessed.
+        Only the data that matches the filters is loaded
         Arguments:
-            lat_lons: a list of lat_lon tuples
             file: the file to read the data from
+            bounding_box: only use the cells in (min_lat, max_lat, min_lon, max_lon)
+            variables: the environmental parameters to load. The factors can
+                only be calculated if all of them are loaded
+            month_range: only use the months between (first, last) since war
         Returns:
             None
         """
         # Make sure that the model is empty
         assert self.lme_or_grid is None
+        if variables is None:
+            variables = oc_gr.ENVIRONMENT_NAMES
         # Add the data to the model
-        data_grid = read_files.DataGrid(file)
+        data_grid = read_files.DataGrid(
+            file,
+            bounding_box=bounding_box,
+            variables=variables,
+            month_range=month_range,
+        )
+        lat_lons, data = data_grid.provide_data_array(variables)
+        self.grid = oc_gr.OceanGrid(
+            lat_lons,
+            data,
+            months_since_war=data_grid.months,
+            variables=variables,
+            cell_ids=data_grid.cell_ids,
+        )
         # Add the sections to the model
-        for lat_lon in data_grid.grid_dict.keys():
-            self.sections[lat_lon] = oc_se.OceanSection(
-                lat_lon, data_grid.provide_data_grid(lat_lon)
-            )
+        self.sections = oc_gr.GridSections(self.grid)
         self.lme_or_grid = "grid"
 
-    def calculate_factors(self):
+    def run_stage(self, stage, n_jobs=1, executor=None):
+        """
+        Runs a stage of the model for all ocean sections. With more than one
+        job the sections are split into chunks, which are run in worker
+        processes. The results are merged back in the order of the sections
+        Arguments:
+            stage: the name of the method of OceanSection to run
+            n_jobs: the number of worker processes. -1 uses all cores
+            executor: an existing concurrent.futures executor to use instead.
+                The sections are then split into n_jobs chunks
+        Returns:
+            None
+        """
+        sections = list(self.sections.values())
+        n_chunks = parallel.resolve_n_jobs(n_jobs)
+        if n_chunks == 1 and executor is None:
+            for section in sections:
+                getattr(section, stage)()
+            return
+        section_chunks = parallel.split_into_chunks(len(sections), n_chunks)
+        results = parallel.map_chunks(
+            run_section_stage,
+            [(stage, sections[chunk]) for chunk in section_chunks],
+            n_jobs=n_jobs,
+            executor=executor,
+        )
+        for chunk, chunk_results in zip(section_chunks, results):
+            for section, attributes in zip(sections[chunk], chunk_results):
+                for attribute, value in attributes.items():
+                    setattr(section, attribute, value)
+                if stage == "create_section_df":
+                    # The name of a dataframe is lost when it is pickled
+                    section.section_df.name = section.name
+
+    def calculate_factors(self, n_jobs=1, executor=None):
         """
         Calculates the growth factors for the model
         for all ocean sections (either grid or LME).
         Arguments:
-            None
+            n_jobs: the number of worker processes. -1 uses all cores
+            executor: an existing concurrent.futures executor to use instead
         Returns:
             None
         """
-        for section in self.sections.values():
-            section.calculate_factors()
+        if self.lme_or_grid == "grid":
+            self.grid.calculate_factors(n_jobs=n_jobs, executor=executor)
+            return
+        self.run_stage("calculate_factors", n_jobs=n_jobs, executor=executor)
 
-    def calculate_growth_rate(self):
+    def calculate_growth_rate(self, n_jobs=1, executor=None):
         """
         Calculates the growth rate for the model
         for all ocean sections (either grid or LME).
+        The grid calculates the growth rate together with the factors,
+        so for the grid this only checks that calculate_factors has run
         Arguments:
-            None
+            n_jobs: the number of worker processes. -1 uses all cores.
+                Only used for the LMEs, the grid runs calculate_factors
+                in parallel instead
+            executor: an existing concurrent.futures executor to use instead.
+                Only used for the LMEs
         Returns:
             None
         """
-        for section in self.sections.values():
-            section.calculate_growth_rate()
+        if self.lme_or_grid == "grid":
+            self.grid.calculate_growth_rate()
+            return
+        self.run_stage("calculate_growth_rate", n_jobs=n_jobs, executor=executor)
 
-    def create_section_dfs(self):
+    def create_section_dfs(self, n_jobs=1, executor=None):
         """
         Creates a dataframe for each section in the model.
+        The grid does not need this, as it creates its dataframes
+        directly from its arrays.
         Arguments:
-            None
+            n_jobs: the number of worker processes. -1 uses all cores.
+                Only used for the LMEs
+            executor: an existing concurrent.futures executor to use instead.
+                Only used for the LMEs
         Returns:
             None
         """
-        for section in self.sections.values():
-            section.create_section_df()
+        if self.lme_or_grid == "grid":
+            assert self.grid.factors is not None
+            return
+        self.run_stage("create_section_df", n_jobs=n_jobs, executor=executor)
 
     def construct_df_from_sections_for_date(self, months):
         """
@@ -105,6 +209,8 @@ class SeaweedModel:
         Returns:
             a dataframe for the values at the given month
         """
+        if self.lme_or_grid == "grid":
+            return self.grid.construct_df_from_sections_for_date(months)
         date_dict = {}
         for section_name, section_object in self.sections.items():
             date_dict[section_name] = section_object.select_section_df_date(months)
@@ -119,6 +225,8 @@ class SeaweedModel:
         Returns:
             a dataframe with the date as index and the sections as columns
         """
+        if self.lme_or_grid == "grid":
+            return self.grid.construct_df_for_parameter(parameter)
         parameter_dict = {}
         for section_name, section_object in self.sections.items():
             parameter_dict[section_name] = section_object.section_df[parameter]
@@ -0,0 +1,184 @@
+"""
+Reads the countries that are drawn on top of the maps. Parsing the shapefile
+takes longer than drawing the countries, so they are clipped to the extent
+of a map once and saved in a pickle next to the shapefile. The pickle is used
+as long as the shapefile does not change and is only read once per process
+"""
+import functools
+import os
+import pickle
+
+import numpy as np
+
+from src.processing.read_files import (
+    check_fingerprint,
+    file_fingerprint,
+    write_atomically,
+)
+
+COUNTRIES_FILE = os.path.join(
+    "data", "geospatial_information", "Countries", "ne_50m_admin_0_countries.shp"
+)
+# The ending of the clipped countries next to the shapefile
+BASEMAP_CACHE_ENDING = ".cache.pkl"
+# How far the clipped countries reach beyond the extent in degrees,
+# so the edges of the clipping are not on the map
+CLIP_MARGIN = 1
+
+
+def basemap_cache_file(file, extent):
+    """
+    The file the countries clipped to an extent are saved in
+    Arguments:
+        file: the shapefile of the countries
+        extent: the extent of the map as (west, east, south, north)
+    Returns:
+        the path of the pickle
+    """
+    return file + "_{}_{}_{}_{}".format(*extent) + BASEMAP_CACHE_ENDING
+
+
+def map_aspect(countries):
+    """
+    Calculates the aspect geopandas gives a map of the countries, so the
+    clipped countries are drawn with the same aspect as all countries
+    Arguments:
+        countries: a GeoDataFrame of the countries in longitude/latitude
+    Returns:
+        the ratio of the length of a degree of latitude and of longitude
+    """
+    south, north = countries.total_bounds[[1, 3]]
+    return 1 / np.cos(np.radians((south + north) / 2))
+
+
+def clip_countries(countries, extent, margin=CLIP_MARGIN):
+    """
+    Cuts the countries to the extent of a map
+    Arguments:
+        countries: a GeoDataFrame of the countries in longitude/latitude
+        extent: the extent of the map as (west, east, south, north)
+        margin: how far the countries reach beyond the extent in degrees
+    Returns:
+        a GeoDataFrame with only the geometry of the countries, in the
+        order of the shapefile
+    """
+    import geopandas as gpd
+    from shapely.geometry import box
+
+    west, east, south, north = extent
+    clipped = gpd.clip(
+        countries[["geometry"]],
+        box(west - margin, south - margin, east + margin, north + margin),
+    )
+    return clipped.sort_index()
+
+
+def read_basemap_cache(cache_file, file):
+    """
+    Reads the clipped countries if they still match the shapefile. If the
+    shapefile was only touched, the pickle is saved again with its new
+    modification time
+    Arguments:
+        cache_file: the pickle of the clipped countries
+        file: the shapefile they were created from
+    Returns:
+        the dictionary with the countries and the aspect or None if the
+        pickle is outdated or unreadable
+    """
+    try:
+        with open(cache_file, "rb") as handle:
+            cache = pickle.load(handle)
+        saved_fingerprint = cache["fingerprint"]
+        cache = {"countries": cache["countries"], "aspect": cache["aspect"]}
+        fingerprint = check_fingerprint(saved_fingerprint, file)
+    except (
+        OSError,
+        EOFError,
+        pickle.UnpicklingError,
+        AttributeError,
+        ImportError,
+        KeyError,
+        TypeError,
+    ):
+        # Also a pickle of an older version
+        return None
+    if fingerprint is None:
+        return None
+    if fingerprint != saved_fingerprint:
+        try:
+            write_basemap_cache(cache_file, file, cache, fingerprint)
+        except OSError:
+            pass
+    return cache
+
+
+def write_basemap_cache(cache_file, file, cache, fingerprint=None):
+    """
+    Saves the clipped countries together with the fingerprint of the
+    shapefile they were created from
+    Arguments:
+        cache_file: the pickle of the clipped countries
+        file: the shapefile the countries were read from
+        cache: the dictionary with the countries and the aspect
+        fingerprint: the fingerprint of the shapefile with the hash. If None,
+            it is calculated
+    Returns:
+        None
+    """
+    if fingerprint is None:
+        fingerprint = file_fingerprint(file)
+    cache = dict(cache, fingerprint=fingerprint)
+    write_atomically(
+        cache_file,
+        lambda handle: pickle.dump(cache, handle, protocol=pickle.HIGHEST_PROTOCOL),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def read_basemap(extent, file=COUNTRIES_FILE, use_cache=True):
+    """
+    Reads the countries clipped to the extent of a map, once per process
+    Arguments:
+        extent: the extent of the map as (west, east, south, north)
+        file: the shapefile of the countries
+        use_cache: if False, the shapefile is always read and no pickle is written
+    Returns:
+        a dictionary with the clipped countries and the aspect of the map
+    """
+    cache_file = basemap_cache_file(file, extent)
+    if use_cache and os.path.exists(cache_file):
+        cache = read_basemap_cache(cache_file, file)
+        if cache is not None:
+            return cache
+    import geopandas as gpd
+
+    countries = gpd.read_file(file)
+    cache = {
+        "countries": clip_countries(countries, extent),
+        "aspect": map_aspect(countries),
+    }
+    if use_cache:
+        try:
+            write_basemap_cache(cache_file, file, cache)
+        except OSError:
+            pass
+    return cache
+
+
+def draw_basemap(ax, extent):
+    """
+    Draws the countries on a map
+    Arguments:
+        ax: the matplotlib axes to draw on
+        extent: the extent of the map as (west, east, south, north)
+    Returns:
+        None
+    """
+    basemap = read_basemap(tuple(extent))
+    basemap["countries"].plot(
+        ax=ax,
+        color="lightgrey",
+        edgecolor="black",
+        linewidth=0.2,
+        aspect=basemap["aspect"],
+    )
@@ -9,23 +9,109 @@ import matplotlib.patches as mpatches
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.colors import LinearSegmentedColormap, ListedColormap
 from matplotlib.lines import Line2D
 
+from src.plotting.basemap import draw_basemap
+from src.plotting.raster import cell_raster, draw_image
+from src.plotting.render import render_figures
+from src.plotting.style import use_style
 from src.processing import read_files as rf
-from src.utilities import prepare_geometry, weighted_quantile
+from src.processing.scenario_store import SCENARIOS, read_scenario_store
+from src.utilities import area_weights, weighted_quantiles
 
-plt.style.use(
-    "https://raw.githubusercontent.com/allfed/ALLFED-matplotlib-style-sheet/main/ALLFED.mplstyle"
-)
 
+def grid_cell_areas(parameter_df, areas, cell_ids=None):
+    """
+    Finds the area of every grid cell of a result dataframe
+    Arguments:
+        parameter_df: a dataframe of a parameter with the (lat, lon) of the cells
+            as index
+        areas: the area table from read_files.read_area_file
+        cell_ids: the integer cell ids of the rows, as saved by postprocessing.grid.
+            If None, they are looked up by the coordinates of the index
+    Returns:
+        an array with the area of each row, nan for cells that are not in the area table
+    """
+    if cell_ids is None:
+        cell_ids = rf.lookup_cell_ids(areas, parameter_df.index)
+    assert len(cell_ids) == len(parameter_df), "one cell id per row is needed"
+    return area_weights(cell_ids, areas)
+
+
+def read_cell_ids(scenario, global_or_US):
+    """
+    Reads the cell ids of the result files of a scenario, if they were saved
+    Arguments:
+        scenario: the scenario of the results
+        global_or_US: a string of either "global" or "US" that indicates the scale
+    Returns:
+        an array with the cell id of each row of the results or None
+    """
+    file = (
+        "data"
+        + os.sep
+        + "interim_data"
+        + os.sep
+        + scenario
+        + os.sep
+        + "cell_ids_"
+        + global_or_US
+        + ".npy"
+    )
+    if os.path.isfile(file):
+        return np.load(file)
+    return None
+
+
+def plot_cluster_map(image, extent, clusters, cluster_colors, file):
+    """
+    Draws and saves the map of the clusters
+    Arguments:
+        image: the raster of the number of the cluster of every cell,
+            counted from 0 in the order of clusters
+        extent: the extent of the raster as (west, east, south, north)
+        clusters: the names of the clusters
+        cluster_colors: the color of every cluster
+        file: the path of the png file
+    Returns:
+        None, but saves the plot
+    """
+    use_style()
+    fig, ax = plt.subplots(figsize=(12, 12))
+    draw_image(
+        ax,
+        image,
+        extent,
+        cmap=ListedColormap(cluster_colors),
+        vmin=-0.5,
+        vmax=len(clusters) - 0.5,
+    )
+    # The countries are drawn on top, so they also cover the edge of the raster
+    draw_basemap(ax, extent)
+    ax.set_xlabel("Longitude")
+    ax.set_ylabel("Latitude")
+    ax.legend(
+        handles=[
+            mpatches.Patch(color=color, label=str(cluster))
+            for cluster, color in zip(clusters, cluster_colors)
+        ],
+        title="Cluster",
+    )
+    west, east, south, north = extent
+    ax.set_xlim(west, east)
+    ax.set_ylim(south, north)
+    plt.savefig(file, dpi=350, bbox_inches="tight")
+    plt.close(fig)
 
-def cluster_spatial(growth_df, global_or_US, scenario):
+
+def cluster_spatial(growth_df, global_or_US, scenario, raster=None):
     """
     Creates a spatial plot of the clusters
     Arguments:
         growth_df: a dataframe of the growth rate
         global_or_US: a string of either "global" or "US" that indicates the scale
+        raster: the CellRaster of the cells. If None, it is created
     Returns:
         None, but saves the plot
     """
@@ -36,27 +122,15 @@ def cluster_spatial(growth_df, global_or_US, scenario):
     custom_map = LinearSegmentedColormap.from_list("custom", colors, N=len(colors))
 
     print("Plotting cluster spatial")
-    growth_df = growth_df.loc[:, ["cluster", "geometry"]]
-    global_map = gpd.read_file(
-        "data/geospatial_information/Countries/ne_50m_admin_0_countries.shp"
-    )
-    growth_df.set_crs(epsg=4326, inplace=True)
-    growth_df.to_crs(global_map.crs, inplace=True)
-    growth_df["cluster"] = growth_df["cluster"].astype(str)
-    ax = growth_df.plot(column="cluster", legend=True, cmap=custom_map)
-    fig = plt.gcf()
-    fig.set_size_inches(12, 12)
-    global_map.plot(ax=ax, color="lightgrey", edgecolor="black", linewidth=0.2)
-    ax.set_xlabel("Longitude")
-    ax.set_ylabel("Latitude")
-    ax.get_legend().set_title("Cluster")
-    if global_or_US == "US":
-        ax.set_ylim(18, 55)
-        ax.set_xlim(-130, -65)
-    else:
-        ax.set_ylim(-75, 85)
-        ax.set_xlim(-180, 180)
-    plt.savefig(
+    if raster is None:
+        raster = cell_raster(growth_df, global_or_US)
+    # Give every cluster its own color, like a categorical column in geopandas
+    clusters, codes = np.unique(growth_df["cluster"], return_inverse=True)
+    plot_cluster_map(
+        raster.rasterize(codes),
+        raster.extent,
+        clusters,
+        custom_map(np.linspace(0, 1, len(clusters))),
         "results"
         + os.sep
         + "grid"
@@ -66,85 +140,107 @@ def cluster_spatial(growth_df, global_or_US, scenario):
         + "cluster_spatial_"
         + global_or_US
         + ".png",
-        dpi=350,
-        bbox_inches="tight",
     )
 
 
-def growth_rate_spatial_by_year(growth_df, global_or_US, scenario, optimal_growth_rate):
+def plot_growth_rate_map(image, extent, year, optimal_growth_rate, file):
+    """
+    Draws and saves the map of the mean growth rate of one year
+    Arguments:
+        image: the raster of the growth rate [% per day]
+        extent: the extent of the raster as (west, east, south, north)
+        year: the number of the year, starting at 1
+        optimal_growth_rate: the maximum growth rate [% per day]
+        file: the path of the png file
+    Returns:
+        None, but saves the plot
+    """
+    use_style()
+    fig, ax = plt.subplots()
+    image = draw_image(
+        ax, image, extent, cmap="viridis", vmin=0, vmax=optimal_growth_rate
+    )
+    fig.colorbar(
+        image, ax=ax, label="Mean Daily Growth Rate [%]", orientation="vertical"
+    )
+    draw_basemap(ax, extent)
+    ax.set_xlabel("Longitude")
+    ax.set_ylabel("Latitude")
+    ax.set_title("Year " + str(year))
+    west, east, south, north = extent
+    ax.set_xlim(west, east)
+    ax.set_ylim(south, north)
+    plt.savefig(file, dpi=350, bbox_inches="tight")
+    plt.close(fig)
+
+
+def growth_rate_spatial_by_year(
+    growth_df,
+    global_or_US,
+    scenario,
+    optimal_growth_rate,
+    raster=None,
+    n_jobs=1,
+    executor=None,
+):
     """
     Plots the growth rate by year. This includes the first
     three months without nuclear war, in the case of the first year
     Arguments:
         growth_df: a dataframe of the growth rate
+        global_or_US: a string of either "global" or "US" that indicates the scale
+        scenario: the scenario to plot
+        optimal_growth_rate: the maximum growth rate [% per day]
+        raster: the CellRaster of the cells. If None, it is created
+        n_jobs: the number of worker processes to draw the years in
+        executor: an existing concurrent.futures executor to use instead
     Returns:
         None, but saves the plot
     """
     print("Plotting growth rate by year")
-    global_map = gpd.read_file(
-        "data/geospatial_information/Countries/ne_50m_admin_0_countries.shp"
-    )
+    if raster is None:
+        raster = cell_raster(growth_df, global_or_US)
+    figures = []
     for year, i in enumerate(np.arange(-4, len(growth_df.columns) - 10, 12)):
         # Calculate the mean growth rate per year
-        growth_df_year = growth_df.loc[:, i + 1 : i + 12]
-        growth_df_year = growth_df_year.mean(axis=1)
-        growth_df_year = growth_df_year.to_frame()
-        growth_df_year.columns = ["growth_rate"]
+        growth_rate = growth_df.loc[:, i + 1 : i + 12].mean(axis=1)
         # Multiply it by optimal_growth_rate to get the actual growth rate
-        growth_df_year["growth_rate"] = (
-            growth_df_year["growth_rate"] * optimal_growth_rate
-        )
-        # Make it a geodataframe
-        growth_df_year["geometry"] = growth_df["geometry"]
-        growth_df_year = gpd.GeoDataFrame(growth_df_year)
-        growth_df_year.set_crs(epsg=4326, inplace=True)
-        growth_df_year.to_crs(global_map.crs, inplace=True)
-        # Plot it
-        ax = growth_df_year.plot(
-            column="growth_rate",
-            legend=True,
-            cmap="viridis",
-            vmin=0,
-            vmax=optimal_growth_rate,
-            legend_kwds={
-                "label": "Mean Daily Growth Rate [%]",
-                "orientation": "vertical",
-            },
-        )
-        global_map.plot(ax=ax, color="lightgrey", edgecolor="black", linewidth=0.2)
-        ax.set_xlabel("Longitude")
-        ax.set_ylabel("Latitude")
-        ax.set_title("Year " + str(year + 1))
-        if global_or_US == "US":
-            ax.set_ylim(18, 55)
-            ax.set_xlim(-130, -65)
-        else:
-            ax.set_ylim(-75, 85)
-            ax.set_xlim(-180, 180)
-        plt.savefig(
-            "results"
-            + os.sep
-            + "grid"
-            + os.sep
-            + scenario
-            + os.sep
-            + "growth_rate_spatial_year_"
-            + str(year + 1)
-            + "_"
-            + global_or_US
-            + ".png",
-            dpi=350,
-            bbox_inches="tight",
+        growth_rate = growth_rate.to_numpy() * optimal_growth_rate
+        # Only the raster of the year is sent to the worker
+        figures.append(
+            (
+                raster.rasterize(growth_rate),
+                raster.extent,
+                year + 1,
+                optimal_growth_rate,
+                "results"
+                + os.sep
+                + "grid"
+                + os.sep
+                + scenario
+                + os.sep
+                + "growth_rate_spatial_year_"
+                + str(year + 1)
+                + "_"
+                + global_or_US
+                + ".png",
+            )
         )
+    render_figures(plot_growth_rate_map, figures, n_jobs, executor)
 
 
 def cluster_timeseries_all_parameters_q_lines(
-    parameters, global_or_US, scenario, areas
+    parameters, global_or_US, scenario, areas, cell_ids=None
 ):
     """
     Plots line plots for all clusters and all parameters
     Arguments:
         parameters: a dictionary of dataframes of all parameters
+        global_or_US: a string of either "global" or "US" that indicates the scale
+        scenario: the scenario to plot
+        areas: the area table from read_files.read_area_file
+        cell_ids: the integer cell ids of the rows of the dataframes. If None,
+            they are looked up by the coordinates
     Returns:
         None, but saves the plot
     """
@@ -161,49 +257,32 @@ def cluster_timeseries_all_parameters_q_lines(
         "seaweed_growth_rate": "Total Growth Factor",
     }
     clusters = 4 if global_or_US == "US" else 3
+    use_style()
     fig, axes = plt.subplots(
         nrows=5, ncols=clusters, sharey=True, sharex=True, figsize=(12, 12)
     )
     i = 0
     # Iterate over all parameters and cluster to make all the subplots
     for parameter, parameter_df in parameters.items():
+        # The area of every cell, only the cells in the area table are used
+        cell_areas = grid_cell_areas(parameter_df, areas, cell_ids)
         j = 0
-        for cluster, cluster_df in parameter_df.groupby("cluster"):
-            # Combine area and cluster into one dataframe, merge by index
-            # Reset the index, so we can join on column instead of index
-            areas_reset = areas.reset_index()
-            cluster_df = cluster_df.reset_index()
-            # ROund the level and lat lon values to 4 decimals to make sure they match
-            # level just refers to the level of the multi index, but contains the same
-            # information as the lat lon
-            cluster_df["level_0"] = cluster_df["level_0"].round(4)
-            cluster_df["level_1"] = cluster_df["level_1"].round(4)
-            areas_reset["TLAT"] = areas_reset["TLAT"].round(4)
-            areas_reset["TLONG"] = areas_reset["TLONG"].round(4)
-            cluster_df = pd.merge(
-                cluster_df,
-                areas_reset,
-                left_on=["level_0", "level_1"],
-                right_on=["TLAT", "TLONG"],
-            )
+        for cluster, rows in parameter_df.groupby("cluster").indices.items():
+            rows = rows[~np.isnan(cell_areas[rows])]
+            cluster_weights = cell_areas[rows]
             # Calculate the area
-            cluster_area = cluster_df["TAREA"].sum()
-            # Remove the columsn we don't need anymore
-            area_weights = cluster_df["TAREA"]
-            cluster_df = cluster_df.drop(
-                columns=["cluster", "TLAT", "TLONG", "level_0", "level_1", "TAREA"]
-            )
+            cluster_area = cluster_weights.sum()
+            cluster_df = parameter_df.iloc[rows].drop(columns=["cluster"])
             ax = axes[i, j]
-            for q in np.arange(0.1, 0.6, 0.1):
-                # Calculate the quantiles for each months, weighted by area
-                q_up = cluster_df.apply(weighted_quantile, args=(area_weights, 1 - q))
-                q_down = cluster_df.apply(weighted_quantile, args=(area_weights, q))
-                # Transpose the dataframes so that the index is the month
-                q_up = q_up.transpose()
-                q_down = q_down.transpose()
+            q_lines = np.arange(0.1, 0.6, 0.1)
+            # Calculate all quantiles for each month at once, weighted by area
+            quantiles = weighted_quantiles(
+                cluster_df, cluster_weights, np.concatenate([q_lines, 1 - q_lines])
+            ).to_numpy()
+            for k, q in enumerate(q_lines):
                 # Make the quantiles into a series, so that we can plot them
-                q_up = pd.Series(q_up.iloc[:, 0])
-                q_down = pd.Series(q_down.iloc[:, 0])
+                q_up = pd.Series(quantiles[len(q_lines) + k], index=cluster_df.columns)
+                q_down = pd.Series(quantiles[k], index=cluster_df.columns)
                 ax.fill_between(
                     x=q_up.index.astype(float),
                     y1=q_down,
@@ -281,7 +360,7 @@ def compare_nw_scenarios(areas, optimal_growth_rate):
     Compares the results of the nuclear war scenarios as weigthed median
     Arguments:
         areas: A dataframe containing the area of each grid cell
-        eez: A eez around coastlines to only use those areas
+        optimal_growth_rate: The maximum growth rate [% per day]
     Returns:
         None
     """
@@ -296,57 +375,17 @@ def compare_nw_scenarios(areas, optimal_growth_rate):
         "5 Tg": "#E6FFE6",
         "Control": "#95c091",
     }
-    # have a list that is used to save the scenario results
-    median_weighted_list = []
-    for scenario in [str(i) + "tg" for i in [150, 47, 37, 27, 16, 5]] + ["control"]:
-        print("Starting scenario: " + scenario)
-        # Read the data
-        growth_df_scenario = pd.read_pickle(
-            "data"
-            + os.sep
-            + "interim_data"
-            + os.sep
-            + scenario
-            + os.sep
-            + "seaweed_growth_rate_global.pkl"
-        )
-        # Reset the index, so we can join on column instead of
-        areas_reset = areas.reset_index()
-        growth_df_scenario = growth_df_scenario.reset_index()
-        # Only use those grid cells that are between -45 and 45 degrees latitude
-        # This is because the areas above and below have 0 growth either way
-        growth_df_scenario = growth_df_scenario[growth_df_scenario["level_0"] > -45]
-        growth_df_scenario = growth_df_scenario[growth_df_scenario["level_0"] < 45]
-        # Combine area and cluster into one dataframe, merge by index
-        # Round the level and lat lon values to 4 decimals to make sure they match
-        # level just refers to the level of the multi index, but contains the same
-        # information as the lat lon
-        growth_df_scenario["level_0"] = growth_df_scenario["level_0"].round(4)
-        growth_df_scenario["level_1"] = growth_df_scenario["level_1"].round(4)
-        areas_reset["TLAT"] = areas_reset["TLAT"].round(4)
-        areas_reset["TLONG"] = areas_reset["TLONG"].round(4)
-        # Merge the dataframes, so that we have the area for each grid cell
-        # And remove the grid cells without data.
-        growth_df_scenario = pd.merge(
-            growth_df_scenario,
-            areas_reset,
-            left_on=["level_0", "level_1"],
-            right_on=["TLAT", "TLONG"],
-        )
-        # Remove the columsn we don't need anymore
-        areas_reset = growth_df_scenario["TAREA"]
-        # Drop additional geospacial columns if we used a eez
-        growth_df_scenario = growth_df_scenario.drop(
-            columns=["TLAT", "TLONG", "level_0", "level_1", "TAREA"]
-        )
-        # Calculate the weighted median
-        median_weighted = growth_df_scenario.apply(
-            weighted_quantile, args=(areas_reset, 0.5)
-        ).transpose()
-        # Save it in a list
-        median_weighted_list.append(median_weighted.values)
+    # Read the growth rate of all scenarios into one array
+    store = read_scenario_store("seaweed_growth_rate", "global", SCENARIOS)
+    # Only use those grid cells that are between -45 and 45 degrees latitude
+    # This is because the areas above and below have 0 growth either way
+    lats = store.lat_lons[:, 0]
+    # Calculate the weighted median of all scenarios at once
+    medians = store.weighted_quantiles(
+        store.cell_areas(areas), [0.5], (lats > -45) & (lats < 45)
+    )[:, 0, :]
     all_medians = pd.DataFrame(
-        np.concatenate(median_weighted_list, axis=1),
+        medians.T,
         columns=[
             "150 Tg",
             "47 Tg",
@@ -366,6 +405,7 @@ def compare_nw_scenarios(areas, optimal_growth_rate):
     # Add one to the years, so that the first year is 1
     all_medians.index = all_medians.index + 1
     # plot them all in the same subplot as bar plots
+    use_style()
     ax = all_medians.plot.bar(
         color=colors, edgecolor="black", linewidth=0.1, legend=False
     )
@@ -399,7 +439,9 @@ def compare_nw_scenarios(areas, optimal_growth_rate):
     )
 
 
-def compare_nutrient_subfactors(nitrate, ammonium, phosphate, scenario, areas):
+def compare_nutrient_subfactors(
+    nitrate, ammonium, phosphate, scenario, areas, cell_ids=None
+):
     """
     Takes the weighted average of the nutrient subfactors globally and plots them
     in the same plot to be able to compare them.
@@ -409,9 +451,12 @@ def compare_nutrient_subfactors(nitrate, ammonium, phosphate, scenario, areas):
         phosphate: The phosphate subfactor
         scenario: The scenario to plot
         areas: The areas of the grid cells
+        cell_ids: the integer cell ids of the rows of the subfactors. If None,
+            they are looked up by the coordinates
     Returns:
         None
     """
+    use_style()
     fig = plt.figure()
     ax = fig.add_subplot(111)
     # a list of 3 very distinct colors
@@ -419,30 +464,14 @@ def compare_nutrient_subfactors(nitrate, ammonium, phosphate, scenario, areas):
     labels = ["Nitrate Subfactor", "Ammonium Subfactor", "Phosphate Subfactor"]
     i = 0
     for nutrient in [nitrate, ammonium, phosphate]:
-        # Reset the index, so we can join on column
-        nutrient_reset = nutrient.reset_index()
-        areas_reset = areas.reset_index()
-        # Round the level and lat lon values to 4 decimals to make sure they match
-        nutrient_reset["level_0"] = nutrient_reset["level_0"].round(4)
-        nutrient_reset["level_1"] = nutrient_reset["level_1"].round(4)
-        areas_reset["TLAT"] = areas_reset["TLAT"].round(4)
-        areas_reset["TLONG"] = areas_reset["TLONG"].round(4)
-        # Merge the dataframes, so that we have the area for each grid cell
-        nutrient_merged = pd.merge(
-            nutrient_reset,
-            areas_reset,
-            left_on=["level_0", "level_1"],
-            right_on=["TLAT", "TLONG"],
-        )
-        # Only use the remaining cells
-        areas_reset = nutrient_merged["TAREA"]
-        # Remove the columsn we don't need anymore
-        nutrient_merged = nutrient_merged.drop(
-            columns=["TLAT", "TLONG", "level_0", "level_1", "TAREA", "cluster"]
-        )
+        # Only use the cells in the area table
+        cell_areas = grid_cell_areas(nutrient, areas, cell_ids)
+        rows = ~np.isnan(cell_areas)
+        areas_reset = cell_areas[rows]
+        nutrient_merged = nutrient[rows].drop(columns=["cluster"])
         # Calculate the weighted median
-        median_weighted = nutrient_merged.apply(
-            weighted_quantile, args=(areas_reset, 0.5)
+        median_weighted = weighted_quantiles(
+            nutrient_merged, areas_reset, [0.5]
         ).transpose()
         # Plot the median
         ax.plot(median_weighted, color="black", linewidth=2)
@@ -467,13 +496,15 @@ def compare_nutrient_subfactors(nitrate, ammonium, phosphate, scenario, areas):
     )
 
 
-def main(scenario, global_or_US, optimal_growth_rate):
+def main(scenario, global_or_US, optimal_growth_rate, n_jobs=1, executor=None):
     """
     Runs the other functions to read the data and make the plots
     Arguments:
         scenario: The scenario to plot
         global_or_US: Whether to plot the global or US scenario
         optimal_growth_rate: The maximum growth rate [% per day]
+        n_jobs: the number of worker processes to draw the yearly maps in
+        executor: an existing concurrent.futures executor to use instead
     Returns:
         None
     """
@@ -496,16 +527,20 @@ def main(scenario, global_or_US, optimal_growth_rate):
             + ".pkl"
         )
     )
+    # The cell ids of the rows, to find the area of each cell
+    cell_ids = read_cell_ids(scenario, global_or_US)
     # Add one to the cluster to make it start at 1
     growth_df["cluster"] = growth_df["cluster"] + 1
     # Make sure that each entry has a value
     num_nan = growth_df.isna().sum().sum()
     assert num_nan == 0, "The dataframe has {} nan".format(num_nan)
-    # Fix the geometry
-    growth_df = prepare_geometry(growth_df)
+    # Find the cell of every pixel of the maps once for all maps
+    raster = cell_raster(growth_df, global_or_US)
     # Make the spatial plots
-    cluster_spatial(growth_df, global_or_US, scenario)
-    growth_rate_spatial_by_year(growth_df, global_or_US, scenario, optimal_growth_rate)
+    cluster_spatial(growth_df, global_or_US, scenario, raster)
+    growth_rate_spatial_by_year(
+        growth_df, global_or_US, scenario, optimal_growth_rate, raster, n_jobs, executor
+    )
     # Read in the other parameters for the line plots
     parameters = {}
     parameter_names = [
@@ -543,6 +578,7 @@ def main(scenario, global_or_US, optimal_growth_rate):
         parameters["phosphate_subfactor"],
         scenario,
         areas,
+        cell_ids,
     )
     # Remove the subfactors from the parameters, as they aren't the main parameters and not needed
     # for the line plot
@@ -550,7 +586,9 @@ def main(scenario, global_or_US, optimal_growth_rate):
     del parameters["ammonium_subfactor"]
     del parameters["phosphate_subfactor"]
     # Plot the timeseries that compares how the parameters change over time
-    cluster_timeseries_all_parameters_q_lines(parameters, global_or_US, scenario, areas)
+    cluster_timeseries_all_parameters_q_lines(
+        parameters, global_or_US, scenario, areas, cell_ids
+    )
 
 
 if __name__ == "__main__":
@@ -563,8 +601,8 @@ if __name__ == "__main__":
     # This is done seperately, as it needs to access all scenarios
     compare_nw_scenarios(areas, optimal_growth_rate)
     # Create the US plots
-    main("150tg", "US", optimal_growth_rate)
-    # Iterate over all scenarios
+    main("150tg", "US", optimal_growth_rate, n_jobs=-1)
+    # The scenarios are plotted one after another, as each needs all its
+    # parameters in memory. The yearly maps of a scenario are drawn at the same time
     for scenario in [str(i) + "tg" for i in [150, 5, 16, 27, 37, 47]] + ["control"]:
-        print("\nPreparing scenario: " + scenario)
-        main(scenario, "global", optimal_growth_rate)
+        main(scenario, "global", optimal_growth_rate, n_jobs=-1)
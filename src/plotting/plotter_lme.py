@@ -3,37 +3,33 @@ import os
 import matplotlib.pyplot as plt
 import pandas as pd
 
-# Import the ALLFED stle
-plt.style.use(
-    "https://raw.githubusercontent.com/allfed/ALLFED-matplotlib-style-sheet/main/ALLFED.mplstyle"
-)
+from src.plotting.render import render_figures
+from src.plotting.style import use_style
 
 
-def cluster_timeseries_all_parameters_q_lines(parameters, lme, lme_dict):
+def plot_lme_parameters(lme_parameters, lme_name):
     """
-    Plots line plots for all clusters and all parameters
+    Plots the time series of all parameters of one LME
     Arguments:
-        parameters: a dictionary of dataframes of all parameters
-        lme: an integer of the LME number
-        lme_dict: a dictionary of LME names
+        lme_parameters: a dictionary with the parameters as keys and a
+            dataframe with the first 120 months of the LME as values
+        lme_name: the name of the LME
     Returns:
         None, but saves the plot
     """
+    use_style()
     fig, axes = plt.subplots(
         nrows=5, ncols=1, sharey=True, sharex=True, figsize=(10, 10)
     )
     i = 0
-    for parameter, parameter_df in parameters.items():
+    for parameter, lme_df in lme_parameters.items():
         ax = axes[i]
-        lme_df = pd.DataFrame(parameter_df.loc[lme, :])
-        # Only do 120 months, 124 because it starts at -3
-        lme_df = lme_df.iloc[3:124, :]
         lme_df.plot(kind="line", ax=ax, legend=False, color="black", linewidth=2)
         lme_df.plot(kind="line", ax=ax, legend=False, linewidth=1.5)
         ax.set_ylabel(parameter)
         ax.set_xlabel("Months since nuclear war")
         if i == 0:
-            ax.set_title("LME: " + lme_dict[lme])
+            ax.set_title("LME: " + lme_name)
         i += 1
 
     plt.savefig(
@@ -42,7 +38,7 @@ def cluster_timeseries_all_parameters_q_lines(parameters, lme, lme_dict):
         + "lme"
         + os.sep
         + "cluster_timeseries_all_param_q_lines_LME_"
-        + lme_dict[lme]
+        + lme_name
         + ".png",
         dpi=200,
         bbox_inches="tight",
@@ -50,6 +46,37 @@ def cluster_timeseries_all_parameters_q_lines(parameters, lme, lme_dict):
     plt.close()
 
 
+def select_lme(parameters, lme):
+    """
+    Selects the time series of one LME from all parameters
+    Arguments:
+        parameters: a dictionary of dataframes of all parameters
+        lme: an integer of the LME number
+    Returns:
+        a dictionary with the parameters as keys and a dataframe with
+        the first 120 months of the LME as values
+    """
+    lme_parameters = {}
+    for parameter, parameter_df in parameters.items():
+        lme_df = pd.DataFrame(parameter_df.loc[lme, :])
+        # Only do 120 months, 124 because it starts at -3
+        lme_parameters[parameter] = lme_df.iloc[3:124, :]
+    return lme_parameters
+
+
+def cluster_timeseries_all_parameters_q_lines(parameters, lme, lme_dict):
+    """
+    Plots line plots for all clusters and all parameters
+    Arguments:
+        parameters: a dictionary of dataframes of all parameters
+        lme: an integer of the LME number
+        lme_dict: a dictionary of LME names
+    Returns:
+        None, but saves the plot
+    """
+    plot_lme_parameters(select_lme(parameters, lme), lme_dict[lme])
+
+
 def create_name_dict():
     """
     Creates a lookup dictionary for the LME names
@@ -70,11 +97,12 @@ def create_name_dict():
     return dict(zip(lme_df.LME_NUMBER, lme_df.LME_NAME))
 
 
-def main():
+def main(n_jobs=1, executor=None):
     """
     Runs the other functions to read the data and make the plots
     Arguments:
-        None
+        n_jobs: the number of worker processes to draw the LMEs in
+        executor: an existing concurrent.futures executor to use instead
     Returns:
         None
     """
@@ -100,9 +128,14 @@ def main():
             )
         )
     lme_dict = create_name_dict()
-    for lme in range(1, 67):
-        cluster_timeseries_all_parameters_q_lines(parameters, lme, lme_dict)
+    # Only the time series of one LME are sent to the worker that plots it
+    render_figures(
+        plot_lme_parameters,
+        [(select_lme(parameters, lme), lme_dict[lme]) for lme in range(1, 67)],
+        n_jobs,
+        executor,
+    )
 
 
 if __name__ == "__main__":
-    main()
+    main(n_jobs=-1)
@@ -15,10 +15,7 @@ from src.model.seaweed_growth import (
     salinity_single_value,
     temperature_single_value,
 )
-
-plt.style.use(
-    "https://raw.githubusercontent.com/allfed/ALLFED-matplotlib-style-sheet/main/ALLFED.mplstyle"
-)
+from src.plotting.style import use_style
 
 
 def plot_factors():
@@ -29,6 +26,7 @@ def plot_factors():
     Returns:
         None
     """
+    use_style()
     # Contains the ranges and the units
     factor_dict = {
         "Illumination": (140, "W per m²"),
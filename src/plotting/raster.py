@@ -0,0 +1,137 @@
+"""
+Draws values of the grid cells as one raster image instead of one shape per
+cell. The POP grid is curvilinear and only the centers of the ocean cells are
+known, so every pixel of a regular longitude/latitude raster shows the value
+of the nearest cell. Which cell that is only depends on the cells and the
+extent, so it is calculated once and reused for every map of the same cells
+"""
+import numpy as np
+from scipy.spatial import cKDTree
+
+# The extent of the maps as (west, east, south, north) in degrees
+EXTENTS = {"US": (-130, -65, 18, 55), "global": (-180, 180, -75, 85)}
+
+
+def unit_vectors(lats, lons):
+    """
+    Converts coordinates to points on the unit sphere, so distances do not
+    depend on the latitude and do not jump at the date line
+    Arguments:
+        lats: the latitudes in degrees
+        lons: the longitudes in degrees
+    Returns:
+        an array of the shape (points, 3)
+    """
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+    lons = np.radians(np.asarray(lons, dtype=np.float64))
+    return np.stack(
+        [np.cos(lats) * np.cos(lons), np.cos(lats) * np.sin(lons), np.sin(lats)],
+        axis=-1,
+    )
+
+
+def chord_to_degrees(chord):
+    """
+    Converts the straight distance between points on the unit sphere
+    to the angle between them
+    Arguments:
+        chord: the distance on the unit sphere
+    Returns:
+        the angle in degrees
+    """
+    return np.degrees(2 * np.arcsin(np.minimum(chord / 2, 1)))
+
+
+def draw_image(ax, image, extent, **kwargs):
+    """
+    Draws a raster of the cells as one image
+    Arguments:
+        ax: the matplotlib axes to draw on
+        image: the raster from CellRaster.rasterize
+        extent: the extent of the raster as (west, east, south, north)
+        kwargs: passed on to imshow, e.g. cmap, vmin and vmax
+    Returns:
+        the AxesImage
+    """
+    return ax.imshow(
+        image, extent=extent, origin="lower", interpolation="nearest", **kwargs
+    )
+
+
+class CellRaster:
+    """
+    Maps the grid cells onto a regular longitude/latitude raster. Pixels that
+    are farther away from the nearest cell than max_distance stay empty
+    """
+
+    def __init__(self, lats, lons, extent, resolution=0.25, max_distance=None):
+        """
+        Arguments:
+            lats: the latitude of the center of every cell
+            lons: the longitude of the center of every cell, either from
+                -180 to 180 or from 0 to 360
+            extent: the extent of the raster as (west, east, south, north)
+            resolution: the size of a pixel in degrees
+            max_distance: the largest distance of a pixel from the center of
+                its cell in degrees. None uses the typical distance to the
+                fourth nearest cell, so the gaps between the cells are filled
+                even if they are longer in one direction than in the other
+        """
+        self.extent = extent
+        self.n_cells = len(lats)
+        west, east, south, north = extent
+        n_columns = int(np.ceil((east - west) / resolution))
+        n_rows = int(np.ceil((north - south) / resolution))
+        self.shape = (n_rows, n_columns)
+        tree = cKDTree(unit_vectors(lats, lons))
+        if max_distance is None:
+            # The first is the cell itself, the next two are usually its
+            # neighbours along the short side and the fourth along the long side
+            spacing, _ = tree.query(unit_vectors(lats, lons), k=min(5, len(lats)))
+            max_distance = np.median(chord_to_degrees(spacing[:, -1]))
+        pixel_lons = west + (np.arange(n_columns) + 0.5) * (east - west) / n_columns
+        pixel_lats = south + (np.arange(n_rows) + 0.5) * (north - south) / n_rows
+        pixel_lons, pixel_lats = np.meshgrid(pixel_lons, pixel_lats)
+        distances, cells = tree.query(unit_vectors(pixel_lats, pixel_lons))
+        self.cells = cells
+        self.empty = chord_to_degrees(distances) > max_distance
+
+    def rasterize(self, values):
+        """
+        Creates the raster of the values of the cells
+        Arguments:
+            values: the value of every cell
+        Returns:
+            a masked array of the shape of the raster, with the southern
+            row first
+        """
+        values = np.asarray(values)
+        assert len(values) == self.n_cells, "one value per cell is needed"
+        return np.ma.masked_array(values[self.cells], mask=self.empty)
+
+    def draw(self, ax, values, **kwargs):
+        """
+        Draws the values of the cells as one image
+        Arguments:
+            ax: the matplotlib axes to draw on
+            values: the value of every cell
+            kwargs: passed on to imshow, e.g. cmap, vmin and vmax
+        Returns:
+            the AxesImage
+        """
+        return draw_image(ax, self.rasterize(values), self.extent, **kwargs)
+
+
+def cell_raster(growth_df, global_or_US, resolution=0.25):
+    """
+    Creates the raster for the cells of a result dataframe
+    Arguments:
+        growth_df: a dataframe with the (lat, lon) of the cells as index
+        global_or_US: a string of either "global" or "US" that indicates the scale
+        resolution: the size of a pixel in degrees
+    Returns:
+        a CellRaster
+    """
+    lats = growth_df.index.get_level_values(0)
+    lons = growth_df.index.get_level_values(1)
+    return CellRaster(lats, lons, EXTENTS[global_or_US], resolution)
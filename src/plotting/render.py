@@ -0,0 +1,49 @@
+"""
+Renders independent figures in worker processes. Every figure is made by a
+function that only gets the arrays it draws, so the workers do not need
+the whole dataframes
+"""
+import multiprocessing
+
+import matplotlib
+import matplotlib.pyplot as plt
+
+from src.model.parallel import map_chunks
+
+
+def render_figure(job):
+    """
+    Makes one figure. Workers draw with the Agg backend, as they have no display.
+    The files are the same as with the backend of the main process, as
+    png files are always written with Agg
+    Arguments:
+        job: a tuple of the function that makes and saves the figure
+            and the tuple of its arguments
+    Returns:
+        None
+    """
+    function, arguments = job
+    if multiprocessing.parent_process() is not None:
+        matplotlib.use("Agg")
+    function(*arguments)
+    plt.close("all")
+
+
+def render_figures(function, arguments, n_jobs=1, executor=None):
+    """
+    Makes a figure for every set of arguments. With more than one job or an
+    executor, the figures are made at the same time in worker processes
+    Arguments:
+        function: the function that makes and saves one figure
+        arguments: a list with a tuple of arguments for every figure
+        n_jobs: the number of worker processes. -1 uses all cores
+        executor: an existing concurrent.futures executor to use instead
+    Returns:
+        None
+    """
+    map_chunks(
+        render_figure,
+        [(function, figure_arguments) for figure_arguments in arguments],
+        n_jobs=n_jobs,
+        executor=executor,
+    )
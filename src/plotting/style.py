@@ -0,0 +1,65 @@
+"""
+Applies the ALLFED matplotlib style from the local copy of the style sheet
+in this folder. Plotting never downloads anything. If the copy is missing,
+the plots use the default style of matplotlib. To get the copy, run once
+on a machine with internet:
+python -m src.plotting.style
+"""
+import functools
+import os
+import urllib.request
+import warnings
+
+from src.processing.read_files import write_atomically
+
+STYLE_URL = (
+    "https://raw.githubusercontent.com/allfed/ALLFED-matplotlib-style-sheet/"
+    "main/ALLFED.mplstyle"
+)
+# The copy of the style sheet that is used for all plots
+STYLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ALLFED.mplstyle")
+
+
+def download_style(file=STYLE_FILE, url=STYLE_URL, timeout=30):
+    """
+    Downloads the style sheet and saves it as the local copy
+    Arguments:
+        file: the path to save the style sheet to
+        url: the URL of the style sheet
+        timeout: how long to wait for the server in seconds
+    Returns:
+        None
+    """
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        content = response.read()
+    write_atomically(file, lambda handle: handle.write(content))
+
+
+@functools.lru_cache(maxsize=None)
+def use_style(file=STYLE_FILE):
+    """
+    Applies the style sheet. It is only read once per process, calling
+    this again does nothing. If the style sheet does not exist, the default
+    style of matplotlib is kept and a warning tells how to get it
+    Arguments:
+        file: the path of the style sheet
+    Returns:
+        True if the style sheet was applied, False otherwise
+    """
+    if not os.path.isfile(file):
+        warnings.warn(
+            "The ALLFED style sheet {} does not exist, the plots use the default "
+            "style. Run python -m src.plotting.style to download it".format(
+                os.path.basename(file)
+            )
+        )
+        return False
+    import matplotlib.pyplot as plt
+
+    plt.style.use(file)
+    return True
+
+
+if __name__ == "__main__":
+    download_style()
+    print("Saved the style sheet to " + STYLE_FILE)
@@ -0,0 +1,743 @@
+"""
+Clusters the time series of the gridded model results by their shape
+with k-means and dynamic time warping
+"""
+import copy
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import FunctionTransformer, MinMaxScaler
+from sklearn.utils import check_random_state
+from tslearn.clustering import TimeSeriesKMeans
+from tslearn.utils import to_time_series_dataset
+
+from src.model.parallel import map_chunks, resolve_n_jobs
+from src.processing.dtw import (
+    envelope,
+    lb_keogh,
+    sakoe_chiba_alignment,
+    sakoe_chiba_dtw,
+)
+from src.processing.read_files import write_atomically
+
+# The number of time series that are assigned to the clusters at once
+CHUNK_SIZE = 20000
+
+
+def piecewise_aggregate(values, n_segments):
+    """
+    Reduces time series to fewer time steps with the piecewise aggregate
+    approximation (PAA). The months are split into segments of (almost) the
+    same length and every segment is replaced by its mean
+    Arguments:
+        values: an array of the shape (series, months)
+        n_segments: the number of segments, at most the number of months
+    Returns:
+        an array of the shape (series, n_segments)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_months = values.shape[1]
+    assert 0 < n_segments <= n_months, "Between 1 and {} segments".format(n_months)
+    bounds = np.arange(n_segments + 1) * n_months // n_segments
+    return np.add.reduceat(values, bounds[:-1], axis=1) / np.diff(bounds)
+
+
+def create_scaler(n_segments=None):
+    """
+    Creates the transformation of the time series before the clustering
+    Arguments:
+        n_segments: None keeps every month. A number reduces the time series
+            to this many segments with piecewise_aggregate after scaling
+    Returns:
+        a MinMaxScaler or a pipeline of a MinMaxScaler and the PAA
+    """
+    if n_segments is None:
+        return MinMaxScaler()
+    return make_pipeline(
+        MinMaxScaler(),
+        FunctionTransformer(piecewise_aggregate, kw_args={"n_segments": n_segments}),
+    )
+
+
+def scale_time_series(growth_df, n_segments=None):
+    """
+    Scales every month of the time series to the range between 0 and 1
+    and converts them into a tslearn dataset
+    Arguments:
+        growth_df: pandas.DataFrame with one time series per row
+        n_segments: if not None, the time series are reduced to this many
+            segments with piecewise_aggregate
+    Returns:
+        timeseries_ds: the tslearn dataset of the shape (cells, months, 1)
+            or (cells, n_segments, 1)
+        scaler: the fitted MinMaxScaler or pipeline from create_scaler
+    """
+    # Make sure that each entry has a value
+    assert growth_df.notna().all().all(), "The dataframe has nan"
+    scaler = create_scaler(n_segments)
+    timeseries_ds = to_time_series_dataset(scaler.fit_transform(growth_df))
+    return timeseries_ds, scaler
+
+
+def fit_time_series_kmeans(
+    timeseries_ds,
+    n_clusters,
+    n_jobs=None,
+    random_state=None,
+    sakoe_chiba_radius=None,
+):
+    """
+    Clusters a scaled tslearn dataset with k-means and dynamic time warping
+    Arguments:
+        timeseries_ds: the dataset from scale_time_series
+        n_clusters: int - the number of clusters to use
+        n_jobs: the number of jobs tslearn uses for the DTW distances
+        random_state: the seed of the initialization. None uses the global seed
+        sakoe_chiba_radius: None uses unconstrained DTW with tslearn. A number
+            of months uses BandedTimeSeriesKMeans with this band instead
+    Returns:
+        labels: the labels for each time series
+        km: TimeSeriesKMeans or BandedTimeSeriesKMeans - the k-means object
+    """
+    if sakoe_chiba_radius is not None:
+        km = BandedTimeSeriesKMeans(
+            n_clusters=n_clusters,
+            sakoe_chiba_radius=sakoe_chiba_radius,
+            random_state=random_state,
+        )
+        return km.fit_predict(timeseries_ds), km
+    km = TimeSeriesKMeans(
+        n_clusters=n_clusters, metric="dtw", n_jobs=n_jobs, random_state=random_state
+    )
+    labels = km.fit_predict(timeseries_ds)
+    return labels, km
+
+
+def cluster_time_series(
+    growth_df,
+    n_clusters,
+    global_or_US,
+    random_state=None,
+    sakoe_chiba_radius=None,
+    sample_size=None,
+    weights=None,
+    n_segments=None,
+):
+    """
+    Clusters the time series like time_series_analysis and also returns
+    the scaler, so the clusters can be saved with save_cluster_model
+    Arguments:
+        growth_df: pandas.DataFrame
+        n_clusters: int - the number of clusters to use
+        global_or_US: "global" uses all cores for the DTW distances
+        random_state: the seed of the initialization. None uses the global seed
+        sakoe_chiba_radius: the radius of the band of the DTW in months, or in
+            segments with n_segments. None uses unconstrained DTW
+        sample_size: if not None, the centroids are only fitted on this many
+            cells and the others are assigned to them, see sample_then_assign
+        weights: the area of every cell for the sample
+        n_segments: if not None, the time series are reduced to this many
+            segments with piecewise_aggregate before the clustering
+    Returns:
+        labels: the labels for each time series
+        km: the k-means object
+        scaler: the scaler from create_scaler the time series were scaled with
+    """
+    if sample_size is not None and sample_size < len(growth_df):
+        return sample_then_assign(
+            growth_df,
+            n_clusters,
+            global_or_US,
+            sample_size,
+            weights,
+            random_state=random_state,
+            sakoe_chiba_radius=sakoe_chiba_radius,
+            n_segments=n_segments,
+        )
+    timeseries_ds, scaler = scale_time_series(growth_df, n_segments)
+    cores = None if global_or_US == "US" else -1  # define the cores to use
+    labels, km = fit_time_series_kmeans(
+        timeseries_ds, n_clusters, cores, random_state, sakoe_chiba_radius
+    )
+    return labels, km, scaler
+
+
+def time_series_analysis(
+    growth_df,
+    n_clusters,
+    global_or_US,
+    random_state=None,
+    sakoe_chiba_radius=None,
+    sample_size=None,
+    weights=None,
+    n_segments=None,
+):
+    """
+    Does time series analysis on the dataframe
+    All the time serieses are clustered based on their
+    overall shape using k-means
+    Inspired by this article:
+    https://www.kaggle.com/code/izzettunc/introduction-to-time-series-clustering/notebook
+    Arguments:
+        growth_df: pandas.DataFrame
+        n_clusters: int - the number of clusters to use
+        global_or_US: "global" uses all cores for the DTW distances
+        random_state: the seed of the initialization. None uses the global seed
+        sakoe_chiba_radius: the radius of the band of the DTW in months, or in
+            segments with n_segments. None uses unconstrained DTW
+        sample_size: if not None, the centroids are only fitted on this many
+            cells and the others are assigned to them, see sample_then_assign
+        weights: the area of every cell for the sample
+        n_segments: if not None, the time series are reduced to this many
+            segments with piecewise_aggregate before the clustering
+    Returns:
+        labels: list - the labels for each time series
+        km: TimeSeriesKMeans - the k-means object
+    """
+    labels, km, _ = cluster_time_series(
+        growth_df,
+        n_clusters,
+        global_or_US,
+        random_state,
+        sakoe_chiba_radius,
+        sample_size,
+        weights,
+        n_segments,
+    )
+    return labels, km
+
+
+def save_cluster_model(file, km, scaler):
+    """
+    Saves the centroids and the scaler of a clustering, so other scenarios
+    can be assigned to the same clusters with load_cluster_model. tslearn keeps
+    the whole dataset it was fitted on, which is not needed to predict, so
+    it is not saved
+    Arguments:
+        file: the path of the pickle file
+        km: the fitted k-means object
+        scaler: the scaler from create_scaler the time series were scaled with
+    Returns:
+        None
+    """
+    if getattr(km, "_X_fit", None) is not None:
+        km = copy.copy(km)
+        km._X_fit = None
+    write_atomically(
+        file, lambda handle: pickle.dump({"km": km, "scaler": scaler}, handle)
+    )
+
+
+def load_cluster_model(file):
+    """
+    Reads a clustering saved with save_cluster_model
+    Arguments:
+        file: the path of the pickle file
+    Returns:
+        km: the fitted k-means object
+        scaler: the scaler from create_scaler the time series were scaled with
+    """
+    with open(file, "rb") as handle:
+        model = pickle.load(handle)
+    return model["km"], model["scaler"]
+
+
+def stratified_sample(lats, weights, sample_size, n_strata=18, random_state=None):
+    """
+    Draws a sample of grid cells that covers all latitudes. The cells are
+    split into bands of the same width in latitude. Every band gets a share
+    of the sample in proportion to its area and the cells within a band are
+    drawn with a probability in proportion to their area
+    Arguments:
+        lats: the latitude of every cell
+        weights: the area of every cell. Cells with nan get the mean area.
+            None gives all cells the same weight
+        sample_size: the number of cells to draw
+        n_strata: the number of latitude bands
+        random_state: the seed of the sample
+    Returns:
+        the sorted positions of the drawn cells
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    if sample_size >= len(lats):
+        return np.arange(len(lats))
+    if weights is None:
+        weights = np.ones(len(lats))
+    weights = np.asarray(weights, dtype=np.float64)
+    assert (weights > 0).any(), "None of the cells has an area to sample by"
+    weights = np.where(np.isnan(weights), np.nanmean(weights), weights)
+    random_state = check_random_state(random_state)
+    edges = np.linspace(lats.min(), lats.max(), n_strata + 1)
+    strata = np.clip(np.searchsorted(edges, lats, side="right") - 1, 0, n_strata - 1)
+    stratum_weights = np.bincount(strata, weights=weights, minlength=n_strata)
+    stratum_sizes = np.bincount(strata[weights > 0], minlength=n_strata)
+    sample_size = min(sample_size, stratum_sizes.sum())
+    # Split the sample by the area of the bands. What the full bands cannot
+    # take is split between the others again
+    counts = np.zeros(n_strata, dtype=np.int64)
+    while counts.sum() < sample_size:
+        room = counts < stratum_sizes
+        remaining = sample_size - counts.sum()
+        shares = remaining * np.where(room, stratum_weights, 0)
+        shares /= stratum_weights[room].sum()
+        added = np.minimum(np.floor(shares).astype(np.int64), stratum_sizes - counts)
+        if added.sum() == 0:
+            # The bands with the largest remainders get one more
+            order = np.argsort(-np.where(room, shares, -np.inf), kind="stable")
+            added[order[:remaining]] = 1
+        counts += added
+    # Starts with an empty array, so a sample of size 0 is empty as well
+    sample = [np.empty(0, dtype=np.int64)]
+    for stratum in np.flatnonzero(counts):
+        cells = np.flatnonzero((strata == stratum) & (weights > 0))
+        probabilities = weights[cells] / weights[cells].sum()
+        sample.append(
+            random_state.choice(cells, counts[stratum], replace=False, p=probabilities)
+        )
+    return np.sort(np.concatenate(sample))
+
+
+def assign_in_chunks(km, growth_df, scaler, chunk_size=CHUNK_SIZE):
+    """
+    Assigns time series to the nearest centroid of a fitted k-means object.
+    Only one chunk of the time series is scaled at a time, so the memory
+    does not grow with the number of cells
+    Arguments:
+        km: the fitted k-means object
+        growth_df: pandas.DataFrame with one time series per row
+        scaler: the scaler from create_scaler the centroids were fitted with
+        chunk_size: the number of time series assigned at once
+    Returns:
+        the label of every time series
+    """
+    labels = np.empty(len(growth_df), dtype=np.int64)
+    for start in range(0, len(growth_df), chunk_size):
+        chunk = growth_df.iloc[start : start + chunk_size]
+        labels[start : start + len(chunk)] = km.predict(
+            to_time_series_dataset(scaler.transform(chunk))
+        )
+    return labels
+
+
+def sample_then_assign(
+    growth_df,
+    n_clusters,
+    global_or_US,
+    sample_size,
+    weights=None,
+    chunk_size=CHUNK_SIZE,
+    random_state=None,
+    sakoe_chiba_radius=None,
+    n_segments=None,
+):
+    """
+    Fits the centroids on a sample of the cells and assigns all cells to
+    them afterwards, so the time of the fit depends on the size of the sample
+    and not on the size of the grid. The cells are scaled with the minimum
+    and maximum of all cells, like in time_series_analysis
+    Arguments:
+        growth_df: pandas.DataFrame with one time series per row and the
+            (lat, lon) of the cells as index
+        n_clusters: int - the number of clusters to use
+        global_or_US: "global" uses all cores for the DTW distances
+        sample_size: the number of cells to fit the centroids on
+        weights: the area of every cell, to draw large cells more often
+        chunk_size: the number of cells assigned at once
+        random_state: the seed of the sample and the initialization
+        sakoe_chiba_radius: the radius of the band of the DTW in months, or in
+            segments with n_segments. None uses unconstrained DTW
+        n_segments: if not None, the time series are reduced to this many
+            segments with piecewise_aggregate before the clustering
+    Returns:
+        labels: the labels for each time series
+        km: the k-means object fitted on the sample
+        scaler: the scaler from create_scaler fitted on all cells
+    """
+    # Make sure that each entry has a value
+    assert growth_df.notna().all().all(), "The dataframe has nan"
+    scaler = create_scaler(n_segments).fit(growth_df)
+    sample = stratified_sample(
+        growth_df.index.get_level_values(0),
+        weights,
+        sample_size,
+        random_state=random_state,
+    )
+    cores = None if global_or_US == "US" else -1  # define the cores to use
+    _, km = fit_time_series_kmeans(
+        to_time_series_dataset(scaler.transform(growth_df.iloc[sample])),
+        n_clusters,
+        cores,
+        random_state,
+        sakoe_chiba_radius,
+    )
+    return assign_in_chunks(km, growth_df, scaler, chunk_size), km, scaler
+
+
+def fit_elbow_chunk(chunk):
+    """
+    Clusters the dataset for one number of clusters of the elbow sweep
+    Arguments:
+        chunk: a tuple of the scaled dataset, the number of clusters, the
+            number of jobs for tslearn, the random state and the band radius
+    Returns:
+        a dictionary with the number of clusters, the inertia, the number
+        of iterations and the time the fit took in seconds
+    """
+    timeseries_ds, n_clusters, n_jobs, random_state, sakoe_chiba_radius = chunk
+    start = time.perf_counter()
+    _, km = fit_time_series_kmeans(
+        timeseries_ds, n_clusters, n_jobs, random_state, sakoe_chiba_radius
+    )
+    return {
+        "n_clusters": n_clusters,
+        "inertia": km.inertia_,
+        "n_iter": km.n_iter_,
+        "fit_seconds": time.perf_counter() - start,
+    }
+
+
+def elbow_sweep(
+    growth_df,
+    cluster_numbers,
+    global_or_US,
+    n_jobs=1,
+    executor=None,
+    random_state=42,
+    sakoe_chiba_radius=None,
+    n_segments=None,
+):
+    """
+    Clusters the time series for several numbers of clusters. The data is
+    scaled only once for all of them. With more than one job, the numbers of
+    clusters are fitted at the same time in worker processes, starting with
+    the largest, as they take the longest
+    Arguments:
+        growth_df: pandas.DataFrame with one time series per row
+        cluster_numbers: the numbers of clusters to try
+        global_or_US: "global" uses all cores for the DTW distances if the
+            numbers of clusters are fitted one after another
+        n_jobs: the number of worker processes. -1 uses all cores
+        executor: an existing concurrent.futures executor to use instead
+        random_state: the seed of the initialization, the same for every
+            number of clusters, so the results do not depend on the order
+        sakoe_chiba_radius: the radius of the band of the DTW in months, or in
+            segments with n_segments. None uses unconstrained DTW
+        n_segments: if not None, the time series are reduced to this many
+            segments with piecewise_aggregate before the clustering
+    Returns:
+        a dataframe with the numbers of clusters as index and the inertia,
+        number of iterations and the time of the fit in seconds as columns
+    """
+    timeseries_ds, _ = scale_time_series(growth_df, n_segments)
+    cluster_numbers = sorted(cluster_numbers, reverse=True)
+    parallel = executor is not None or resolve_n_jobs(n_jobs) > 1
+    # Only parallelize the DTW distances if the sweep itself runs in one process
+    cores = None if parallel or global_or_US == "US" else -1
+    results = map_chunks(
+        fit_elbow_chunk,
+        [
+            (timeseries_ds, n_clusters, cores, random_state, sakoe_chiba_radius)
+            for n_clusters in cluster_numbers
+        ],
+        n_jobs=n_jobs,
+        executor=executor,
+    )
+    sweep_df = pd.DataFrame(results).set_index("n_clusters").sort_index()
+    sweep_df["inertia"] = sweep_df["inertia"].astype(np.float64)
+    return sweep_df
+
+
+def resolution_diagnostics(
+    growth_df,
+    n_clusters,
+    segment_counts,
+    global_or_US,
+    random_state=42,
+    sakoe_chiba_radius=None,
+):
+    """
+    Shows how much the clustering loses when the time series are reduced with
+    piecewise_aggregate and how much time it saves. Every number of segments
+    is compared with the clustering of all months
+    Arguments:
+        growth_df: pandas.DataFrame with one time series per row
+        n_clusters: int - the number of clusters to use
+        segment_counts: the numbers of segments to try
+        global_or_US: "global" uses all cores for the DTW distances
+        random_state: the seed of the initialization, the same for all
+        sakoe_chiba_radius: the radius of the band of the DTW. None uses
+            unconstrained DTW
+    Returns:
+        a dataframe with the number of segments as index and as columns the
+        time of the fit in seconds, the inertia, the root mean squared error
+        of the approximation of the scaled time series and the share of time
+        series in the same cluster as with all months
+    """
+    scaled = MinMaxScaler().fit_transform(growth_df)
+    n_months = scaled.shape[1]
+    results = []
+    reference_labels = None
+    for n_segments in [None] + [n for n in segment_counts if n != n_months]:
+        start = time.perf_counter()
+        labels, km = time_series_analysis(
+            growth_df,
+            n_clusters,
+            global_or_US,
+            random_state=random_state,
+            sakoe_chiba_radius=sakoe_chiba_radius,
+            n_segments=n_segments,
+        )
+        fit_seconds = time.perf_counter() - start
+        if n_segments is None:
+            n_segments = n_months
+            reference_labels = labels
+        # Stretch the segments back to months to compare them with the months
+        bounds = np.arange(n_segments + 1) * n_months // n_segments
+        approximation = np.repeat(
+            piecewise_aggregate(scaled, n_segments), np.diff(bounds), axis=1
+        )
+        results.append(
+            {
+                "n_segments": n_segments,
+                "fit_seconds": fit_seconds,
+                "inertia": km.inertia_,
+                "approximation_error": np.sqrt(((scaled - approximation) ** 2).mean()),
+                "label_agreement": label_agreement(labels, reference_labels),
+            }
+        )
+    return pd.DataFrame(results).set_index("n_segments")
+
+
+class BandedTimeSeriesKMeans:
+    """
+    k-means for time series with DTW restricted to a Sakoe-Chiba band and
+    DBA centroids, like TimeSeriesKMeans with metric="dtw". To assign the
+    series, the LB_Keogh lower bound to every centroid is calculated first.
+    The DTW distance to a centroid is only computed if its lower bound is
+    smaller than the best distance found so far, as the others cannot be closer.
+    All distances and warping paths are computed for many series at once
+    """
+
+    def __init__(
+        self,
+        n_clusters=3,
+        sakoe_chiba_radius=12,
+        max_iter=50,
+        tol=1e-6,
+        max_iter_barycenter=30,
+        tol_barycenter=1e-5,
+        random_state=None,
+    ):
+        """
+        Arguments:
+            n_clusters: int - the number of clusters
+            sakoe_chiba_radius: the number of months a month can be shifted
+            max_iter: the maximum number of iterations of k-means
+            tol: stop when the inertia changes less than this
+            max_iter_barycenter: the maximum number of iterations of DBA
+            tol_barycenter: stop DBA when its cost changes less than this
+            random_state: the seed of the k-means++ initialization
+        """
+        self.n_clusters = n_clusters
+        self.sakoe_chiba_radius = sakoe_chiba_radius
+        self.max_iter = max_iter
+        self.tol = tol
+        self.max_iter_barycenter = max_iter_barycenter
+        self.tol_barycenter = tol_barycenter
+        self.random_state = random_state
+        self.cluster_centers_ = None
+        self.labels_ = None
+        self.inertia_ = None
+        self.n_iter_ = 0
+        # How many DTW distances of the assignments were computed and skipped
+        self.n_dtw_computed_ = 0
+        self.n_dtw_pruned_ = 0
+
+    def _initialize(self, series, random_state):
+        """
+        Chooses the first centroids with k-means++
+        Arguments:
+            series: an array of the shape (series, months)
+            random_state: a numpy RandomState
+        Returns:
+            an array of the shape (clusters, months)
+        """
+        centers = [series[random_state.randint(len(series))]]
+        squared_distances = (
+            sakoe_chiba_dtw(series, centers[0], self.sakoe_chiba_radius) ** 2
+        )
+        for _ in range(1, self.n_clusters):
+            total = squared_distances.sum()
+            if total > 0:
+                center = random_state.choice(len(series), p=squared_distances / total)
+            else:
+                center = random_state.randint(len(series))
+            centers.append(series[center])
+            squared_distances = np.minimum(
+                squared_distances,
+                sakoe_chiba_dtw(series, centers[-1], self.sakoe_chiba_radius) ** 2,
+            )
+        return np.array(centers)
+
+    def _assign(self, series, centers):
+        """
+        Finds the closest centroid of every series, skipping the centroids
+        whose LB_Keogh lower bound is larger than the best distance so far
+        Arguments:
+            series: an array of the shape (series, months)
+            centers: an array of the shape (clusters, months)
+        Returns:
+            labels: the closest centroid of every series
+            distances: the DTW distance to the closest centroid
+        """
+        lower, upper = envelope(centers, self.sakoe_chiba_radius)
+        bounds = np.stack(
+            [lb_keogh(series, lower[k], upper[k]) for k in range(len(centers))],
+            axis=1,
+        )
+        # Try the centroids with the smallest lower bound first
+        order = np.argsort(bounds, axis=1, kind="stable")
+        labels = np.full(len(series), -1)
+        distances = np.full(len(series), np.inf)
+        rows = np.arange(len(series))
+        for rank in range(len(centers)):
+            candidates = order[:, rank]
+            needed = np.flatnonzero(bounds[rows, candidates] < distances)
+            self.n_dtw_pruned_ += len(series) - len(needed)
+            if len(needed) == 0:
+                self.n_dtw_pruned_ += len(series) * (len(centers) - rank - 1)
+                break
+            self.n_dtw_computed_ += len(needed)
+            candidate_distances = sakoe_chiba_dtw(
+                series[needed],
+                centers[candidates[needed]],
+                self.sakoe_chiba_radius,
+            )
+            # Equal distances go to the centroid with the smaller index
+            better = (candidate_distances < distances[needed]) | (
+                (candidate_distances == distances[needed])
+                & (candidates[needed] < labels[needed])
+            )
+            distances[needed[better]] = candidate_distances[better]
+            labels[needed[better]] = candidates[needed[better]]
+        return labels, distances
+
+    def _update_centroids(self, series, labels, centers):
+        """
+        Moves every centroid to the DBA barycenter of its series. The
+        iterations of all clusters are done at the same time
+        Arguments:
+            series: an array of the shape (series, months)
+            labels: the cluster of every series
+            centers: the current centroids of the shape (clusters, months)
+        Returns:
+            the new centroids
+        """
+        centers = centers.copy()
+        n_months = series.shape[1]
+        previous_costs = np.full(self.n_clusters, np.inf)
+        active = np.ones(self.n_clusters, dtype=bool)
+        for _ in range(self.max_iter_barycenter):
+            members = np.flatnonzero(active[labels])
+            if len(members) == 0:
+                break
+            member_labels = labels[members]
+            distances, pairs, months_x, months_y = sakoe_chiba_alignment(
+                series[members], centers[member_labels], self.sakoe_chiba_radius
+            )
+            costs = np.bincount(
+                member_labels, weights=distances**2, minlength=self.n_clusters
+            ) / np.maximum(np.bincount(member_labels, minlength=self.n_clusters), 1)
+            # Every month of the centroid is the mean of the months matched with it
+            positions = member_labels[pairs] * n_months + months_y
+            values = series[members[pairs], months_x]
+            size = self.n_clusters * n_months
+            sums = np.bincount(positions, weights=values, minlength=size)
+            counts = np.bincount(positions, minlength=size)
+            new_centers = (sums / np.maximum(counts, 1)).reshape(centers.shape)
+            centers[active] = new_centers[active]
+            # Stop the clusters whose cost does not improve anymore
+            active &= (np.abs(previous_costs - costs) >= self.tol_barycenter) & (
+                costs <= previous_costs
+            )
+            previous_costs = costs
+        return centers
+
+    def fit(self, X):
+        """
+        Clusters the time series
+        Arguments:
+            X: a tslearn dataset of the shape (series, months, 1)
+        Returns:
+            self
+        """
+        series = np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+        random_state = check_random_state(self.random_state)
+        self.n_dtw_computed_ = 0
+        self.n_dtw_pruned_ = 0
+        centers = self._initialize(series, random_state)
+        previous_inertia = np.inf
+        for iteration in range(self.max_iter):
+            labels, distances = self._assign(series, centers)
+            # Give empty clusters the series that is farthest from its centroid
+            for cluster in np.setdiff1d(np.arange(self.n_clusters), labels):
+                farthest = np.argmax(distances)
+                labels[farthest] = cluster
+                distances[farthest] = 0
+                centers[cluster] = series[farthest]
+            inertia = (distances**2).mean()
+            centers = self._update_centroids(series, labels, centers)
+            if np.abs(previous_inertia - inertia) < self.tol:
+                break
+            previous_inertia = inertia
+        self.n_iter_ = iteration + 1
+        self.cluster_centers_ = centers[:, :, np.newaxis]
+        self.labels_, distances = self._assign(series, centers)
+        self.inertia_ = (distances**2).mean()
+        return self
+
+    def predict(self, X):
+        """
+        Finds the closest centroid of time series
+        Arguments:
+            X: a tslearn dataset of the shape (series, months, 1)
+        Returns:
+            the label of every series
+        """
+        series = np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+        return self._assign(series, self.cluster_centers_[:, :, 0])[0]
+
+    def fit_predict(self, X):
+        """
+        Clusters the time series and returns their labels
+        Arguments:
+            X: a tslearn dataset of the shape (series, months, 1)
+        Returns:
+            the label of every series
+        """
+        return self.fit(X).labels_
+
+
+def label_agreement(labels, reference_labels):
+    """
+    Calculates how many series are in the same cluster in two clusterings.
+    The clusters are matched with each other so that the most series agree,
+    as the numbering of the clusters is arbitrary
+    Arguments:
+        labels: the labels of the first clustering
+        reference_labels: the labels of the second clustering
+    Returns:
+        the share of series that are in matching clusters, between 0 and 1
+    """
+    labels = np.asarray(labels)
+    reference_labels = np.asarray(reference_labels)
+    _, label_codes = np.unique(labels, return_inverse=True)
+    _, reference_codes = np.unique(reference_labels, return_inverse=True)
+    contingency = np.zeros((label_codes.max() + 1, reference_codes.max() + 1))
+    np.add.at(contingency, (label_codes, reference_codes), 1)
+    rows, columns = linear_sum_assignment(contingency, maximize=True)
+    return contingency[rows, columns].sum() / len(labels)
@@ -0,0 +1,178 @@
+"""
+Dynamic time warping restricted to a Sakoe-Chiba band. The distances are
+computed for many pairs of time series of the same length at once, so the
+loops only go over the months and not over the time series
+"""
+import numpy as np
+
+# The number of pairs of time series computed at once, to limit the memory
+BLOCK_SIZE = 8192
+# The steps of the warping path, stored for the backtracking
+DIAGONAL, UP, LEFT = 0, 1, 2
+
+
+def _band(i, length, radius):
+    """
+    The first and last column of the band in row i
+    """
+    return max(0, i - radius), min(length - 1, i + radius)
+
+
+def _sakoe_chiba_block(x, y, radius, with_steps):
+    """
+    Computes the DTW distance of a block of pairs of time series
+    Arguments:
+        x: an array of the shape (pairs, months)
+        y: an array of the shape (pairs, months)
+        radius: the radius of the Sakoe-Chiba band, at most months - 1
+        with_steps: if True, also returns the steps of the warping paths
+    Returns:
+        the DTW distance of every pair and the steps of the shape
+        (months, 2 * radius + 1, pairs) or None
+    """
+    n_pairs, length = x.shape
+    # Every row is one month, so the pairs of a month are next to each other
+    x = np.ascontiguousarray(x.T)
+    y = np.ascontiguousarray(y.T)
+    previous = np.full((length, n_pairs), np.inf)
+    current = np.full((length, n_pairs), np.inf)
+    cost = np.empty(n_pairs)
+    steps = None
+    if with_steps:
+        steps = np.zeros((length, 2 * radius + 1, n_pairs), dtype=np.int8)
+    for i in range(length):
+        first, last = _band(i, length, radius)
+        previous_first, previous_last = _band(i - 1, length, radius)
+        for j in range(first, last + 1):
+            np.subtract(x[i], y[j], out=cost)
+            np.multiply(cost, cost, out=cost)
+            # The ways to reach the cell that are in the band, in the order
+            # tslearn prefers them if they are equally good
+            ways = []
+            if i > 0 and previous_first <= j - 1 <= previous_last:
+                ways.append((DIAGONAL, previous[j - 1]))
+            if i > 0 and previous_first <= j <= previous_last:
+                ways.append((UP, previous[j]))
+            if j > first:
+                ways.append((LEFT, current[j - 1]))
+            if not ways:
+                current[j] = cost
+            elif with_steps:
+                accumulated = np.stack([way[1] for way in ways])
+                choice = accumulated.argmin(axis=0)
+                codes = np.array([way[0] for way in ways], dtype=np.int8)
+                steps[i, j - i + radius] = codes[choice]
+                np.add(
+                    cost,
+                    np.take_along_axis(accumulated, choice[np.newaxis], axis=0)[0],
+                    out=current[j],
+                )
+            else:
+                best = ways[0][1]
+                for _, accumulated in ways[1:]:
+                    best = np.minimum(best, accumulated)
+                np.add(cost, best, out=current[j])
+        previous, current = current, previous
+    return np.sqrt(previous[length - 1]), steps
+
+
+def sakoe_chiba_dtw(x, y, radius):
+    """
+    Computes the DTW distance between pairs of time series, where month i
+    can only be matched with the months i - radius to i + radius. Like in
+    tslearn, the distance is the square root of the summed squared differences
+    along the best warping path
+    Arguments:
+        x: an array of the shape (pairs, months)
+        y: an array of the shape (pairs, months) or (months,) to compare
+            all series of x with the same series
+        radius: the radius of the Sakoe-Chiba band
+    Returns:
+        an array with the distance of every pair
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.broadcast_to(np.asarray(y, dtype=np.float64), x.shape)
+    radius = min(radius, x.shape[1] - 1)
+    distances = np.empty(len(x))
+    for start in range(0, len(x), BLOCK_SIZE):
+        block = slice(start, start + BLOCK_SIZE)
+        distances[block] = _sakoe_chiba_block(x[block], y[block], radius, False)[0]
+    return distances
+
+
+def sakoe_chiba_alignment(x, y, radius):
+    """
+    Computes the DTW distance between pairs of time series and the months of
+    y that every month of x is matched with on the best warping path
+    Arguments:
+        x: an array of the shape (pairs, months)
+        y: an array of the shape (pairs, months)
+        radius: the radius of the Sakoe-Chiba band
+    Returns:
+        distances: an array with the distance of every pair
+        pairs: the pair of every step of all warping paths
+        months_x: the month of x of every step
+        months_y: the month of y of every step
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    length = x.shape[1]
+    radius = min(radius, length - 1)
+    distances = np.empty(len(x))
+    all_pairs, all_months_x, all_months_y = [], [], []
+    for start in range(0, len(x), BLOCK_SIZE):
+        block = slice(start, start + BLOCK_SIZE)
+        distances[block], steps = _sakoe_chiba_block(x[block], y[block], radius, True)
+        # Follow all paths back from the last month at the same time
+        n_pairs = len(distances[block])
+        i = np.full(n_pairs, length - 1)
+        j = np.full(n_pairs, length - 1)
+        active = np.arange(n_pairs)
+        while len(active) > 0:
+            all_pairs.append(active + start)
+            all_months_x.append(i[active].copy())
+            all_months_y.append(j[active].copy())
+            active = active[(i[active] > 0) | (j[active] > 0)]
+            step = steps[i[active], j[active] - i[active] + radius, active]
+            i[active] -= step != LEFT
+            j[active] -= step != UP
+    return (
+        distances,
+        np.concatenate(all_pairs),
+        np.concatenate(all_months_x),
+        np.concatenate(all_months_y),
+    )
+
+
+def envelope(y, radius):
+    """
+    Computes the upper and lower envelope of time series for LB_Keogh
+    Arguments:
+        y: an array of the shape (series, months)
+        radius: the radius of the Sakoe-Chiba band
+    Returns:
+        lower: the minimum of every series within the radius of each month
+        upper: the maximum of every series within the radius of each month
+    """
+    y = np.asarray(y, dtype=np.float64)
+    padded = np.pad(y, ((0, 0), (radius, radius)), mode="edge")
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * radius + 1, axis=1)
+    return windows.min(axis=2), windows.max(axis=2)
+
+
+def lb_keogh(x, lower, upper):
+    """
+    Computes the LB_Keogh lower bound of the DTW distance between every
+    series of x and a series with the given envelope. The DTW distance
+    with the same radius as the envelope is never smaller than the bound
+    Arguments:
+        x: an array of the shape (series, months)
+        lower: the lower envelope of the other series, of the shape (months,)
+        upper: the upper envelope of the other series, of the shape (months,)
+    Returns:
+        an array with the lower bound for every series of x
+    """
+    x = np.asarray(x, dtype=np.float64)
+    above = np.maximum(x - upper, 0)
+    below = np.maximum(lower - x, 0)
+    return np.sqrt((above**2 + below**2).sum(axis=1))
@@ -3,93 +3,171 @@ This file takes the output of the seaweed model and does time series analysis wi
 """
 import os
 import random
+import time
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
-from tslearn.clustering import TimeSeriesKMeans
-from tslearn.utils import to_time_series_dataset
 
 from src.model.seaweed_model import SeaweedModel
-
-# Import the ALLFED stle
-plt.style.use(
-    "https://raw.githubusercontent.com/allfed/ALLFED-matplotlib-style-sheet/main/ALLFED.mplstyle"
-)
+from src.plotting.style import use_style
+from src.processing import read_files
+from src.utilities import area_weights
 
 # Make sure that everything is reproducible
 random.seed(42)
 np.random.seed(42)
 
 
-def get_parameter_dataframe(parameter, path, file):
+def run_grid_model(path, file):
     """
-    Initializes the seaweed model and returns the dataframe with the parameter
-    for all the grid sections
+    Initializes and runs the seaweed model once for the gridded data
     Arguments:
-        parameter: the parameter to construct the dataframe for
         path: The path to the file
         file: The file name
     Returns:
-        df: pandas.DataFrame
+        the SeaweedModel with the factors and growth rate calculated
     """
     model = SeaweedModel()
     model.add_data_by_grid(path + os.sep + file)
     model.calculate_factors()
     model.calculate_growth_rate()
     model.create_section_dfs()
-    param_df = model.construct_df_for_parameter(parameter)
-    return param_df
+    return model
+
+
+def get_parameter_dataframes(parameters, path, file):
+    """
+    Initializes and runs the seaweed model once and returns the dataframes
+    with the parameters for all the grid sections
+    Arguments:
+        parameters: list of the parameters to construct the dataframes for
+        path: The path to the file
+        file: The file name
+    Returns:
+        dictionary with the parameters as keys and the pandas.DataFrame
+        of each parameter as values
+    """
+    model = run_grid_model(path, file)
+    return {
+        parameter: model.construct_df_for_parameter(parameter)
+        for parameter in parameters
+    }
+
+
+def get_parameter_dataframe(parameter, path, file):
+    """
+    Initializes the seaweed model and returns the dataframe with the parameter
+    for all the grid sections
+    Arguments:
+        parameter: the parameter to construct the dataframe for
+        path: The path to the file
+        file: The file name
+    Returns:
+        df: pandas.DataFrame
+    """
+    return get_parameter_dataframes([parameter], path, file)[parameter]
+
+
+def read_cell_areas(scenario, global_or_US, growth_df):
+    """
+    Finds the area of every cell of the result files of a scenario. Uses the
+    cell ids saved by grid if they exist and the coordinates otherwise
+    Arguments:
+        scenario: the scenario of the data
+        global_or_US: a string of either "global" or "US" that indicates the scale
+        growth_df: the results with the (lat, lon) of the cells as index
+    Returns:
+        an array with the area of each row, nan for cells that are not in the area table
+    """
+    areas = read_files.read_area_file(
+        "data" + os.sep + "geospatial_information" + os.sep + "grid", "area_grid.csv"
+    )
+    file = (
+        "data"
+        + os.sep
+        + "interim_data"
+        + os.sep
+        + scenario
+        + os.sep
+        + "cell_ids_"
+        + global_or_US
+        + ".npy"
+    )
+    if os.path.isfile(file):
+        cell_ids = np.load(file)
+    else:
+        cell_ids = read_files.lookup_cell_ids(areas, growth_df.index)
+    return area_weights(cell_ids, areas)
 
 
-def time_series_analysis(growth_df, n_clusters, global_or_US):
+def time_series_analysis(growth_df, n_clusters, global_or_US, **kwargs):
     """
-    Does time series analysis on the dataframe
-    All the time serieses are clustered based on their
-    overall shape using k-means
-    Inspired by this article:
-    https://www.kaggle.com/code/izzettunc/introduction-to-time-series-clustering/notebook
+    Clusters the time series, see clustering.time_series_analysis,
+    which this calls. Kept here, as it was defined here before
     Arguments:
         growth_df: pandas.DataFrame
         n_clusters: int - the number of clusters to use
+        global_or_US: "global" uses all cores for the DTW distances
+        kwargs: passed on to clustering.time_series_analysis
     Returns:
         labels: list - the labels for each time series
         km: TimeSeriesKMeans - the k-means object
     """
-    # Make sure that each entry has a value
-    assert growth_df.notna().all().all(), "The dataframe has nan"
-    # Normalize the data
-    scaler = MinMaxScaler()
-    growth_df_scaled = pd.DataFrame(
-        scaler.fit_transform(growth_df), columns=growth_df.columns
+    from src.processing import clustering
+
+    return clustering.time_series_analysis(
+        growth_df, n_clusters, global_or_US, **kwargs
     )
-    # A good rule of thumb is choosing k as the square root of the number
-    # of points in the training data set in kNN
-    cores = None if global_or_US == "US" else -1  # define the cores to use
-    km = TimeSeriesKMeans(n_clusters=n_clusters, metric="dtw", n_jobs=cores)
-    timeseries_ds = to_time_series_dataset(growth_df_scaled)
-    labels = km.fit_predict(timeseries_ds)
-    return labels, km
 
 
-def elbow_method(growth_df, max_clusters, global_or_US, scenario):
+def elbow_method(
+    growth_df,
+    max_clusters,
+    global_or_US,
+    scenario,
+    n_jobs=1,
+    executor=None,
+    sakoe_chiba_radius=None,
+    n_segments=None,
+):
     """
     Finds the optimal number of clusters using the elbow method
     https://predictivehacks.com/k-means-elbow-method-code-for-python/
+    The numbers of clusters share the scaled data and can be fitted at the same time
     Arguments:
         growth_df: pandas.DataFrame
         max_clusters: int - the maximum number of clusters to try
+        global_or_US: a string of either "global" or "US" that indicates the scale
+        scenario: the scenario of the data
+        n_jobs: the number of worker processes to fit the numbers of clusters in
+        executor: an existing concurrent.futures executor to use instead
+        sakoe_chiba_radius: the radius of the band of the DTW in months.
+            None uses unconstrained DTW
+        n_segments: if not None, the time series are reduced to this many
+            segments before the clustering
     Returns:
-        None, just plots the elbow method and saves it
+        None, just plots the elbow method and saves it together with the
+        inertias and the time each number of clusters took
     """
+    from src.processing.clustering import elbow_sweep
+
     # Find the optimal number of clusters
-    inertias = {}
-    for i in range(2, max_clusters):
-        print("Trying {} clusters".format(i))
-        labels, km = time_series_analysis(growth_df, i, global_or_US)
-        inertias[i] = km.inertia_
-    inertias_df = pd.DataFrame.from_dict(inertias, orient="index")
+    print("Trying {} to {} clusters".format(2, max_clusters - 1))
+    start = time.perf_counter()
+    inertias_df = elbow_sweep(
+        growth_df,
+        range(2, max_clusters),
+        global_or_US,
+        n_jobs,
+        executor,
+        sakoe_chiba_radius=sakoe_chiba_radius,
+        n_segments=n_segments,
+    )
+    print(
+        "Elbow method took {:.1f} s, the fits {:.1f} s together".format(
+            time.perf_counter() - start, inertias_df["fit_seconds"].sum()
+        )
+    )
     inertias_df.to_csv(
         "data"
         + os.sep
@@ -102,8 +180,9 @@ def elbow_method(growth_df, max_clusters, global_or_US, scenario):
         + ".csv",
         sep=";",
     )
-    ax = inertias_df.plot(legend=False, linewidth=2.5, color="black")
-    ax = inertias_df.plot(legend=False, linewidth=2)
+    use_style()
+    ax = inertias_df["inertia"].plot(legend=False, linewidth=2.5, color="black")
+    ax = inertias_df["inertia"].plot(legend=False, linewidth=2)
     ax.set_xlabel("Number of clusters")
     ax.set_ylabel("Distortion")
     ax.set_title("Elbow method")
@@ -171,12 +250,32 @@ def lme(scenario):
             )
 
 
-def grid(scenario, global_or_US, with_elbow_method=False):
+def grid(
+    scenario,
+    global_or_US,
+    with_elbow_method=False,
+    sakoe_chiba_radius=None,
+    sample_size=None,
+    cluster_model_scenario=None,
+    n_segments=None,
+):
     """
     Calculates growth rate and all the factors for the grid
     and saves it in files appropriate for the plotting functions
     Arguments:
-        None
+        scenario: the scenario of the data
+        global_or_US: a string of either "global" or "US" that indicates the scale
+        with_elbow_method: if True, also runs the elbow method
+        sakoe_chiba_radius: the radius of the band of the DTW of the clustering
+            in months. None uses unconstrained DTW
+        sample_size: if not None, the clusters are fitted on an area weighted
+            sample of this many cells and all other cells are assigned to them
+        cluster_model_scenario: if not None and not the scenario itself, the
+            cells are assigned to the clusters saved by grid for this scenario
+            instead of fitting new ones, so the clusters are the same in both
+        n_segments: if not None, the time series are reduced to this many
+            segments with the piecewise aggregate approximation before the
+            clustering, e.g. 40 for seasons of 3 months
     Returns:
         None
     """
@@ -206,12 +305,22 @@ def grid(scenario, global_or_US, with_elbow_method=False):
     ):
         print("Creating the dataframe")
         path = "data" + os.sep + "interim_data" + os.sep + scenario
-        file = "data_gridded_all_parameters_" + global_or_US + ".pkl"
-        # Get all the parameters
+        file = "data_gridded_all_parameters_" + global_or_US
+        # Use the columnar format if it exists, as it is faster to read
+        if not os.path.isdir(path + os.sep + file):
+            file = file + ".pkl"
+        # Run the model once and get all the parameters from it
+        model = run_grid_model(path, file)
+        if model.grid.cell_ids is not None:
+            # The cell ids of the rows of the result files, to look up their area
+            np.save(
+                path + os.sep + "cell_ids_" + global_or_US + ".npy",
+                model.grid.cell_ids,
+            )
         for parameter in parameters:
             print("Getting parameter {}".format(parameter))
             # Transpose the dataframe so that the time serieses are the columns
-            growth_df = get_parameter_dataframe(parameter, path, file).transpose()
+            growth_df = model.construct_df_for_parameter(parameter).transpose()
             growth_df.to_pickle(
                 "data"
                 + os.sep
@@ -237,11 +346,32 @@ def grid(scenario, global_or_US, with_elbow_method=False):
             + global_or_US
             + ".pkl"
         )
-        elbow_method(growth_df, 7, global_or_US, scenario)
+        elbow_method(
+            growth_df,
+            7,
+            global_or_US,
+            scenario,
+            sakoe_chiba_radius=sakoe_chiba_radius,
+            n_segments=n_segments,
+        )
     # elbow method says 4 is the optimal number of clusters for US
     # and 3 for the whole world
     number_of_clusters = 3 if global_or_US == "global" else 4
-    # Check if the files already exist
+    model_file = (
+        "data"
+        + os.sep
+        + "interim_data"
+        + os.sep
+        + (cluster_model_scenario or scenario)
+        + os.sep
+        + "cluster_model_"
+        + global_or_US
+        + ".pkl"
+    )
+    fit_clusters = cluster_model_scenario in [None, scenario]
+    # Check if the files already exist. The clusters are also fitted again if
+    # their model is missing, e.g. for results clustered before it was saved,
+    # so other scenarios can be assigned to them
     if not os.path.isfile(
         "data"
         + os.sep
@@ -252,7 +382,7 @@ def grid(scenario, global_or_US, with_elbow_method=False):
         + "seaweed_growth_rate_clustered_"
         + global_or_US
         + ".pkl"
-    ):
+    ) or (fit_clusters and not os.path.isfile(model_file)):
         # Cluster the data
         print("Clustering the data")
         growth_df = pd.read_pickle(
@@ -266,8 +396,35 @@ def grid(scenario, global_or_US, with_elbow_method=False):
             + global_or_US
             + ".pkl"
         )
+        from src.processing.clustering import (
+            assign_in_chunks,
+            cluster_time_series,
+            load_cluster_model,
+            save_cluster_model,
+        )
+
         # Cluster only the growth data, as the other parameters all have the same shape
-        labels, km = time_series_analysis(growth_df, number_of_clusters, global_or_US)
+        if not fit_clusters:
+            assert os.path.isfile(model_file), "Run grid for {} first".format(
+                cluster_model_scenario
+            )
+            print("Assigning the data to the clusters of " + cluster_model_scenario)
+            km, scaler = load_cluster_model(model_file)
+            labels = assign_in_chunks(km, growth_df, scaler)
+        else:
+            weights = None
+            if sample_size is not None:
+                weights = read_cell_areas(scenario, global_or_US, growth_df)
+            labels, km, scaler = cluster_time_series(
+                growth_df,
+                number_of_clusters,
+                global_or_US,
+                sakoe_chiba_radius=sakoe_chiba_radius,
+                sample_size=sample_size,
+                weights=weights,
+                n_segments=n_segments,
+            )
+            save_cluster_model(model_file, km, scaler)
         growth_df["cluster"] = labels
         for parameter in parameters:
             print("Getting parameter {} for clustering".format(parameter))
@@ -314,9 +471,12 @@ def grid(scenario, global_or_US, with_elbow_method=False):
 if __name__ == "__main__":
     lme("150tg")
     grid("150tg", "US")
-    # # Iterate over all scenarios
-    for scenario in [str(i) + "tg" for i in [5, 16, 27, 37, 47, 150]]:
+    # Fit the clusters on the 150 Tg scenario first and assign all other
+    # scenarios to them, so the clusters are the same in all scenarios
+    print("Preparing scenario: 150tg")
+    grid("150tg", "global")
+    for scenario in [str(i) + "tg" for i in [5, 16, 27, 37, 47]]:
         print("Preparing scenario: " + scenario)
-        grid(scenario, "global")
+        grid(scenario, "global", cluster_model_scenario="150tg")
     # # also run the control scenario
-    grid("control", "global")
+    grid("control", "global", cluster_model_scenario="150tg")
@@ -4,31 +4,176 @@ This files contains code to make the data ready for the model
 import os
 import pickle
 
+import numpy as np
 import pandas as pd
-import xarray as xr
+
+from src.processing import read_files
 
 
 def get_area(path, file):
     """
-    Gets the file with all the areas for grid_cells and saves it as a csv
+    Gets the file with all the areas for grid_cells and saves it as a csv.
+    Every cell gets an integer cell id from its (nlat, nlon) position in the
+    grid, which is used to find the area of a cell instead of its coordinates
     Arguments:
         path: path to the file
         file: filename
     Returns:
         None
     """
+    import xarray as xr
+
     data_set = xr.open_mfdataset(path + file)
     area = data_set["TAREA"][0, :, :]
     area = area.to_dataframe()
     # convert from cm² to km²
     area["TAREA"] = area["TAREA"] / 1e10
     area = area.reset_index()
+    area["cell_id"] = area["nlat"] * data_set.sizes["nlon"] + area["nlon"]
     area = area.set_index(["TLONG", "TLAT"])
-    area = area["TAREA"].to_frame()
+    area = area[["TAREA", "nlat", "nlon", "cell_id"]]
     area.to_csv("area_grid.csv", sep=";")
 
 
-def prepare_gridded_data(path, folder, scenario, file_ending, global_or_US):
+# The names of the environmental parameters in the files and in the model
+ENV_PARAMS = {
+    "NO3": "nitrate",
+    "NH4": "ammonium",
+    "PAR_avg": "illumination",
+    "PO4": "phosphate",
+    "SALT": "salinity",
+    "TEMP": "temperature",
+    "Fe": "iron",
+}
+
+
+def read_gridded_parameter(file, parameter):
+    """
+    Reads in the pickle of one environmental parameter and reshapes it
+    into one row per grid cell and one column per month. The cells are
+    sorted by latitude and then longitude and the months keep the order
+    of the file
+    Arguments:
+        file: the pickled file of the environmental parameter
+        parameter: the name of the parameter in the model
+    Returns:
+        lat_lons: an array of the shape (cells, 2) with the latitude and
+            longitude of each cell
+        time: an array of the time of each month
+        values: an array of the shape (cells, months)
+    """
+    env_df = pd.read_pickle(file)
+    env_df.reset_index(inplace=True)
+    env_df.columns = ["time", "TLONG", "TLAT", parameter]
+    lats = env_df["TLAT"].to_numpy()
+    lons = env_df["TLONG"].to_numpy()
+    # lexsort is stable, so the months stay in the order of the file
+    order = np.lexsort((lons, lats))
+    lats = lats[order]
+    lons = lons[order]
+    # Find where a new cell starts in the sorted data
+    new_cell = np.ones(len(order), dtype=bool)
+    new_cell[1:] = (lats[1:] != lats[:-1]) | (lons[1:] != lons[:-1])
+    cell_starts = np.flatnonzero(new_cell)
+    n_cells = len(cell_starts)
+    assert n_cells > 0, "{} does not contain any grid cells".format(file)
+    n_months = len(order) // n_cells
+    assert np.all(
+        np.diff(np.append(cell_starts, len(order))) == n_months
+    ), "not all grid cells in {} have the same number of months".format(file)
+    lat_lons = np.stack([lats[cell_starts], lons[cell_starts]], axis=1)
+    time = env_df["time"].to_numpy()[order[:n_months]]
+    values = env_df[parameter].to_numpy()[order].reshape(n_cells, n_months)
+    return lat_lons, time, values
+
+
+def read_gridded_data(path, folder, scenario, file_ending):
+    """
+    Reads in the pickles of all environmental parameters, checks that
+    they all have the same grid cells and reshapes them into one array
+    of the shape (cells, months) per parameter
+    Arguments:
+        path: the path for the pickled files
+        folder: the folder where the pickled files are
+        scenario: the scenario to use (e.g. 150tg)
+        file_ending: the ending of the pickled files
+    Returns:
+        lat_lons: an array of the shape (cells, 2) with the latitude and
+            longitude of each cell
+        time: an array of the time of each month
+        parameters: a dictionary with the names of the parameters
+            in the model as keys and arrays of the shape (cells, months)
+            as values
+    """
+    full_path = path + os.sep + "data" + os.sep + folder + os.sep + scenario + os.sep
+    lat_lons = None
+    time = None
+    parameters = {}
+    for science_name, parameter in ENV_PARAMS.items():
+        parameter_lat_lons, parameter_time, values = read_gridded_parameter(
+            full_path + "nw_" + science_name + "_" + file_ending + ".pkl", parameter
+        )
+        if lat_lons is None:
+            lat_lons = parameter_lat_lons
+            time = parameter_time
+        # All parameters have to be on the same grid
+        assert np.array_equal(lat_lons, parameter_lat_lons), (
+            "The grid cells of " + science_name + " do not match"
+        )
+        assert values.shape[1] == len(time), (
+            "The months of " + science_name + " do not match"
+        )
+        parameters[parameter] = values
+    # Add some fixes to the data, as some of them go slightly out of bounds
+    # This is happening due to the way the climate model works
+    for parameter in ["nitrate", "ammonium", "phosphate"]:
+        parameters[parameter][parameters[parameter] < 0] = 0
+    return lat_lons, time, parameters
+
+
+def create_gridded_data_dict(lat_lons, time, parameters, cell_ids=None):
+    """
+    Creates the dictionary of dataframes the model reads from the arrays
+    of the environmental parameters
+    Arguments:
+        lat_lons: an array of the shape (cells, 2) with the latitude and
+            longitude of each cell
+        time: an array of the time of each month
+        parameters: a dictionary with arrays of the shape (cells, months)
+        cell_ids: the integer cell id of each cell in the area table. If given,
+            it is added as the column cell_id
+    Returns:
+        a dictionary of dataframes. Each dataframe is assigned a key
+        consisting of a tuple of floats of the latitude and longitude.
+    """
+    time_index = pd.Index(time, name="time")
+    # Add a column with the month since war. This replaces the
+    # time column, which only contains arbitrary numbers and not real dates
+    months_since_war = np.arange(-4, len(time) - 4)
+    data_dict = {}
+    for i, (lat, lon) in enumerate(lat_lons.tolist()):
+        cell_data = {
+            "TLONG": np.full(len(time), lon),
+            "TLAT": np.full(len(time), lat),
+        }
+        for parameter, values in parameters.items():
+            cell_data[parameter] = values[i]
+        cell_data["months_since_war"] = months_since_war
+        if cell_ids is not None:
+            cell_data["cell_id"] = np.full(len(time), cell_ids[i], dtype=np.int64)
+        data_dict[(lat, lon)] = pd.DataFrame(cell_data, index=time_index)
+    return data_dict
+
+
+def prepare_gridded_data(
+    path,
+    folder,
+    scenario,
+    file_ending,
+    global_or_US,
+    file_format="pickle",
+    areas=None,
+):
     """
     Reads in the pickles of the geodataframes of the
     different environmental paramters. Checks if they
@@ -40,74 +185,33 @@ def prepare_gridded_data(path, folder, scenario, file_ending, global_or_US):
         file_ending: the ending of the pickled files
         global_or_US: if "global", the global data is used
         scenario: the scenario to use (e.g. 150tg)
+        file_format: "pickle" to save a pickle of a dictionary of dataframes,
+            "columnar" to save a folder that DataGrid can memory-map
+        areas: the area table from read_files.read_area_file. If given,
+            the integer cell id of every cell is saved with the data
     Returns:
         None, but saves a pickle of the dictionary of geo
         dataframes. Each geodataframe is assigned a key
         consisting of a tuple of floats of the latitude
-        and longitude.
+        and longitude. Or saves the same data in the columnar format.
     """
-    # Read in all the geopandas dataframes for the environmental parameters
-    env_params = {
-        "NO3": "nitrate",
-        "NH4": "ammonium",
-        "PAR_avg": "illumination",
-        "PO4": "phosphate",
-        "SALT": "salinity",
-        "TEMP": "temperature",
-        "Fe": "iron",
-    }
-    dict_env_dfs = {}
-    for science_name in env_params.keys():
-        full_path = (
-            path + os.sep + "data" + os.sep + folder + os.sep + scenario + os.sep
-        )
-        env_df = pd.read_pickle(
-            full_path + "nw_" + science_name + "_" + file_ending + ".pkl"
-        )
-        env_df.reset_index(inplace=True)
-        env_df.columns = ["time", "TLONG", "TLAT", env_params[science_name]]
-        dict_env_dfs[science_name] = env_df
-    # Create all the groupby objects
-    dict_env_dfs_grouped = {
-        env_param: dict_env_dfs[env_param].groupby(["TLAT", "TLONG"])
-        for env_param in env_params.keys()
-    }
-    data_dict = {}
-    # Itereate over all the lat_lon combos, those are the same for all environmental parameters
-    for lat_lon in dict_env_dfs_grouped["NO3"].groups.keys():
-        list_env_param_latlon_df = []
-        for env_param in env_params.keys():
-            env_param_latlon_df = dict_env_dfs_grouped[env_param].get_group(lat_lon)
-            env_param_latlon_df.set_index("time", inplace=True)
-            # Add some fixes to the data, as some of them go slightly out of bounds
-            # This is happening due to the way the climate model works
-            if env_param == "NO3":
-                env_param_latlon_df.loc[
-                    env_param_latlon_df["nitrate"] < 0, "nitrate"
-                ] = 0
-            elif env_param == "NH4":
-                env_param_latlon_df.loc[
-                    env_param_latlon_df["ammonium"] < 0, "ammonium"
-                ] = 0
-            elif env_param == "PO4":
-                env_param_latlon_df.loc[
-                    env_param_latlon_df["phosphate"] < 0, "phosphate"
-                ] = 0
-            list_env_param_latlon_df.append(pd.DataFrame(env_param_latlon_df))
-        concat_latlon_dfs = pd.concat(list_env_param_latlon_df, axis=1)
-        # Remove duplicate columns
-        concat_latlon_dfs = concat_latlon_dfs.loc[
-            :, ~concat_latlon_dfs.columns.duplicated()
-        ].copy()
-        # Add a column with the month since war. This replaces the
-        # time column, which only contains arbitrary numbers and not real dates
-        concat_latlon_dfs["months_since_war"] = list(
-            range(-4, concat_latlon_dfs.shape[0] - 4, 1)
+    assert file_format in ["pickle", "columnar"]
+    lat_lons, time, parameters = read_gridded_data(path, folder, scenario, file_ending)
+    cell_ids = None
+    if areas is not None:
+        cell_ids = read_files.lookup_cell_ids(areas, lat_lons)
+    full_path = path + os.sep + "data" + os.sep + "interim_data" + os.sep + scenario
+    if file_format == "columnar":
+        read_files.write_data_grid_columnar(
+            full_path + os.sep + "data_gridded_all_parameters_" + global_or_US,
+            lat_lons,
+            parameters,
+            np.arange(-4, len(time) - 4),
+            cell_ids,
         )
-        # Convert back to geodataframe before saving
-        data_dict[lat_lon] = concat_latlon_dfs
+        return
+    data_dict = create_gridded_data_dict(lat_lons, time, parameters, cell_ids)
     # Make pickle out of it, so we don't have to run this every time
-    full_path = path + os.sep + "data" + os.sep + "interim_data" + os.sep + scenario
     with open(
         full_path + os.sep + "data_gridded_all_parameters_" + global_or_US + ".pkl",
         "wb",
@@ -115,18 +219,64 @@ def prepare_gridded_data(path, folder, scenario, file_ending, global_or_US):
         pickle.dump(data_dict, handle, protocol=pickle.HIGHEST_PROTOCOL)
 
 
+def convert_gridded_pickle_to_columnar(file, directory):
+    """
+    Converts an existing pickle of gridded data to the columnar format
+    Arguments:
+        file: the pickle of the dictionary of dataframes
+        directory: the folder to write the columnar data to
+    Returns:
+        None
+    """
+    data_grid = read_files.DataGrid(file)
+    first_cell_df = next(iter(data_grid.grid_dict.values()))
+    names = [
+        column
+        for column in first_cell_df.columns
+        if column not in ["TLONG", "TLAT", "months_since_war", "cell_id"]
+    ]
+    lat_lons, data = data_grid.provide_data_array(names)
+    read_files.write_data_grid_columnar(
+        directory,
+        lat_lons,
+        {name: data[:, :, i] for i, name in enumerate(names)},
+        first_cell_df["months_since_war"].to_numpy(),
+        data_grid.cell_ids,
+    )
+
+
 if __name__ == "__main__":
+    # Save the cell ids with the data if the area file has been created
+    areas = None
+    area_path = "data" + os.sep + "geospatial_information" + os.sep + "grid"
+    if os.path.isfile(area_path + os.sep + "area_grid.csv"):
+        areas = read_files.read_area_file(area_path, "area_grid.csv")
     # Iterate over all scenarios
     for scenario in [str(i) + "tg" for i in [5, 16, 27, 37, 47, 150]]:
         print("Preparing scenario: " + scenario)
         prepare_gridded_data(
-            ".", "gridded_data_global", scenario, "120_months_" + scenario, "global"
+            ".",
+            "gridded_data_global",
+            scenario,
+            "120_months_" + scenario,
+            "global",
+            areas=areas,
         )
     # Also prepare the test dataset with only the US
     prepare_gridded_data(
-        ".", "gridded_data_test_dataset_US_only", "150tg", "36_months_150tg", "US"
+        ".",
+        "gridded_data_test_dataset_US_only",
+        "150tg",
+        "36_months_150tg",
+        "US",
+        areas=areas,
     )
     # Prepare the control run
     prepare_gridded_data(
-        ".", "gridded_data_global", "control", "120_months_control", "global"
+        ".",
+        "gridded_data_global",
+        "control",
+        "120_months_control",
+        "global",
+        areas=areas,
     )
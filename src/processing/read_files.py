@@ -1,11 +1,33 @@
 """
 Reads in the ocean data after nuclear war provided by Cherryl Harrison
 """
+import hashlib
 import os
 import pickle
+import zipfile
+from collections.abc import Mapping
 
+import numpy as np
 import pandas as pd
 
+# The columns of the csv with the LME data and their types.
+# The dates are parsed separately
+LME_CSV_DTYPES = {
+    "LME_number": np.int64,
+    "dates": str,
+    "LME_SST (deg C)": np.float64,
+    "LME_SALT (g/kg)": np.float64,
+    "LME_NO3 (mmol/m^3)": np.float64,
+    "LME_PAR (W/m^2)": np.float64,
+    "LME_PO4 (mmol/m^3)": np.float64,
+    "LME_NH4 (mmol/m^3)": np.float64,
+}
+# The ending of the binary cache next to the csv
+LME_CACHE_ENDING = ".cache.npz"
+
+# The months since war of the first month of the data, as counted in the model
+FIRST_MONTH = -3
+
 
 class DataLME:
     """
@@ -14,28 +36,54 @@ class DataLME:
     and provide the data for each LME as needed
     """
 
-    def __init__(self, file):
+    def __init__(self, file, use_cache=True):
+        """
+        Arguments:
+            file: the csv file with the data of the LMEs
+            use_cache: if True, the parsed csv is stored in a binary cache
+                next to it and read from there the next time
+        """
         assert file is not None
         self.file = file
+        self.use_cache = use_cache
         self.lme_data = None
-        self.lme_dict = {}
+        # The rows of each LME in the sorted data
+        self.lme_slices = {}
+        # The dataframes of the LMEs are only created when they are used
+        self.lme_dict = LMEFrames(self)
         # Prepare the data
         self.read_data_lme()
         self.sort_data_lme()
 
     def read_data_lme(self):
         """
-        read in the file
+        read in the file and prepare the columns for all LMEs at once
         Arguments:
             None
         Returns:
             None
         """
-        self.lme_data = pd.read_csv(self.file)
+        lme_data = read_lme_csv(self.file, use_cache=self.use_cache)
+        # rename columns
+        lme_data.columns = [
+            "LME_number",
+            "dates",
+            "temperature",
+            "salinity",
+            "nitrate",
+            "illumination",
+            "phosphate",
+            "ammonium",
+        ]
+        # For some reason some of the nitrate values are below 0, which is impossible.
+        # Set those to 0
+        lme_data["nitrate"] = lme_data["nitrate"].clip(lower=0)
+        self.lme_data = lme_data
 
     def sort_data_lme(self):
         """
-        Sorts as a dictionary of pandas dataframes
+        Sorts the data by LME number in one pass and remembers the rows
+        of each LME.
         The data is ocean data after nuclear war seperated by
         Large Marine Ecosystems (LME)
         Arguments:
@@ -43,28 +91,25 @@ class DataLME:
         Returns:
             None
         """
-        # loop through the LMEs
-        for i in range(1, 67):
-            # create a dataframe for each LME
-            self.lme_dict[i] = self.lme_data[self.lme_data["LME_number"] == i]
-            # remove the LME column
-            self.lme_dict[i] = self.lme_dict[i].drop(columns=["LME_number"])
-            # set dates as index
-            self.lme_dict[i].set_index("dates", inplace=True)
-            # change format of index to datetime
-            self.lme_dict[i].index = pd.to_datetime(self.lme_dict[i].index)
-            # rename columns
-            self.lme_dict[i].columns = [
-                "temperature",
-                "salinity",
-                "nitrate",
-                "illumination",
-                "phosphate",
-                "ammonium",
-            ]
-            # For some reason some of the nitrate values are below 0, which is impossible.
-            # Set those to 0
-            self.lme_dict[i]["nitrate"] = self.lme_dict[i]["nitrate"].clip(lower=0)
+        # A stable sort keeps the order of the dates within each LME
+        lme_data = self.lme_data.sort_values("LME_number", kind="stable")
+        lme_numbers, starts, counts = np.unique(
+            lme_data["LME_number"].to_numpy(), return_index=True, return_counts=True
+        )
+        self.lme_slices = {
+            int(lme_number): slice(start, start + count)
+            for lme_number, start, count in zip(lme_numbers, starts, counts)
+        }
+        # remove the LME column and set dates as index
+        self.lme_data = lme_data.drop(columns=["LME_number"]).set_index("dates")
+        self.lme_dict.clear()
+
+    @property
+    def lme_numbers(self):
+        """
+        The numbers of all LMEs in the data
+        """
+        return list(self.lme_slices.keys())
 
     def provide_data_lme(self, lme_number):
         """
@@ -77,22 +122,279 @@ class DataLME:
         return self.lme_dict[lme_number]
 
 
+def file_fingerprint(file, with_hash=True):
+    """
+    Describes the content of a file to find out if it has changed
+    Arguments:
+        file: the file to describe
+        with_hash: if True, the sha256 hash of the content is included
+    Returns:
+        a dictionary with the size, the modification time and the hash
+    """
+    stat = os.stat(file)
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if with_hash:
+        sha256 = hashlib.sha256()
+        with open(file, "rb") as handle:
+            for block in iter(lambda: handle.read(1 << 20), b""):
+                sha256.update(block)
+        fingerprint["sha256"] = sha256.hexdigest()
+    return fingerprint
+
+
+def check_fingerprint(fingerprint, file):
+    """
+    Checks if a file still has the content described by a fingerprint.
+    The file is only hashed if its modification time has changed
+    Arguments:
+        fingerprint: the fingerprint saved with a cache, from file_fingerprint
+        file: the file the cache was created from
+    Returns:
+        None if the content has changed. Otherwise the current fingerprint,
+        which differs from the saved one if the file was only touched, so
+        the cache can be saved with it and the file is not hashed again
+    """
+    current = file_fingerprint(file, with_hash=False)
+    if fingerprint["size"] != current["size"]:
+        return None
+    if fingerprint["mtime_ns"] == current["mtime_ns"]:
+        return fingerprint
+    # The file might only have been touched, so compare the content
+    current = file_fingerprint(file)
+    if fingerprint["sha256"] != current["sha256"]:
+        return None
+    return current
+
+
+def write_atomically(file, write):
+    """
+    Writes a file through a temporary file, so a crash never leaves half a file
+    Arguments:
+        file: the path of the file
+        write: a function that writes the content to an open binary file
+    Returns:
+        None
+    """
+    with open(file + ".tmp", "wb") as handle:
+        write(handle)
+    os.replace(file + ".tmp", file)
+
+
+def read_lme_csv(file, use_cache=True):
+    """
+    Reads the csv of the LME data with explicit column types. The parsed data
+    is cached in a binary file next to the csv, which is used as long as the
+    csv has the same size and either the same modification time or the same
+    hash. Otherwise the cache is rebuilt
+    Arguments:
+        file: the csv file
+        use_cache: if False, the csv is always parsed and no cache is written
+    Returns:
+        a dataframe with the columns of the csv and the dates as datetime
+    """
+    cache_file = file + LME_CACHE_ENDING
+    if use_cache and os.path.exists(cache_file):
+        lme_data = read_lme_cache(cache_file, file)
+        if lme_data is not None:
+            return lme_data
+    lme_data = pd.read_csv(file, dtype=LME_CSV_DTYPES)
+    # change format of the dates to datetime
+    lme_data["dates"] = pd.to_datetime(lme_data["dates"], format="%Y-%m-%d")
+    if use_cache:
+        try:
+            write_lme_cache(cache_file, file, lme_data)
+        except OSError:
+            # The cache is only an optimization, e.g. the folder might be read only
+            pass
+    return lme_data
+
+
+def read_lme_cache(cache_file, file):
+    """
+    Reads the cached LME data if it still matches the csv. If the csv was
+    only touched, the cache is saved again with its new modification time
+    Arguments:
+        cache_file: the cache file
+        file: the csv file the cache was created from
+    Returns:
+        the dataframe or None if the cache is outdated or unreadable
+    """
+    try:
+        with np.load(cache_file, allow_pickle=False) as cache:
+            arrays = {name: cache[name] for name in cache.files}
+        saved_fingerprint = {
+            "size": int(arrays["size"]),
+            "mtime_ns": int(arrays["mtime_ns"]),
+            "sha256": str(arrays["sha256"]),
+        }
+        columns = arrays["columns"].tolist()
+        if columns != list(LME_CSV_DTYPES.keys()):
+            return None
+        lme_data = pd.DataFrame(
+            {column: arrays["column_" + column] for column in columns}
+        )
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        # Also an old, partly written or truncated cache
+        return None
+    fingerprint = check_fingerprint(saved_fingerprint, file)
+    if fingerprint is None:
+        return None
+    if fingerprint != saved_fingerprint:
+        try:
+            write_lme_cache(cache_file, file, lme_data, fingerprint)
+        except OSError:
+            pass
+    return lme_data
+
+
+def write_lme_cache(cache_file, file, lme_data, fingerprint=None):
+    """
+    Writes the parsed LME data to the cache together with the fingerprint
+    of the csv it was created from
+    Arguments:
+        cache_file: the cache file
+        file: the csv file the data was read from
+        lme_data: the parsed dataframe
+        fingerprint: the fingerprint of the csv with the hash. If None,
+            it is calculated
+    Returns:
+        None
+    """
+    if fingerprint is None:
+        fingerprint = file_fingerprint(file)
+    arrays = {"column_" + column: lme_data[column].to_numpy() for column in lme_data}
+    write_atomically(
+        cache_file,
+        lambda handle: np.savez(
+            handle,
+            columns=np.array(list(lme_data.columns)),
+            size=fingerprint["size"],
+            mtime_ns=fingerprint["mtime_ns"],
+            sha256=fingerprint["sha256"],
+            **arrays,
+        ),
+    )
+
+
+class LMEFrames(Mapping):
+    """
+    Read only mapping from the LME numbers to the dataframe of each LME.
+    The dataframes are only created when they are accessed and then cached
+    """
+
+    def __init__(self, data_lme):
+        self.data_lme = data_lme
+        self.cache = {}
+
+    def __getitem__(self, lme_number):
+        if lme_number not in self.cache:
+            rows = self.data_lme.lme_slices[lme_number]
+            self.cache[lme_number] = self.data_lme.lme_data.iloc[rows].copy()
+        return self.cache[lme_number]
+
+    def __iter__(self):
+        return iter(self.data_lme.lme_slices)
+
+    def __len__(self):
+        return len(self.data_lme.lme_slices)
+
+    def clear(self):
+        """
+        Removes the cached dataframes
+        Arguments:
+            None
+        Returns:
+            None
+        """
+        self.cache = {}
+
+
 class DataGrid:
     """
     Creates a data object for the gridded data
     Meant to only read in the data once
-    and provide the data for each grid cell as needed
+    and provide the data for each grid cell as needed.
+    The data can either be a pickle of a dictionary of dataframes or
+    a folder in the columnar format written by write_data_grid_columnar.
+    The columnar format is memory-mapped, so the data is only read
+    from disk when it is used
     """
 
-    def __init__(self, file):
+    def __init__(self, file, bounding_box=None, variables=None, month_range=None):
+        """
+        Arguments:
+            file: the pickle or the folder in the columnar format
+            bounding_box: only load the cells in this box, given as
+                (min_lat, max_lat, min_lon, max_lon) in the coordinates of the
+                data, borders included. If min_lon is larger than max_lon,
+                the box crosses the 0/360 degree longitude. None loads all cells
+            variables: list of the parameters to load. None loads all of them
+            month_range: only load the months between (first, last), borders
+                included, counted like in the model results, where the first
+                month of the data is FIRST_MONTH. None loads all months
+        """
         assert file is not None
         self.file = file
+        self.bounding_box = bounding_box
+        self.variables = variables
+        self.month_range = month_range
         self.grid_dict = {}
+        # Only used for the columnar format
+        self.lat_lons = None
+        self.months_since_war = None
+        self.parameters = {}
+        # The row of every (lat, lon) in the loaded data, to find a cell quickly
+        self.rows = {}
+        # The cells and months of the files that are loaded
+        self.cells = None
+        self.month_slice = slice(None)
+        # The months of the loaded data, counted like in the model results
+        self.months = None
+        # The integer id of each loaded cell in the area table, if the data has them
+        self.cell_ids = None
         # Prepare the data
         self.read_data_grid()
         # The gridded data does not have to be sorted
         # As it is already sorted in prep_data.py
 
+    def _select_cells(self, lat_lons):
+        """
+        Finds the cells that are in the bounding box
+        Arguments:
+            lat_lons: an array of the shape (cells, 2) with the latitude and
+                longitude of each cell
+        Returns:
+            the positions of the cells in the bounding box
+        """
+        lat_lons = np.asarray(lat_lons, dtype=np.float64).reshape(-1, 2)
+        if self.bounding_box is None:
+            return np.arange(len(lat_lons))
+        min_lat, max_lat, min_lon, max_lon = self.bounding_box
+        lats = lat_lons[:, 0]
+        lons = lat_lons[:, 1]
+        in_lat = (lats >= min_lat) & (lats <= max_lat)
+        if min_lon <= max_lon:
+            in_lon = (lons >= min_lon) & (lons <= max_lon)
+        else:
+            in_lon = (lons >= min_lon) | (lons <= max_lon)
+        return np.flatnonzero(in_lat & in_lon)
+
+    def _select_months(self, n_months):
+        """
+        Sets the months to load and their months since war in the model
+        Arguments:
+            n_months: the number of months in the file
+        Returns:
+            None
+        """
+        if self.month_range is not None:
+            first, last = self.month_range
+            assert first <= last, "the month range has to be (first, last)"
+            self.month_slice = slice(
+                max(first - FIRST_MONTH, 0), max(last - FIRST_MONTH + 1, 0)
+            )
+        self.months = np.arange(FIRST_MONTH, n_months + FIRST_MONTH)[self.month_slice]
+
     def read_data_grid(self):
         """
         Reads in the gridded data
@@ -101,8 +403,93 @@ class DataGrid:
         Returns:
             None
         """
+        if os.path.isdir(self.file):
+            self.read_data_grid_columnar()
+            return
         with open(self.file, "rb") as handle:
-            self.grid_dict = pickle.load(handle)
+            grid_dict = pickle.load(handle)
+        cell_dfs = list(grid_dict.values())
+        self._select_months(cell_dfs[0].shape[0] if cell_dfs else 0)
+        cell_ids = None
+        if cell_dfs and cell_dfs[0].shape[0] > 0 and "cell_id" in cell_dfs[0].columns:
+            cell_ids = np.array(
+                [cell_df["cell_id"].iat[0] for cell_df in cell_dfs], dtype=np.int64
+            )
+        if (
+            self.bounding_box is None
+            and self.variables is None
+            and self.month_range is None
+        ):
+            self.grid_dict = grid_dict
+            self.cell_ids = cell_ids
+            return
+        # Only keep the selected data, so the rest can be freed
+        lat_lons = list(grid_dict.keys())
+        if self.variables is not None:
+            columns = (
+                ["TLONG", "TLAT"]
+                + list(self.variables)
+                + ["months_since_war", "cell_id"]
+            )
+        cells = self._select_cells(lat_lons)
+        if cell_ids is not None:
+            self.cell_ids = cell_ids[cells]
+        for cell in cells:
+            cell_df = cell_dfs[cell].iloc[self.month_slice]
+            if self.variables is not None:
+                cell_df = cell_df[[c for c in columns if c in cell_df.columns]]
+            self.grid_dict[lat_lons[cell]] = cell_df
+
+    def read_data_grid_columnar(self):
+        """
+        Opens the gridded data in the columnar format. The parameters are
+        memory-mapped, so nothing but the coordinates is read yet
+        Arguments:
+            None
+        Returns:
+            None
+        """
+        lat_lons = np.load(os.path.join(self.file, "lat_lons.npy"))
+        months_since_war = np.load(os.path.join(self.file, "months_since_war.npy"))
+        self._select_months(len(months_since_war))
+        self.cells = self._select_cells(lat_lons)
+        self.lat_lons = lat_lons[self.cells]
+        self.months_since_war = months_since_war[self.month_slice]
+        for row, lat_lon in enumerate(map(tuple, self.lat_lons.tolist())):
+            self.rows.setdefault(lat_lon, row)
+        cell_ids_file = os.path.join(self.file, "cell_ids.npy")
+        if os.path.isfile(cell_ids_file):
+            self.cell_ids = np.load(cell_ids_file)[self.cells]
+        for file_name in sorted(os.listdir(self.file)):
+            parameter, ending = os.path.splitext(file_name)
+            if ending != ".npy" or parameter in [
+                "lat_lons",
+                "months_since_war",
+                "cell_ids",
+            ]:
+                continue
+            if self.variables is not None and parameter not in self.variables:
+                continue
+            self.parameters[parameter] = np.load(
+                os.path.join(self.file, file_name), mmap_mode="r"
+            )
+
+    def _read_parameter(self, parameter, cells=None):
+        """
+        Reads the selected months of a parameter from the memory-mapped file
+        Arguments:
+            parameter: the name of the parameter
+            cells: the positions of the cells in the loaded data. None reads
+                all loaded cells
+        Returns:
+            an array of the shape (cells, months)
+        """
+        values = self.parameters[parameter]
+        if self.bounding_box is not None or cells is not None:
+            # Only the rows of the selected cells are read from disk
+            rows = self.cells if cells is None else self.cells[cells]
+            values = values[rows]
+        return np.asarray(values[:, self.month_slice])
 
     def provide_data_grid(self, lat_lon):
         """
@@ -113,20 +500,137 @@ class DataGrid:
             a geodataframe with all the environmental data
             for this grid cell
         """
-        return self.grid_dict[lat_lon]
+        if self.lat_lons is None:
+            return self.grid_dict[lat_lon]
+        cell = self.rows[tuple(lat_lon)]
+        cell_data = {
+            "TLONG": np.full(len(self.months_since_war), lat_lon[1]),
+            "TLAT": np.full(len(self.months_since_war), lat_lon[0]),
+        }
+        for parameter in self.parameters:
+            cell_data[parameter] = self._read_parameter(parameter, [cell])[0]
+        cell_data["months_since_war"] = self.months_since_war
+        return pd.DataFrame(cell_data)
+
+    def provide_data_array(self, variables):
+        """
+        Provides the data of all grid cells as one dense array
+        Arguments:
+            variables: list of the names of the environmental parameters
+        Returns:
+            lat_lons: an array of the shape (cells, 2) with the lat_lon
+                coordinates of each cell
+            data: an array of the shape (cells, months, variables)
+        """
+        if self.lat_lons is not None:
+            # Only the requested parameters are read from disk
+            return self.lat_lons, np.stack(
+                [self._read_parameter(variable) for variable in variables], axis=2
+            )
+        lat_lons = np.array(list(self.grid_dict.keys()), dtype=np.float64)
+        cell_dfs = list(self.grid_dict.values())
+        n_months = cell_dfs[0].shape[0] if cell_dfs else 0
+        dtype = (
+            np.result_type(*[cell_dfs[0][variable].dtype for variable in variables])
+            if cell_dfs
+            else np.float64
+        )
+        data = np.empty((len(cell_dfs), n_months, len(variables)), dtype=dtype)
+        for i, cell_df in enumerate(cell_dfs):
+            assert cell_df.shape[0] == n_months, "all cells need the same months"
+            for j, variable in enumerate(variables):
+                data[i, :, j] = cell_df[variable].to_numpy()
+        return lat_lons.reshape(-1, 2), data
 
 
 def read_area_file(path, file):
     """
-    Reads in the area file
+    Reads in the area file. Older area files do not have the cell ids yet.
+    As their rows are in the order of the (nlat, nlon) indices of the grid,
+    the cell id is the position of the row
     Arguments:
+        path: the path to the file
         file: the file to read in
     Returns:
-        a dataframe with the area of each LME
+        a dataframe with the area of each grid cell, indexed by TLONG and TLAT,
+        with the integer cell id in the column cell_id
     """
     assert file is not None
     assert path is not None
     area_data = pd.DataFrame(
         pd.read_csv(path + os.sep + file, sep=";", index_col=[0, 1])
     )
+    if "cell_id" not in area_data.columns:
+        area_data["cell_id"] = np.arange(len(area_data), dtype=np.int64)
     return area_data
+
+
+def lookup_cell_ids(areas, lat_lons, decimals=4):
+    """
+    Finds the integer cell id of grid cells in the area table. The coordinates
+    are rounded before they are compared, as the area table and the data
+    do not store them with the same precision. This is the only place where
+    cells are matched by their coordinates, everything after that uses the ids
+    Arguments:
+        areas: the area table from read_area_file
+        lat_lons: an array of the shape (cells, 2) or an index of (lat, lon) tuples
+        decimals: the number of decimals the coordinates are rounded to
+    Returns:
+        an int64 array with the cell id of each cell, -1 if it is not in the table
+    """
+    if isinstance(lat_lons, pd.Index):
+        lat_lons = lat_lons.tolist()
+    lat_lons = np.asarray(lat_lons, dtype=np.float64).reshape(-1, 2)
+    table = pd.MultiIndex.from_arrays(
+        [
+            np.round(areas.index.get_level_values("TLAT").to_numpy(), decimals),
+            np.round(areas.index.get_level_values("TLONG").to_numpy(), decimals),
+        ]
+    )
+    # Keep the first row if rounding makes two cells of the table equal
+    unique = ~table.duplicated()
+    positions = table[unique].get_indexer(
+        pd.MultiIndex.from_arrays(
+            [np.round(lat_lons[:, 0], decimals), np.round(lat_lons[:, 1], decimals)]
+        )
+    )
+    table_ids = areas["cell_id"].to_numpy(dtype=np.int64)[unique]
+    return np.where(positions >= 0, table_ids[positions], -1)
+
+
+def write_data_grid_columnar(
+    directory, lat_lons, parameters, months_since_war, cell_ids=None
+):
+    """
+    Writes gridded data in the columnar format DataGrid can memory-map.
+    The folder contains a table of the coordinates of the cells, the months
+    since war and one contiguous array per parameter, with the months of
+    a cell next to each other
+    Arguments:
+        directory: the folder to write the data to
+        lat_lons: an array of the shape (cells, 2) with the latitude and
+            longitude of each cell
+        parameters: a dictionary with the names of the parameters as keys
+            and arrays of the shape (cells, months) as values
+        months_since_war: the months since war of each month
+        cell_ids: the integer cell id of each cell in the area table. None
+            does not save any
+    Returns:
+        None
+    """
+    lat_lons = np.asarray(lat_lons, dtype=np.float64)
+    months_since_war = np.asarray(months_since_war, dtype=np.int64)
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, "lat_lons.npy"), lat_lons)
+    np.save(os.path.join(directory, "months_since_war.npy"), months_since_war)
+    if cell_ids is not None:
+        cell_ids = np.asarray(cell_ids, dtype=np.int64)
+        assert cell_ids.shape == (len(lat_lons),), "one cell id per cell is needed"
+        np.save(os.path.join(directory, "cell_ids.npy"), cell_ids)
+    for parameter, values in parameters.items():
+        assert values.shape == (len(lat_lons), len(months_since_war)), (
+            parameter + " does not have the shape (cells, months)"
+        )
+        np.save(
+            os.path.join(directory, parameter + ".npy"), np.ascontiguousarray(values)
+        )
@@ -0,0 +1,252 @@
+"""
+Stores the results of the gridded model for several nuclear war scenarios
+as one array, so they can be compared in one go instead of one file at a time
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.processing.read_files import lookup_cell_ids, write_atomically
+from src.utilities import area_weights, weighted_quantiles
+
+# The scenarios of the gridded model, from the largest soot injection to the control run
+SCENARIOS = [str(i) + "tg" for i in [150, 47, 37, 27, 16, 5]] + ["control"]
+
+
+class ScenarioStore:
+    """
+    Holds one parameter of several scenarios as an array of the shape
+    (scenarios, cells, months). All scenarios share the same cells and months,
+    so the area of the cells and any selection of the cells are the same
+    for all of them. The store can be saved as a folder of arrays, which are
+    memory-mapped when it is loaded again
+    """
+
+    def __init__(self, scenarios, lat_lons, months, values, cell_ids=None):
+        """
+        Arguments:
+            scenarios: the names of the scenarios
+            lat_lons: an array of the shape (cells, 2) with the latitude and
+                longitude of each cell
+            months: the months since war of each month
+            values: an array of the shape (scenarios, cells, months)
+            cell_ids: the integer cell id of each cell in the area table, if known
+        """
+        self.scenarios = list(scenarios)
+        self.lat_lons = np.asarray(lat_lons, dtype=np.float64).reshape(-1, 2)
+        self.months = np.asarray(months)
+        self.values = values
+        assert self.values.shape == (
+            len(self.scenarios),
+            len(self.lat_lons),
+            len(self.months),
+        ), "values has to be (scenarios, cells, months)"
+        self.cell_ids = None
+        if cell_ids is not None:
+            self.cell_ids = np.asarray(cell_ids, dtype=np.int64)
+            assert self.cell_ids.shape == (len(self.lat_lons),)
+
+    @classmethod
+    def from_dataframes(cls, dataframes, cell_ids=None):
+        """
+        Creates the store from the result dataframes of the scenarios. Only the
+        cells and months that all scenarios have are kept, in the order of the
+        first scenario
+        Arguments:
+            dataframes: a dictionary with the scenarios as keys and dataframes
+                with the cells as index and the months as columns as values
+            cell_ids: a dictionary with the cell ids of the rows of the
+                dataframes for the scenarios where they are known
+        Returns:
+            a ScenarioStore
+        """
+        assert len(dataframes) > 0, "at least one scenario is needed"
+        cell_ids = {} if cell_ids is None else cell_ids
+        scenarios = list(dataframes.keys())
+        first = dataframes[scenarios[0]].drop(columns=["cluster"], errors="ignore")
+        cells = first.index
+        months = first.columns
+        for scenario in scenarios[1:]:
+            cells = cells.intersection(dataframes[scenario].index, sort=False)
+            months = months.intersection(dataframes[scenario].columns, sort=False)
+        values = np.empty((len(scenarios), len(cells), len(months)))
+        store_cell_ids = None
+        for i, scenario in enumerate(scenarios):
+            scenario_df = dataframes[scenario]
+            rows = scenario_df.index.get_indexer(cells)
+            values[i] = scenario_df.iloc[rows][months].to_numpy(dtype=np.float64)
+            if store_cell_ids is None and cell_ids.get(scenario) is not None:
+                store_cell_ids = np.asarray(cell_ids[scenario])[rows]
+        return cls(scenarios, cells.tolist(), months.to_numpy(), values, store_cell_ids)
+
+    def save(self, directory):
+        """
+        Saves the store as a folder with one array per attribute. Every array
+        is written to a temporary file first and then replaces the old one,
+        so stores that are still memory-mapped keep their data
+        Arguments:
+            directory: the folder to save the store in
+        Returns:
+            None
+        """
+        os.makedirs(directory, exist_ok=True)
+        arrays = {
+            "scenarios": np.array(self.scenarios),
+            "lat_lons": self.lat_lons,
+            "months": self.months,
+            "values": np.ascontiguousarray(self.values),
+        }
+        if self.cell_ids is not None:
+            arrays["cell_ids"] = self.cell_ids
+        elif os.path.isfile(os.path.join(directory, "cell_ids.npy")):
+            os.remove(os.path.join(directory, "cell_ids.npy"))
+        for name, array in arrays.items():
+            file = os.path.join(directory, name + ".npy")
+            write_atomically(file, lambda handle: np.save(handle, array))
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Loads a store saved with save. The values are memory-mapped
+        Arguments:
+            directory: the folder of the store
+        Returns:
+            a ScenarioStore
+        """
+        cell_ids = None
+        if os.path.isfile(os.path.join(directory, "cell_ids.npy")):
+            cell_ids = np.load(os.path.join(directory, "cell_ids.npy"))
+        return cls(
+            np.load(os.path.join(directory, "scenarios.npy")).tolist(),
+            np.load(os.path.join(directory, "lat_lons.npy")),
+            np.load(os.path.join(directory, "months.npy")),
+            np.load(os.path.join(directory, "values.npy"), mmap_mode="r"),
+            cell_ids,
+        )
+
+    def cell_areas(self, areas):
+        """
+        Finds the area of every cell of the store
+        Arguments:
+            areas: the area table from read_files.read_area_file
+        Returns:
+            an array with the area of each cell, nan for cells that are
+            not in the area table
+        """
+        cell_ids = self.cell_ids
+        if cell_ids is None:
+            cell_ids = lookup_cell_ids(areas, self.lat_lons)
+        return area_weights(cell_ids, areas)
+
+    def weighted_quantiles(self, weights, quantiles, cells=None):
+        """
+        Calculates the weighted quantiles of every month for all scenarios.
+        The cells and their weights are selected once for all scenarios
+        Arguments:
+            weights: the weight of each cell. Cells with nan weights are not used
+            quantiles: a list of floats between 0 and 1
+            cells: a boolean mask or the positions of the cells to use. None uses all
+        Returns:
+            an array of the shape (scenarios, quantiles, months)
+        """
+        weights = np.asarray(weights, dtype=np.float64)
+        assert weights.shape == (len(self.lat_lons),), "one weight per cell is needed"
+        rows = np.ones(len(weights), dtype=bool) if cells is None else cells
+        rows = np.arange(len(weights))[rows]
+        rows = rows[~np.isnan(weights[rows])]
+        # Sorting the months of all scenarios together is slower than one
+        # scenario after another, as the array does not fit into the cache
+        # anymore. This also only reads one scenario at a time from disk
+        return np.stack(
+            [
+                weighted_quantiles(self.values[i, rows, :], weights[rows], quantiles)
+                for i in range(len(self.scenarios))
+            ]
+        )
+
+
+def scenario_file(scenario, parameter, global_or_US, path):
+    """
+    Gives the file of the results of a parameter for a scenario
+    Arguments:
+        scenario: the scenario, e.g. 150tg
+        parameter: the parameter, e.g. seaweed_growth_rate
+        global_or_US: a string of either "global" or "US" that indicates the scale
+        path: the folder of the interim data
+    Returns:
+        the path to the pickle of the results
+    """
+    return path + os.sep + scenario + os.sep + parameter + "_" + global_or_US + ".pkl"
+
+
+def cell_ids_file(scenario, global_or_US, path):
+    """
+    Gives the file of the cell ids of the results of a scenario
+    Arguments:
+        scenario: the scenario, e.g. 150tg
+        global_or_US: a string of either "global" or "US" that indicates the scale
+        path: the folder of the interim data
+    Returns:
+        the path to the array of the cell ids
+    """
+    return path + os.sep + scenario + os.sep + "cell_ids_" + global_or_US + ".npy"
+
+
+def read_scenario_store(
+    parameter,
+    global_or_US,
+    scenarios=None,
+    path="data" + os.sep + "interim_data",
+    cache=False,
+):
+    """
+    Reads the results of a parameter for all scenarios into one store
+    Arguments:
+        parameter: the parameter, e.g. seaweed_growth_rate
+        global_or_US: a string of either "global" or "US" that indicates the scale
+        scenarios: the scenarios to read. None reads all of SCENARIOS
+        path: the folder of the interim data
+        cache: if True, the store is saved in the folder scenarios of the
+            interim data and loaded from there the next time. It is created
+            again if a result or cell id file is newer than the store or the
+            scenarios change. This is only faster if the store is read
+            several times, as it is a second copy of the results on disk
+    Returns:
+        a ScenarioStore
+    """
+    scenarios = SCENARIOS if scenarios is None else list(scenarios)
+    directory = path + os.sep + "scenarios" + os.sep + parameter + "_" + global_or_US
+    files = [
+        scenario_file(scenario, parameter, global_or_US, path) for scenario in scenarios
+    ]
+    id_files = [
+        file
+        for file in [
+            cell_ids_file(scenario, global_or_US, path) for scenario in scenarios
+        ]
+        if os.path.isfile(file)
+    ]
+    values_file = os.path.join(directory, "values.npy")
+    if (
+        cache
+        and os.path.isfile(values_file)
+        and os.path.getmtime(values_file)
+        >= max(os.path.getmtime(file) for file in files + id_files)
+    ):
+        store = ScenarioStore.load(directory)
+        # The cell ids also have to be created again if their files were removed
+        if store.scenarios == scenarios and (store.cell_ids is not None) == (
+            len(id_files) > 0
+        ):
+            return store
+    dataframes = {}
+    cell_ids = {}
+    for scenario, file in zip(scenarios, files):
+        dataframes[scenario] = pd.read_pickle(file)
+        if os.path.isfile(cell_ids_file(scenario, global_or_US, path)):
+            cell_ids[scenario] = np.load(cell_ids_file(scenario, global_or_US, path))
+    store = ScenarioStore.from_dataframes(dataframes, cell_ids)
+    if cache:
+        store.save(directory)
+    return store
@@ -0,0 +1,379 @@
+"""
+Sobol sensitivity analysis of the seaweed growth model.
+
+The samples are created with the scheme of Saltelli (2002) and the indices
+are calculated with the estimators of Saltelli et al. (2010), the same as
+in SALib. The model is evaluated with the array functions in chunks, so only
+the model runs of one chunk are held in memory at a time. Both the chunks and
+the bootstrap of the confidence intervals can be run in worker processes.
+"""
+import math
+import warnings
+from statistics import NormalDist
+
+import numpy as np
+
+from src.model import parallel
+from src.model import seaweed_growth as sg
+
+# The inputs of the growth model and the ranges they are varied in.
+# The ranges are based on how far those values differ in nature
+GROWTH_MODEL_PROBLEM = {
+    "num_vars": 6,
+    "names": [
+        "nitrate",
+        "phosphate",
+        "ammonium",
+        "salinity",
+        "temperature",
+        "illumination",
+    ],
+    "bounds": [[0, 2.5], [0, 2.5], [0, 2.5], [0, 60], [5, 40], [0, 600]],
+}
+
+# The number of values of the bootstrapped model outputs that are held
+# in memory at once in each worker
+BOOTSTRAP_BATCH_VALUES = 20_000_000
+
+
+def growth_model_array(samples):
+    """
+    Calculates the growth rate for every row of a sample matrix
+    Arguments:
+        samples: array of the shape (rows, 6) with the columns in the order
+            of GROWTH_MODEL_PROBLEM["names"]
+    Returns:
+        the growth rate of each row
+    """
+    nitrate, phosphate, ammonium, salinity, temperature, illumination = samples.T
+    return sg.growth_factor_combination_array(
+        sg.illumination_array(illumination),
+        sg.temperature_array(temperature),
+        sg.nutrient_array(nitrate, ammonium, phosphate)[0],
+        sg.salinity_array(salinity),
+    )
+
+
+def runs_per_sample(num_vars, calc_second_order=True):
+    """
+    Calculates how often the model is run for every base sample
+    Arguments:
+        num_vars: the number of inputs of the model
+        calc_second_order: if True, the runs for the second order indices
+            are included
+    Returns:
+        the number of runs
+    """
+    return 2 * num_vars + 2 if calc_second_order else num_vars + 2
+
+
+def base_samples(problem, n, seed=None):
+    """
+    Creates the two independent matrices A and B the Saltelli samples are
+    built from, using a scrambled Sobol sequence
+    Arguments:
+        problem: dictionary with "num_vars" and "bounds", like in SALib
+        n: the number of base samples
+        seed: seed of the scrambling
+    Returns:
+        the matrices A and B, each of the shape (n, num_vars)
+        and scaled to the bounds
+    """
+    from scipy.stats import qmc
+
+    num_vars = problem["num_vars"]
+    sampler = qmc.Sobol(d=2 * num_vars, scramble=True, seed=seed)
+    with warnings.catch_warnings():
+        # Only powers of two keep the balance properties of the sequence,
+        # which the estimators do not need
+        warnings.simplefilter("ignore", UserWarning)
+        samples = sampler.random(n)
+    lower, upper = np.asarray(problem["bounds"], dtype=np.float64).T
+    samples = np.tile(lower, 2) + samples * np.tile(upper - lower, 2)
+    return samples[:, :num_vars], samples[:, num_vars:]
+
+
+def saltelli_block(a, b, calc_second_order=True):
+    """
+    Builds the model runs for a block of base samples. For every base sample
+    the runs are A, AB_1 ... AB_D, BA_1 ... BA_D and B, where AB_i is A with
+    the i-th column of B. This is the same order as in SALib
+    Arguments:
+        a: block of the matrix A of the shape (n, num_vars)
+        b: block of the matrix B of the shape (n, num_vars)
+        calc_second_order: if True, the runs BA_i are included
+    Returns:
+        array of the shape (n, runs per sample, num_vars)
+    """
+    n, num_vars = a.shape
+    block = np.empty((n, runs_per_sample(num_vars, calc_second_order), num_vars))
+    block[:, 0] = a
+    block[:, -1] = b
+    for i in range(num_vars):
+        block[:, 1 + i] = a
+        block[:, 1 + i, i] = b[:, i]
+        if calc_second_order:
+            block[:, 1 + num_vars + i] = b
+            block[:, 1 + num_vars + i, i] = a[:, i]
+    return block
+
+
+def saltelli_sample(problem, n, calc_second_order=True, seed=None):
+    """
+    Creates the complete sample matrix, which can also be used with SALib
+    Arguments:
+        problem: dictionary with "num_vars" and "bounds", like in SALib
+        n: the number of base samples
+        calc_second_order: if True, the runs for the second order indices
+            are included
+        seed: seed of the scrambling of the Sobol sequence
+    Returns:
+        array of the shape (n * runs per sample, num_vars)
+    """
+    a, b = base_samples(problem, n, seed=seed)
+    return saltelli_block(a, b, calc_second_order).reshape(-1, problem["num_vars"])
+
+
+def evaluate_chunk(chunk):
+    """
+    Builds the model runs of a chunk of base samples and evaluates them
+    Arguments:
+        chunk: tuple of the model, the blocks of A and B and calc_second_order
+    Returns:
+        the model outputs of the shape (n, runs per sample)
+    """
+    model, a, b, calc_second_order = chunk
+    block = saltelli_block(a, b, calc_second_order)
+    return np.asarray(model(block.reshape(-1, a.shape[1]))).reshape(block.shape[:2])
+
+
+def evaluate_model(
+    a,
+    b,
+    model=growth_model_array,
+    calc_second_order=True,
+    chunk_size=10_000,
+    n_jobs=1,
+    executor=None,
+):
+    """
+    Evaluates the model for all Saltelli runs. Only chunk_size base samples
+    are expanded into model runs at once
+    Arguments:
+        a: the matrix A of the shape (n, num_vars)
+        b: the matrix B of the shape (n, num_vars)
+        model: a function that takes a sample matrix of the shape (rows, num_vars)
+            and returns one value per row. It has to be defined on module
+            level to be used with worker processes
+        calc_second_order: if True, the runs for the second order indices
+            are included
+        chunk_size: the number of base samples evaluated at once
+        n_jobs: the number of worker processes. -1 uses all cores
+        executor: an existing concurrent.futures executor to use instead
+    Returns:
+        the model outputs of the shape (n, runs per sample)
+    """
+    chunks = parallel.split_into_chunks(len(a), math.ceil(len(a) / chunk_size))
+    outputs = parallel.map_chunks(
+        evaluate_chunk,
+        [(model, a[rows], b[rows], calc_second_order) for rows in chunks],
+        n_jobs=n_jobs,
+        executor=executor,
+    )
+    return np.concatenate(outputs, axis=0)
+
+
+def sample_terms(outputs, num_vars, calc_second_order=True):
+    """
+    Calculates the terms of every base sample whose means make up the
+    estimators of the Sobol indices. As every estimator only needs means,
+    a bootstrap resample only has to average these terms again
+    Arguments:
+        outputs: the model outputs of the shape (n, runs per sample)
+        num_vars: the number of inputs of the model
+        calc_second_order: if True, the terms of the second order indices
+            are included
+    Returns:
+        array of the shape (n, terms)
+    """
+    a = outputs[:, :1]
+    b = outputs[:, -1:]
+    ab = outputs[:, 1 : 1 + num_vars]
+    terms = [a, b, a**2, b**2, b * (ab - a), (a - ab) ** 2]
+    if calc_second_order:
+        ba = outputs[:, 1 + num_vars : 1 + 2 * num_vars]
+        terms += [
+            a * b,
+            (ba[:, :, np.newaxis] * ab[:, np.newaxis, :]).reshape(len(a), -1),
+        ]
+    return np.concatenate(terms, axis=1)
+
+
+def sobol_estimates(means, num_vars, calc_second_order=True):
+    """
+    Calculates the Sobol indices from the means of the sample terms.
+    Any leading dimensions, e.g. for bootstrap resamples, are kept
+    Arguments:
+        means: the means of the terms of sample_terms of the shape (..., terms)
+        num_vars: the number of inputs of the model
+        calc_second_order: if True, the second order indices are calculated
+    Returns:
+        the first order, total and second order indices. The second order
+        indices are a matrix that is only filled above the diagonal, or None
+    """
+    mean_a, mean_b, mean_a2, mean_b2 = [means[..., i : i + 1] for i in range(4)]
+    # The variance of the outputs of A and B together
+    variance = (mean_a2 + mean_b2) / 2 - ((mean_a + mean_b) / 2) ** 2
+    first_order = means[..., 4 : 4 + num_vars] / variance
+    total = 0.5 * means[..., 4 + num_vars : 4 + 2 * num_vars] / variance
+    if not calc_second_order:
+        return first_order, total, None
+    mean_ab = means[..., 4 + 2 * num_vars : 5 + 2 * num_vars]
+    joint = means[..., 5 + 2 * num_vars :].reshape(
+        means.shape[:-1] + (num_vars, num_vars)
+    )
+    second_order = (joint - mean_ab[..., np.newaxis]) / variance[..., np.newaxis]
+    second_order -= first_order[..., :, np.newaxis] + first_order[..., np.newaxis, :]
+    second_order[..., ~np.triu(np.ones((num_vars, num_vars), dtype=bool), k=1)] = np.nan
+    return first_order, total, second_order
+
+
+def bootstrap_chunk(chunk):
+    """
+    Calculates the Sobol indices for several bootstrap resamples of the
+    base samples
+    Arguments:
+        chunk: tuple of the sample terms, num_vars, calc_second_order and
+            one seed for each resample
+    Returns:
+        the first order, total and second order indices with a first dimension
+        for the resamples
+    """
+    terms, num_vars, calc_second_order, seeds = chunk
+    n = len(terms)
+    # Only resample as many at once as fit into the memory limit
+    batch_size = max(BOOTSTRAP_BATCH_VALUES // n, 1)
+    means = []
+    for start in range(0, len(seeds), batch_size):
+        # How often each base sample is drawn in each resample
+        counts = np.stack(
+            [
+                np.bincount(
+                    np.random.default_rng(seed).integers(n, size=n), minlength=n
+                )
+                for seed in seeds[start : start + batch_size]
+            ]
+        )
+        means.append(counts @ terms / n)
+    return sobol_estimates(np.concatenate(means), num_vars, calc_second_order)
+
+
+def sobol_indices(
+    problem,
+    outputs,
+    calc_second_order=True,
+    num_resamples=100,
+    conf_level=0.95,
+    seed=None,
+    n_jobs=1,
+    executor=None,
+):
+    """
+    Calculates the first order, second order and total Sobol indices with
+    bootstrapped confidence intervals, like SALib.analyze.sobol
+    Arguments:
+        problem: dictionary with "num_vars" and "names", like in SALib
+        outputs: the model outputs, either in the order of the SALib samples
+            or of the shape (n, runs per sample)
+        calc_second_order: if True, the second order indices are calculated
+        num_resamples: the number of bootstrap resamples
+        conf_level: the confidence level of the intervals
+        seed: seed of the bootstrap. The result does not depend on n_jobs
+        n_jobs: the number of worker processes for the bootstrap
+        executor: an existing concurrent.futures executor to use instead
+    Returns:
+        a dictionary with the names and the indices S1, ST and S2 as well as
+        the half widths of their confidence intervals S1_conf, ST_conf and S2_conf
+    """
+    num_vars = problem["num_vars"]
+    outputs = np.asarray(outputs, dtype=np.float64).reshape(
+        -1, runs_per_sample(num_vars, calc_second_order)
+    )
+    # Normalize the outputs, like SALib does
+    outputs = (outputs - outputs.mean()) / outputs.std()
+    terms = sample_terms(outputs, num_vars, calc_second_order)
+    estimates = sobol_estimates(terms.mean(axis=0), num_vars, calc_second_order)
+    seeds = np.random.SeedSequence(seed).spawn(num_resamples)
+    chunks = parallel.split_into_chunks(num_resamples, parallel.resolve_n_jobs(n_jobs))
+    bootstraps = parallel.map_chunks(
+        bootstrap_chunk,
+        [(terms, num_vars, calc_second_order, seeds[c]) for c in chunks],
+        n_jobs=n_jobs,
+        executor=executor,
+    )
+    z_score = NormalDist().inv_cdf(0.5 + conf_level / 2)
+    results = {"names": list(problem["names"])}
+    for i, name in enumerate(["S1", "ST", "S2"]):
+        if estimates[i] is None:
+            continue
+        results[name] = estimates[i]
+        if num_resamples < 2:
+            # Not enough resamples to estimate the confidence intervals
+            results[name + "_conf"] = np.full_like(estimates[i], np.nan)
+            continue
+        resampled = np.concatenate([bootstrap[i] for bootstrap in bootstraps])
+        results[name + "_conf"] = z_score * np.std(resampled, axis=0, ddof=1)
+    return results
+
+
+def run_sobol_analysis(
+    problem=GROWTH_MODEL_PROBLEM,
+    n=100_000,
+    model=growth_model_array,
+    calc_second_order=True,
+    num_resamples=100,
+    conf_level=0.95,
+    chunk_size=10_000,
+    seed=None,
+    n_jobs=1,
+    executor=None,
+):
+    """
+    Runs the complete sensitivity analysis: creates the samples, evaluates
+    the model in chunks and calculates the Sobol indices. The complete
+    sample matrix is never created
+    Arguments:
+        problem: dictionary with "num_vars", "names" and "bounds", like in SALib
+        n: the number of base samples
+        model: a function that takes a sample matrix of the shape (rows, num_vars)
+            and returns one value per row
+        calc_second_order: if True, the second order indices are calculated
+        num_resamples: the number of bootstrap resamples
+        conf_level: the confidence level of the intervals
+        chunk_size: the number of base samples evaluated at once
+        seed: seed of the samples and the bootstrap
+        n_jobs: the number of worker processes. -1 uses all cores
+        executor: an existing concurrent.futures executor to use instead
+    Returns:
+        a dictionary with the indices, see sobol_indices
+    """
+    a, b = base_samples(problem, n, seed=seed)
+    outputs = evaluate_model(
+        a,
+        b,
+        model=model,
+        calc_second_order=calc_second_order,
+        chunk_size=chunk_size,
+        n_jobs=n_jobs,
+        executor=executor,
+    )
+    return sobol_indices(
+        problem,
+        outputs,
+        calc_second_order=calc_second_order,
+        num_resamples=num_resamples,
+        conf_level=conf_level,
+        seed=seed,
+        n_jobs=n_jobs,
+        executor=executor,
+    )
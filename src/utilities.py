@@ -2,10 +2,8 @@
 This files contains a collection of functions that are used in the main file,
 but are not directly related to the main functionality of the program.
 """
-import geopandas as gpd
+import numpy as np
 import pandas as pd
-from shapely.geometry import Point
-from statsmodels.stats.weightstats import DescrStatsW
 
 
 def prepare_geometry(growth_df):
@@ -18,6 +16,9 @@ def prepare_geometry(growth_df):
     Returns:
         None, but saves the plot
     """
+    import geopandas as gpd
+    from shapely.geometry import Point
+
     growth_df["latlon"] = growth_df.index
     growth_df["latitude"] = growth_df["latlon"].str[0]
     growth_df["longitude"] = growth_df["latlon"].str[1]
@@ -32,6 +33,80 @@ def prepare_geometry(growth_df):
     return growth_df
 
 
+def weighted_quantiles(data, weights, quantiles):
+    """
+    Calculates several weighted quantiles for every column of a matrix at once.
+    Every column is only sorted once. The quantiles are defined like in
+    statsmodels DescrStatsW: the weights of equal values are summed up and
+    if a quantile falls exactly between two values, their mean is used.
+    Nan values and their weights are ignored, nan weights count as 0 and
+    columns without any values give nan
+    Arguments:
+        data: a dataframe or array of the shape (cells, months) or a series
+        weights: the weight of every cell, either of the shape (cells,) or
+            the same shape as data
+        quantiles: a float or a list of floats between 0 and 1
+    Returns:
+        the quantiles of the shape (quantiles, months). If data is a dataframe,
+        a dataframe with the quantiles as index and the same columns as data.
+        If data is one dimensional, an array with one value per quantile
+    """
+    quantiles = np.atleast_1d(np.asarray(quantiles, dtype=np.float64))
+    assert (
+        (quantiles >= 0) & (quantiles <= 1)
+    ).all(), "The quantiles must be between 0 and 1"
+    values = np.asarray(data, dtype=np.float64)
+    one_dimensional = values.ndim == 1
+    values = values.reshape(len(values), -1)
+    weights = np.asarray(weights, dtype=np.float64)
+    if weights.ndim == 1:
+        assert len(weights) == len(
+            values
+        ), "The data and weights must have the same length"
+        weights = weights[:, np.newaxis]
+    weights = np.broadcast_to(weights, values.shape)
+    # Sort every column once, nan values go to the end. The order of equal
+    # values does not matter, as they are combined into one group below
+    order = np.argsort(values, axis=0)
+    values = np.take_along_axis(values, order, axis=0)
+    weights = np.take_along_axis(weights, order, axis=0)
+    valid = ~np.isnan(values)
+    n_valid = valid.sum(axis=0)
+    weights = np.where(valid & ~np.isnan(weights), weights, 0)
+    cumulative_weights = np.cumsum(weights, axis=0)
+    # Equal values are one group, which gets the cumulative weight of its end
+    rows = np.arange(len(values))[:, np.newaxis]
+    is_group_end = np.ones(values.shape, dtype=bool)
+    is_group_end[:-1] = values[:-1] != values[1:]
+    group_ends = np.where(is_group_end, rows, len(values))
+    group_ends = np.minimum.accumulate(group_ends[::-1], axis=0)[::-1]
+    group_weights = np.take_along_axis(cumulative_weights, group_ends, axis=0)
+    total_weights = group_weights[
+        np.maximum(n_valid - 1, 0), np.arange(values.shape[1])
+    ]
+    results = np.full((len(quantiles), values.shape[1]), np.nan)
+    columns = np.arange(values.shape[1])
+    for i, quantile in enumerate(quantiles):
+        targets = quantile * total_weights
+        # The first group that reaches the target
+        positions = np.minimum((group_weights < targets).sum(axis=0), n_valid - 1)
+        positions = np.maximum(positions, 0)
+        results[i] = values[positions, columns]
+        # If the target is hit exactly, use the mean with the next group
+        next_positions = group_ends[positions, columns] + 1
+        exact = (np.abs(targets - group_weights[positions, columns]) < 1e-10) & (
+            next_positions < n_valid
+        )
+        next_values = values[np.minimum(next_positions, len(values) - 1), columns]
+        results[i] = np.where(exact, (results[i] + next_values) / 2, results[i])
+    results[:, n_valid == 0] = np.nan
+    if one_dimensional:
+        return results[:, 0]
+    if isinstance(data, pd.DataFrame):
+        return pd.DataFrame(results, index=quantiles, columns=data.columns)
+    return results
+
+
 def weighted_quantile(data: pd.Series, weights: pd.Series, quantile: float) -> float:
     """
     Calculates the weighted quantile of s1 based on s2
@@ -49,6 +124,25 @@ def weighted_quantile(data: pd.Series, weights: pd.Series, quantile: float) -> f
     assert isinstance(quantile, float), "The quantile must be a float"
     assert 0 <= quantile <= 1, "The quantile must be between 0 and 1"
     # Calculate the weighted quantile
-    wq = DescrStatsW(data=data, weights=weights)
-    quantile = wq.quantile(probs=quantile, return_pandas=False)
-    return quantile
+    return weighted_quantiles(data, weights, [quantile])
+
+
+def area_weights(cell_ids, areas):
+    """
+    Gathers the area of grid cells from the area table by their integer cell id
+    Arguments:
+        cell_ids: the cell id of each cell, -1 for cells without an id
+        areas: the area table from read_files.read_area_file
+    Returns:
+        an array with the area of each cell, nan for cells that are
+        not in the area table
+    """
+    cell_ids = np.asarray(cell_ids, dtype=np.int64)
+    table_ids = areas["cell_id"].to_numpy(dtype=np.int64)
+    # A dense array from the cell id to the area, so the lookup is a gather
+    area_by_id = np.full(
+        max(table_ids.max(initial=-1), cell_ids.max(initial=-1)) + 2, np.nan
+    )
+    area_by_id[table_ids] = areas["TAREA"].to_numpy(dtype=np.float64)
+    # -1 points to the last entry, which is always nan
+    return area_by_id[cell_ids]
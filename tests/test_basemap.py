@@ -0,0 +1,70 @@
+"""
+Tests the countries that are drawn on the maps
+"""
+import hashlib
+import os
+import pickle
+
+import geopandas as gpd
+import numpy as np
+import pytest
+from shapely.geometry import box
+
+from src.plotting import basemap
+
+
+def write_countries(file, boxes):
+    """
+    Writes a shapefile with one rectangular country per box
+    """
+    gpd.GeoDataFrame(
+        {"NAME": [str(i) for i in range(len(boxes))]},
+        geometry=[box(*bounds) for bounds in boxes],
+        crs="EPSG:4326",
+    ).to_file(file)
+
+
+def test_read_basemap(tmp_path, monkeypatch):
+    """
+    Tests that the countries are clipped to the extent, that the aspect of all
+    countries is kept and that the cache is used until the shapefile changes
+    """
+    file = str(tmp_path / "countries.shp")
+    write_countries(file, [(-120, 20, -100, 40), (0, -60, 10, 0)])
+    extent = (-130, -65, 18, 55)
+    cache = basemap.read_basemap.__wrapped__(extent, file)
+    # The second country is outside of the extent and removed
+    assert len(cache["countries"]) == 1
+    assert cache["aspect"] == pytest.approx(1 / np.cos(np.radians(-10)))
+    cache_file = basemap.basemap_cache_file(file, extent)
+    assert os.path.isfile(cache_file)
+    # The shapefile is not read again while it is unchanged
+    with monkeypatch.context() as patch:
+        patch.setattr(gpd, "read_file", None)
+        cached = basemap.read_basemap.__wrapped__(extent, file)
+    assert cached["countries"].geometry.equals(cache["countries"].geometry)
+    # A touched shapefile is only hashed once
+    os.utime(file, ns=(0, 0))
+    basemap.read_basemap.__wrapped__(extent, file)
+    with monkeypatch.context() as patch:
+        patch.setattr(gpd, "read_file", None)
+        patch.setattr(hashlib, "sha256", None)
+        basemap.read_basemap.__wrapped__(extent, file)
+    # A pickle with another layout is created again
+    with open(cache_file, "wb") as handle:
+        pickle.dump({"countries": cache["countries"]}, handle)
+    assert len(basemap.read_basemap.__wrapped__(extent, file)["countries"]) == 1
+    # A changed shapefile creates the cache again
+    write_countries(
+        file, [(-120, 20, -100, 40), (-90, 30, -80, 50), (-70, 30, -60, 40)]
+    )
+    assert len(basemap.read_basemap.__wrapped__(extent, file)["countries"]) == 3
+
+
+def test_clip_countries():
+    """
+    Tests that the clipped countries reach beyond the extent by the margin
+    """
+    countries = gpd.GeoDataFrame(geometry=[box(-20, -20, 20, 20)], crs="EPSG:4326")
+    clipped = basemap.clip_countries(countries, (-10, 10, -5, 5), margin=1)
+    assert list(clipped.total_bounds) == [-11, -6, 11, 6]
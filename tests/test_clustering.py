@@ -0,0 +1,270 @@
+"""
+Tests the clustering of the time series
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.processing.clustering import (
+    BandedTimeSeriesKMeans,
+    assign_in_chunks,
+    cluster_time_series,
+    elbow_sweep,
+    label_agreement,
+    load_cluster_model,
+    piecewise_aggregate,
+    resolution_diagnostics,
+    sample_then_assign,
+    save_cluster_model,
+    scale_time_series,
+    stratified_sample,
+    time_series_analysis,
+)
+
+
+def create_growth_df():
+    """
+    Creates time series of three different shapes with some noise
+    """
+    rng = np.random.default_rng(3)
+    months = np.arange(24)
+    shapes = [np.sin(months / 4), np.cos(months / 4), months / 24]
+    rows = [
+        shape + rng.normal(0, 0.05, len(months)) for shape in shapes for _ in range(10)
+    ]
+    return pd.DataFrame(rows, columns=months - 3)
+
+
+def test_scale_time_series():
+    """
+    Tests that every month is scaled to the range between 0 and 1
+    """
+    timeseries_ds, scaler = scale_time_series(create_growth_df())
+    assert timeseries_ds.shape == (30, 24, 1)
+    np.testing.assert_allclose(timeseries_ds.min(axis=0), 0, atol=1e-12)
+    np.testing.assert_allclose(timeseries_ds.max(axis=0), 1)
+
+
+def test_elbow_sweep():
+    """
+    Tests that the sweep gives the same results in worker processes
+    and the same inertia as clustering each number of clusters on its own
+    """
+    growth_df = create_growth_df()
+    sweep_df = elbow_sweep(growth_df, [2, 3, 4], "US", random_state=1)
+    assert list(sweep_df.index) == [2, 3, 4]
+    assert list(sweep_df.columns) == ["inertia", "n_iter", "fit_seconds"]
+    assert (sweep_df["fit_seconds"] > 0).all()
+    parallel_df = elbow_sweep(growth_df, [4, 2, 3], "US", n_jobs=2, random_state=1)
+    pd.testing.assert_series_equal(parallel_df["inertia"], sweep_df["inertia"])
+    for n_clusters in [2, 3]:
+        _, km = time_series_analysis(growth_df, n_clusters, "US", random_state=1)
+        assert km.inertia_ == sweep_df.loc[n_clusters, "inertia"]
+    # The inertia gets smaller with more clusters
+    assert sweep_df.loc[3, "inertia"] < sweep_df.loc[2, "inertia"]
+
+
+def test_time_series_analysis_in_postprocessing():
+    """
+    Tests that time_series_analysis can still be used from postprocessing
+    """
+    from src.processing import postprocessing
+
+    growth_df = create_growth_df()
+    labels, km = postprocessing.time_series_analysis(growth_df, 2, "US", random_state=1)
+    expected_labels, expected_km = time_series_analysis(
+        growth_df, 2, "US", random_state=1
+    )
+    np.testing.assert_array_equal(labels, expected_labels)
+    assert km.inertia_ == expected_km.inertia_
+
+
+def test_banded_time_series_kmeans():
+    """
+    Tests that the banded clustering finds the same clusters as tslearn
+    and that the pruning skips some of the DTW distances
+    """
+    growth_df = create_growth_df()
+    labels, km = time_series_analysis(growth_df, 3, "US", random_state=1)
+    for radius in [23, 2]:
+        banded_labels, banded_km = time_series_analysis(
+            growth_df, 3, "US", random_state=1, sakoe_chiba_radius=radius
+        )
+        assert isinstance(banded_km, BandedTimeSeriesKMeans)
+        assert label_agreement(banded_labels, labels) == 1
+        assert banded_km.cluster_centers_.shape == (3, 24, 1)
+        assert banded_km.inertia_ > 0
+        # Every series is compared with every centroid once in each assignment
+        n_assignments = banded_km.n_iter_ + 1
+        assert banded_km.n_dtw_computed_ + banded_km.n_dtw_pruned_ == (
+            n_assignments * 30 * 3
+        )
+        np.testing.assert_array_equal(
+            banded_km.predict(scale_time_series(growth_df)[0]), banded_labels
+        )
+    # A narrow band makes the lower bounds tighter
+    assert banded_km.n_dtw_pruned_ > 0
+    sweep_df = elbow_sweep(growth_df, [2, 3], "US", sakoe_chiba_radius=2)
+    assert (sweep_df["inertia"] > 0).all()
+
+
+def test_label_agreement():
+    """
+    Tests that the numbering of the clusters does not matter
+    """
+    assert label_agreement([0, 0, 1, 1, 2], [2, 2, 0, 0, 1]) == 1
+    assert label_agreement([0, 0, 1, 1], [1, 1, 1, 1]) == 0.5
+    assert label_agreement([0, 1, 2, 3], [0, 0, 1, 1]) == 0.5
+
+
+def test_stratified_sample():
+    """
+    Tests that the sample is split between the latitudes by their area
+    and never draws cells without area
+    """
+    lats = np.repeat([-60.0, 0.0, 60.0], 100)
+    weights = np.repeat([1.0, 2.0, 1.0], 100)
+    sample = stratified_sample(lats, weights, 40, n_strata=3, random_state=0)
+    assert len(np.unique(sample)) == 40
+    assert (np.diff(sample) > 0).all()
+    np.testing.assert_array_equal(np.bincount(sample // 100), [10, 20, 10])
+    # Cells without an area are drawn like a cell of the mean area
+    weights[:95] = 0
+    weights[95] = np.nan
+    sample = stratified_sample(lats, weights, 200, n_strata=3, random_state=0)
+    assert len(np.unique(sample)) == 200
+    assert (sample >= 95).all()
+    np.testing.assert_array_equal(
+        stratified_sample(lats, None, 400, random_state=0), np.arange(300)
+    )
+    assert len(stratified_sample(lats, None, 0, random_state=0)) == 0
+    # Without any area there is nothing to sample by
+    with pytest.raises(AssertionError, match="area"):
+        stratified_sample(lats, np.full(300, np.nan), 40, random_state=0)
+
+
+def test_sample_then_assign():
+    """
+    Tests that fitting on a sample finds the same clusters as fitting on all
+    cells and that the chunks do not change the labels
+    """
+    growth_df = create_growth_df()
+    growth_df.index = pd.MultiIndex.from_arrays(
+        [np.linspace(-50, 50, 30), np.linspace(0, 300, 30)]
+    )
+    labels, _ = time_series_analysis(growth_df, 3, "US", random_state=1)
+    sample_labels, km = time_series_analysis(
+        growth_df, 3, "US", random_state=1, sample_size=12
+    )
+    assert km.cluster_centers_.shape == (3, 24, 1)
+    assert label_agreement(sample_labels, labels) == 1
+    chunk_labels, _, _ = sample_then_assign(
+        growth_df, 3, "US", 12, chunk_size=7, random_state=1
+    )
+    np.testing.assert_array_equal(chunk_labels, sample_labels)
+    _, scaler = scale_time_series(growth_df)
+    np.testing.assert_array_equal(
+        assign_in_chunks(km, growth_df, scaler, chunk_size=4), sample_labels
+    )
+
+
+def test_save_cluster_model(tmp_path):
+    """
+    Tests that a saved clustering assigns the time series to the same
+    clusters without the data it was fitted on
+    """
+    growth_df = create_growth_df()
+    file = str(tmp_path / "cluster_model_US.pkl")
+    for sakoe_chiba_radius in [None, 3]:
+        labels, km, scaler = cluster_time_series(
+            growth_df, 3, "US", random_state=1, sakoe_chiba_radius=sakoe_chiba_radius
+        )
+        save_cluster_model(file, km, scaler)
+        loaded_km, loaded_scaler = load_cluster_model(file)
+        assert getattr(loaded_km, "_X_fit", None) is None
+        if sakoe_chiba_radius is None:
+            # Only the saved copy is without the data
+            assert km._X_fit is not None
+        np.testing.assert_array_equal(loaded_km.cluster_centers_, km.cluster_centers_)
+        np.testing.assert_array_equal(
+            assign_in_chunks(loaded_km, growth_df, loaded_scaler), labels
+        )
+
+
+def test_piecewise_aggregate():
+    """
+    Tests that every segment is the mean of its months and that all months
+    are used if they cannot be split evenly
+    """
+    values = np.arange(10, dtype=float).reshape(1, 10)
+    np.testing.assert_allclose(
+        piecewise_aggregate(values, 5), [[0.5, 2.5, 4.5, 6.5, 8.5]]
+    )
+    np.testing.assert_allclose(piecewise_aggregate(values, 3), [[1, 4, 7.5]])
+    np.testing.assert_allclose(piecewise_aggregate(values, 10), values)
+
+
+def test_clustering_with_segments(tmp_path):
+    """
+    Tests that the clusters are found with fewer segments and that a saved
+    model applies the same reduction to new time series
+    """
+    growth_df = create_growth_df()
+    timeseries_ds, _ = scale_time_series(growth_df, n_segments=8)
+    assert timeseries_ds.shape == (30, 8, 1)
+    labels, km, scaler = cluster_time_series(
+        growth_df, 3, "US", random_state=1, n_segments=8
+    )
+    assert km.cluster_centers_.shape == (3, 8, 1)
+    file = str(tmp_path / "cluster_model_US.pkl")
+    save_cluster_model(file, km, scaler)
+    loaded_km, loaded_scaler = load_cluster_model(file)
+    np.testing.assert_array_equal(
+        assign_in_chunks(loaded_km, growth_df, loaded_scaler, chunk_size=7), labels
+    )
+    diagnostics_df = resolution_diagnostics(growth_df, 3, [24, 8, 4], "US")
+    assert list(diagnostics_df.index) == [24, 8, 4]
+    assert diagnostics_df.loc[24, "approximation_error"] == 0
+    assert diagnostics_df.loc[24, "label_agreement"] == 1
+    assert (diagnostics_df["approximation_error"].diff().iloc[1:] > 0).all()
+    assert (diagnostics_df["label_agreement"] > 0.9).all()
+
+
+def test_grid_saves_missing_cluster_model(tmp_path, monkeypatch):
+    """
+    Tests that grid fits the clusters again if only their model is missing,
+    so other scenarios can be assigned to them
+    """
+    from src.processing import postprocessing
+
+    growth_df = create_growth_df()
+    parameters = [
+        "salinity_factor",
+        "nutrient_factor",
+        "illumination_factor",
+        "temp_factor",
+        "nitrate_subfactor",
+        "ammonium_subfactor",
+        "phosphate_subfactor",
+        "seaweed_growth_rate",
+    ]
+    for scenario in ["150tg", "5tg"]:
+        folder = tmp_path / "data" / "interim_data" / scenario
+        folder.mkdir(parents=True)
+        for parameter in parameters:
+            growth_df.to_pickle(folder / (parameter + "_US.pkl"))
+    # Results that were clustered before the model was saved
+    folder = tmp_path / "data" / "interim_data" / "150tg"
+    growth_df.assign(cluster=0).to_pickle(
+        folder / "seaweed_growth_rate_clustered_US.pkl"
+    )
+    monkeypatch.chdir(tmp_path)
+    postprocessing.grid("150tg", "US")
+    assert (folder / "cluster_model_US.pkl").is_file()
+    labels = pd.read_pickle(folder / "seaweed_growth_rate_clustered_US.pkl")["cluster"]
+    assert labels.nunique() == 4
+    postprocessing.grid("5tg", "US", cluster_model_scenario="150tg")
+    assigned = pd.read_pickle(
+        tmp_path / "data" / "interim_data" / "5tg" / "salinity_factor_clustered_US.pkl"
+    )
+    np.testing.assert_array_equal(assigned["cluster"], labels)
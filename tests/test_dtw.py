@@ -0,0 +1,77 @@
+"""
+Tests the dynamic time warping with a Sakoe-Chiba band
+"""
+import numpy as np
+from tslearn.metrics import dtw, dtw_path
+
+from src.processing.dtw import (
+    envelope,
+    lb_keogh,
+    sakoe_chiba_alignment,
+    sakoe_chiba_dtw,
+)
+
+
+def create_series():
+    """
+    Creates random walks as time series
+    """
+    rng = np.random.default_rng(5)
+    return rng.normal(size=(40, 30)).cumsum(axis=1)
+
+
+def test_sakoe_chiba_dtw():
+    """
+    Tests that the distances are the same as the ones of tslearn
+    """
+    series = create_series()
+    for radius in [0, 2, 7, 29]:
+        distances = sakoe_chiba_dtw(series[:20], series[20:], radius)
+        expected = [
+            dtw(x, y, global_constraint="sakoe_chiba", sakoe_chiba_radius=radius)
+            for x, y in zip(series[:20], series[20:])
+        ]
+        np.testing.assert_allclose(distances, expected)
+    # A single series is compared with all of them
+    np.testing.assert_allclose(
+        sakoe_chiba_dtw(series, series[0], 3),
+        sakoe_chiba_dtw(series, np.repeat(series[:1], len(series), axis=0), 3),
+    )
+    np.testing.assert_allclose(sakoe_chiba_dtw(series, series, 3), 0)
+
+
+def test_sakoe_chiba_alignment():
+    """
+    Tests that the warping paths are the same as the ones of tslearn
+    """
+    series = create_series()
+    distances, pairs, months_x, months_y = sakoe_chiba_alignment(
+        series[:20], series[20:], 4
+    )
+    for pair, (x, y) in enumerate(zip(series[:20], series[20:])):
+        path, distance = dtw_path(
+            x, y, global_constraint="sakoe_chiba", sakoe_chiba_radius=4
+        )
+        # The paths are followed back from the last month
+        steps = pairs == pair
+        assert list(zip(months_x[steps], months_y[steps]))[::-1] == path
+        np.testing.assert_allclose(distances[pair], distance)
+
+
+def test_lb_keogh():
+    """
+    Tests that the lower bound is never larger than the DTW distance
+    """
+    series = create_series()
+    for radius in [0, 3, 10]:
+        lower, upper = envelope(series[:1], radius)
+        bounds = lb_keogh(series, lower[0], upper[0])
+        distances = sakoe_chiba_dtw(series, series[0], radius)
+        assert (bounds <= distances + 1e-12).all()
+        assert bounds[0] == 0
+    # Without a band, the bound is the euclidean distance
+    lower, upper = envelope(series[:1], 0)
+    np.testing.assert_allclose(
+        lb_keogh(series, lower[0], upper[0]),
+        np.linalg.norm(series - series[0], axis=1),
+    )
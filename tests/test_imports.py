@@ -0,0 +1,40 @@
+"""
+Tests that the model and the processing do not load the heavy
+dependencies when they are imported
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "src.model.seaweed_model",
+        "src.processing.postprocessing",
+        "src.processing.preprocessing",
+        "src.processing.scenario_store",
+        "src.processing.sensitivity",
+        "src.utilities",
+    ],
+)
+def test_no_heavy_imports(module):
+    """
+    Tests that importing a module in a new process does not load
+    geopandas, matplotlib, scipy.stats, sklearn, tslearn or xarray
+    """
+    code = (
+        "import sys\n"
+        "import {}\n"
+        "heavy = ['geopandas', 'matplotlib', 'scipy.stats', 'shapely', 'sklearn',\n"
+        "         'tslearn', 'xarray']\n"
+        "print(' '.join(m for m in heavy if m in sys.modules))\n"
+    ).format(module)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=root, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == []
@@ -0,0 +1,153 @@
+"""
+Tests the ocean grid class
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.model.ocean_grid import ENVIRONMENT_NAMES, GridSections, OceanGrid
+from src.model.ocean_section import OceanSection
+from src.model.seaweed_growth import GrowthParameters
+
+
+def create_test_grid(n_cells=5, n_months=7):
+    """
+    Creates a small grid with reasonable random values and returns it
+    """
+    rng = np.random.default_rng(1)
+    ranges = {
+        "salinity": (0, 50),
+        "temperature": (-2, 35),
+        "nitrate": (0, 15),
+        "ammonium": (0, 3),
+        "phosphate": (0, 2),
+        "illumination": (0, 200),
+    }
+    data = np.stack(
+        [
+            rng.uniform(*ranges[name], size=(n_cells, n_months))
+            for name in ENVIRONMENT_NAMES
+        ],
+        axis=2,
+    ).astype(np.float32)
+    # Add a cell on land without data
+    data[-1] = np.nan
+    lat_lons = np.stack(
+        [np.linspace(-10, 10, n_cells), np.linspace(100, 300, n_cells)], axis=1
+    )
+    return OceanGrid(lat_lons, data)
+
+
+def create_test_section(grid, position):
+    """
+    Creates an ocean section with the data of one cell of the grid
+    """
+    data = pd.DataFrame(grid.data[position], columns=ENVIRONMENT_NAMES)
+    section = OceanSection(grid.names[position], data)
+    section.calculate_factors()
+    section.calculate_growth_rate()
+    section.create_section_df()
+    return section
+
+
+def test_calculate_factors_matches_sections():
+    """
+    Tests that the grid calculates the same factors as the ocean sections
+    """
+    grid = create_test_grid()
+    grid.calculate_factors()
+    grid.calculate_growth_rate()
+    for position, lat_lon in enumerate(grid.names):
+        section = create_test_section(grid, position)
+        grid_section_df = grid.section(lat_lon).section_df
+        pd.testing.assert_frame_equal(
+            grid_section_df, section.section_df, check_dtype=False, rtol=1e-14
+        )
+
+
+def test_construct_df_for_parameter():
+    """
+    Tests that the dataframe of a parameter has the same format as the
+    one that is constructed from the sections
+    """
+    grid = create_test_grid()
+    grid.calculate_factors()
+    parameter_df = grid.construct_df_for_parameter("seaweed_growth_rate")
+    expected_df = pd.DataFrame.from_dict(
+        {
+            lat_lon: create_test_section(grid, position).section_df[
+                "seaweed_growth_rate"
+            ]
+            for position, lat_lon in enumerate(grid.names)
+        }
+    )
+    pd.testing.assert_frame_equal(parameter_df, expected_df, rtol=1e-14)
+    # Changing the dataframe does not change the grid
+    parameter_df.iloc[:, 0] = -1.0
+    assert not (grid.parameter_array("seaweed_growth_rate") == -1).any()
+    # The environmental data can be used without calculating the factors
+    assert create_test_grid().construct_df_for_parameter("salinity").shape == (7, 5)
+
+
+def test_construct_df_from_sections_for_date():
+    """
+    Tests that the dataframe for a date contains all parameters for all cells
+    """
+    grid = create_test_grid()
+    with pytest.raises(AssertionError):
+        grid.construct_df_from_sections_for_date(0)
+    grid.calculate_factors()
+    date_df = grid.construct_df_from_sections_for_date(0)
+    assert date_df.shape == (5, 14)
+    expected_row = create_test_section(grid, 1).select_section_df_date(0)
+    np.testing.assert_allclose(
+        date_df.loc[grid.names[1]].to_numpy(), expected_row.to_numpy(), rtol=1e-14
+    )
+
+
+def test_grid_sections():
+    """
+    Tests that the grid can be used like a dictionary of ocean sections
+    """
+    grid = create_test_grid()
+    sections = GridSections(grid)
+    assert len(sections) == 5
+    assert list(sections.keys()) == grid.names
+    assert grid.names[2] in sections
+    assert (0.0, 0.0) not in sections
+    section = sections[grid.names[2]]
+    assert isinstance(section, OceanSection)
+    assert section.salinity_factor is None
+    grid.calculate_factors()
+    assert sections[grid.names[2]].seaweed_growth_rate is not None
+
+
+def test_calculate_factors_parallel():
+    """
+    Tests that the factors are the same if they are calculated in chunks
+    """
+    grid = create_test_grid(n_cells=11)
+    grid.calculate_factors()
+    parallel_grid = create_test_grid(n_cells=11)
+    parallel_grid.calculate_factors(n_jobs=3)
+    np.testing.assert_array_equal(parallel_grid.factors, grid.factors)
+    with ThreadPoolExecutor(2) as executor:
+        parallel_grid.calculate_factors(n_jobs=4, executor=executor)
+    np.testing.assert_array_equal(parallel_grid.factors, grid.factors)
+
+
+def test_growth_rate_ensemble():
+    """
+    Tests that the ensemble of the grid has one growth rate per parameter set
+    """
+    grid = create_test_grid()
+    parameter_sets = [GrowthParameters(), GrowthParameters(kt2=0.1)]
+    ensemble = grid.growth_rate_ensemble(parameter_sets)
+    assert ensemble.shape == (2,) + grid.data.shape[:2]
+    assert grid.factors is None
+    grid.calculate_factors()
+    np.testing.assert_array_equal(
+        ensemble[0], grid.parameter_array("seaweed_growth_rate")
+    )
@@ -0,0 +1,40 @@
+"""
+Tests the helpers to run the model in worker processes
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.model.parallel import map_chunks, resolve_n_jobs, split_into_chunks
+
+
+def test_split_into_chunks():
+    """
+    Tests that the chunks cover all items in order
+    """
+    chunks = split_into_chunks(10, 3)
+    assert chunks == [slice(0, 3), slice(3, 6), slice(6, 10)]
+    assert split_into_chunks(2, 4) == [slice(0, 1), slice(1, 2)]
+    assert split_into_chunks(0, 4) == []
+
+
+def test_resolve_n_jobs():
+    """
+    Tests the translation of n_jobs into the number of workers
+    """
+    assert resolve_n_jobs(None) == 1
+    assert resolve_n_jobs(3) == 3
+    assert resolve_n_jobs(-1) >= 1
+    with pytest.raises(AssertionError):
+        resolve_n_jobs(0)
+
+
+def test_map_chunks():
+    """
+    Tests that the results keep the order of the chunks
+    """
+    chunks = list(range(20))
+    assert map_chunks(abs, chunks) == chunks
+    assert map_chunks(abs, chunks, n_jobs=2) == chunks
+    with ThreadPoolExecutor(3) as executor:
+        assert map_chunks(abs, chunks, executor=executor) == chunks
@@ -1,7 +1,9 @@
+import numpy as np
 import pandas as pd
 import pytest
+from statsmodels.stats.weightstats import DescrStatsW
 
-from src.utilities import weighted_quantile
+from src.utilities import area_weights, weighted_quantile, weighted_quantiles
 
 
 def test_weighted_quantile():
@@ -33,3 +35,44 @@ def test_weighted_quantile():
         weighted_quantile([0, 1], s4, 0)
     with pytest.raises(AssertionError):
         weighted_quantile(s1, s2.iloc[2:], 0)
+
+
+def test_weighted_quantiles():
+    """
+    Tests that the batched weighted quantiles match statsmodels
+    """
+    rng = np.random.default_rng(0)
+    # Use few distinct values, so there are ties and exact hits
+    data = rng.integers(0, 6, size=(30, 8)).astype(float)
+    data[rng.random(data.shape) < 0.2] = np.nan
+    data[:, -1] = np.nan
+    weights = rng.integers(0, 4, size=30).astype(float)
+    quantiles = [0, 0.1, 0.25, 0.5, 0.75, 0.9, 1]
+    df = pd.DataFrame(data, columns=range(-3, 5))
+    result = weighted_quantiles(df, pd.Series(weights), quantiles)
+    assert list(result.index) == quantiles
+    assert list(result.columns) == list(df.columns)
+    for j in range(data.shape[1] - 1):
+        valid = ~np.isnan(data[:, j])
+        expected = DescrStatsW(data[valid, j], weights=weights[valid]).quantile(
+            quantiles, return_pandas=False
+        )
+        np.testing.assert_allclose(result.iloc[:, j], expected)
+    # A column without data has no quantiles
+    assert result.iloc[:, -1].isna().all()
+    # One dimensional data gives one value per quantile
+    np.testing.assert_array_equal(
+        weighted_quantiles([1, 2, 9, 3.2, 4], [0.0, 0.5, 1.0, 0.3, 0.5], [0.1, 0.9]),
+        [2, 9],
+    )
+    with pytest.raises(AssertionError):
+        weighted_quantiles(df, weights, [1.5])
+
+
+def test_area_weights():
+    """
+    Tests that the area of the cells is found by their cell id
+    """
+    areas = pd.DataFrame({"TAREA": [1.5, 2.5, 3.5], "cell_id": [7, 2, 4]})
+    weights = area_weights([4, 7, -1, 2, 3], areas)
+    np.testing.assert_array_equal(weights, [3.5, 1.5, np.nan, 2.5, np.nan])
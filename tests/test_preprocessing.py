@@ -0,0 +1,177 @@
+"""
+Tests the preparation of the gridded data
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.model.seaweed_model import SeaweedModel
+from src.processing.preprocessing import (
+    ENV_PARAMS,
+    convert_gridded_pickle_to_columnar,
+    create_gridded_data_dict,
+    prepare_gridded_data,
+    read_gridded_data,
+    read_gridded_parameter,
+)
+from src.processing.read_files import DataGrid
+
+
+def create_test_parameter_df(science_name):
+    """
+    Creates a dataframe in the same format as the pickled environmental
+    parameters, with four months for three grid cells
+    """
+    times = ["0005-0{}-01".format(month) for month in range(2, 6)]
+    lat_lons = [(10.5, 200.25), (-3.0, 100.0), (10.5, 100.0)]
+    index = pd.MultiIndex.from_tuples(
+        [(time, lon, lat) for time in times for lat, lon in lat_lons],
+        names=["time", "TLONG", "TLAT"],
+    )
+    values = np.arange(len(index), dtype=np.float32) - 2
+    return pd.DataFrame({science_name: values}, index=index)
+
+
+def write_test_files(path):
+    """
+    Writes the test dataframes of all parameters to the folder structure
+    expected by read_gridded_data
+    """
+    folder = os.path.join(path, "data", "test_folder", "test_scenario")
+    os.makedirs(folder)
+    for science_name in ENV_PARAMS.keys():
+        create_test_parameter_df(science_name).to_pickle(
+            os.path.join(folder, "nw_" + science_name + "_test.pkl")
+        )
+
+
+def test_read_gridded_parameter(tmp_path):
+    """
+    Tests that a parameter is reshaped into one row per grid cell,
+    sorted by latitude and longitude
+    """
+    file = str(tmp_path / "nw_NO3_test.pkl")
+    create_test_parameter_df("NO3").to_pickle(file)
+    lat_lons, time, values = read_gridded_parameter(file, "nitrate")
+    np.testing.assert_array_equal(
+        lat_lons, [[-3.0, 100.0], [10.5, 100.0], [10.5, 200.25]]
+    )
+    assert list(time) == ["0005-0{}-01".format(month) for month in range(2, 6)]
+    assert values.shape == (3, 4)
+    # The cell (-3.0, 100.0) is the second one in each month of the file
+    np.testing.assert_array_equal(values[0], [-1, 2, 5, 8])
+
+
+def test_read_gridded_data(tmp_path):
+    """
+    Tests that all parameters are read and that the negative nutrients
+    are set to zero
+    """
+    write_test_files(str(tmp_path))
+    lat_lons, time, parameters = read_gridded_data(
+        str(tmp_path), "test_folder", "test_scenario", "test"
+    )
+    assert list(parameters.keys()) == list(ENV_PARAMS.values())
+    for parameter in ["nitrate", "ammonium", "phosphate"]:
+        assert parameters[parameter].min() == 0
+    # The other parameters are not changed
+    assert parameters["temperature"].min() < 0
+
+
+def test_create_gridded_data_dict(tmp_path):
+    """
+    Tests that the dataframe of each grid cell has all parameters
+    """
+    write_test_files(str(tmp_path))
+    data_dict = create_gridded_data_dict(
+        *read_gridded_data(str(tmp_path), "test_folder", "test_scenario", "test")
+    )
+    assert list(data_dict.keys()) == [(-3.0, 100.0), (10.5, 100.0), (10.5, 200.25)]
+    cell_df = data_dict[(10.5, 200.25)]
+    assert list(cell_df.columns) == ["TLONG", "TLAT"] + list(ENV_PARAMS.values()) + [
+        "months_since_war"
+    ]
+    assert cell_df.index.name == "time"
+    assert list(cell_df["months_since_war"]) == [-4, -3, -2, -1]
+    assert (cell_df["TLAT"] == 10.5).all()
+
+
+def test_prepare_gridded_data_columnar(tmp_path):
+    """
+    Tests that the columnar format and the converted pickle give the same
+    data to the model as the pickle
+    """
+    write_test_files(str(tmp_path))
+    os.makedirs(os.path.join(str(tmp_path), "data", "interim_data", "test_scenario"))
+    for file_format in ["pickle", "columnar"]:
+        prepare_gridded_data(
+            str(tmp_path),
+            "test_folder",
+            "test_scenario",
+            "test",
+            "US",
+            file_format=file_format,
+        )
+    folder = os.path.join(str(tmp_path), "data", "interim_data", "test_scenario")
+    convert_gridded_pickle_to_columnar(
+        os.path.join(folder, "data_gridded_all_parameters_US.pkl"),
+        os.path.join(folder, "converted"),
+    )
+    parameter_dfs = []
+    for file in [
+        "data_gridded_all_parameters_US.pkl",
+        "data_gridded_all_parameters_US",
+        "converted",
+    ]:
+        model = SeaweedModel()
+        model.add_data_by_grid(os.path.join(folder, file))
+        parameter_dfs.append(model.construct_df_for_parameter("nitrate"))
+    pd.testing.assert_frame_equal(parameter_dfs[0], parameter_dfs[1])
+    pd.testing.assert_frame_equal(parameter_dfs[0], parameter_dfs[2])
+
+
+def test_prepare_gridded_data_cell_ids(tmp_path):
+    """
+    Tests that the cell ids from the area table are saved with the data
+    in both formats and passed on to the model
+    """
+    write_test_files(str(tmp_path))
+    folder = os.path.join(str(tmp_path), "data", "interim_data", "test_scenario")
+    os.makedirs(folder)
+    # The area table stores the coordinates with a different precision
+    areas = pd.DataFrame(
+        {
+            "TLONG": [100.0, 200.25000001, 100.0],
+            "TLAT": [10.5, 10.49999999, 0.0],
+            "TAREA": [1.0, 2.0, 3.0],
+            "cell_id": [5, 9, 11],
+        }
+    ).set_index(["TLONG", "TLAT"])
+    for file_format in ["pickle", "columnar"]:
+        prepare_gridded_data(
+            str(tmp_path),
+            "test_folder",
+            "test_scenario",
+            "test",
+            "US",
+            file_format=file_format,
+            areas=areas,
+        )
+    convert_gridded_pickle_to_columnar(
+        os.path.join(folder, "data_gridded_all_parameters_US.pkl"),
+        os.path.join(folder, "converted"),
+    )
+    for file in [
+        "data_gridded_all_parameters_US.pkl",
+        "data_gridded_all_parameters_US",
+        "converted",
+    ]:
+        # The cells are (-3.0, 100.0), (10.5, 100.0) and (10.5, 200.25)
+        data_grid = DataGrid(os.path.join(folder, file))
+        np.testing.assert_array_equal(data_grid.cell_ids, [-1, 5, 9])
+        data_grid = DataGrid(os.path.join(folder, file), bounding_box=(0, 20, 150, 250))
+        np.testing.assert_array_equal(data_grid.cell_ids, [9])
+        model = SeaweedModel()
+        model.add_data_by_grid(os.path.join(folder, file))
+        np.testing.assert_array_equal(model.grid.cell_ids, [-1, 5, 9])
@@ -0,0 +1,50 @@
+"""
+Tests the raster of the grid cells for the maps
+"""
+import matplotlib
+import numpy as np
+import pandas as pd
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+
+from src.plotting.raster import CellRaster, cell_raster  # noqa: E402
+
+
+def test_cell_raster():
+    """
+    Tests that every pixel shows the nearest cell and that pixels far away
+    from all cells stay empty
+    """
+    # Cells of 1 degree in longitude and 0.5 degrees in latitude,
+    # on both sides of the date line
+    lats, lons = np.meshgrid(np.arange(0.25, 5, 0.5), np.arange(177.5, 183))
+    lats, lons = lats.ravel(), lons.ravel()
+    raster = CellRaster(lats, lons, (175, 185, -5, 5), resolution=0.5)
+    assert raster.shape == (20, 20)
+    values = np.arange(len(lats))
+    image = raster.rasterize(values)
+    # The pixel at 180.25 E, 2.25 N is in the cell at 180.5 E, 2.25 N
+    assert image[14, 10] == values[(lons == 180.5) & (lats == 2.25)][0]
+    # Longitudes from -180 to 180 give the same raster
+    west = CellRaster(lats, np.where(lons > 180, lons - 360, lons), raster.extent, 0.5)
+    np.testing.assert_array_equal(west.cells, raster.cells)
+    # No gaps between the cells, but nothing far south of them
+    assert not image[10:, 5:16].mask.any()
+    assert image[:8].mask.all()
+
+
+def test_draw():
+    """
+    Tests that the raster is drawn as one image
+    """
+    index = pd.MultiIndex.from_arrays([[20.0, 20.0, 21.0], [240.0, 241.0, 240.0]])
+    growth_df = pd.DataFrame({"cluster": [1, 2, 1]}, index=index)
+    raster = cell_raster(growth_df, "US")
+    fig, ax = plt.subplots()
+    image = raster.draw(ax, growth_df["cluster"], vmin=1, vmax=2)
+    assert ax.get_images() == [image]
+    assert image.get_extent() == list(raster.extent)
+    assert image.get_array().count() > 0
+    plt.close(fig)
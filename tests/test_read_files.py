@@ -1,9 +1,22 @@
 """
 Tests the reading and writing of files
 """
+import hashlib
+import os
+import shutil
+from collections.abc import Mapping
+
+import numpy as np
 import pandas as pd
+import pytest
 
-from src.processing.read_files import DataGrid, DataLME
+from src.processing.read_files import (
+    DataGrid,
+    DataLME,
+    lookup_cell_ids,
+    read_area_file,
+    write_data_grid_columnar,
+)
 
 
 def test_read_file_by_lme():
@@ -15,13 +28,20 @@ def test_read_file_by_lme():
     assert isinstance(data_LME, DataLME)
     assert data_LME is not None
     # Make sure the data is read in
-    assert isinstance(data_LME.lme_dict, dict)
+    assert isinstance(data_LME.lme_dict, Mapping)
+    # The dataframes are only created when they are used
+    assert data_LME.lme_dict.cache == {}
     # Make sure the data is correct
     assert len(data_LME.lme_dict) == 66  # number of LMEs
-    for df in data_LME.lme_dict.values():
+    assert data_LME.lme_numbers == list(range(1, 67))
+    for lme_number in data_LME.lme_numbers:
+        df = data_LME.provide_data_lme(lme_number)
         assert isinstance(df, pd.DataFrame)
         # 240 months, 6 parameters
         assert df.shape == (240, 6)
+        assert df.index.is_monotonic_increasing
+        assert (df["nitrate"] >= 0).all()
+    assert data_LME.provide_data_lme(3) is data_LME.lme_dict[3]
 
 
 def test_read_file_by_grid():
@@ -39,3 +59,156 @@ def test_read_file_by_grid():
         assert isinstance(df, pd.DataFrame)
         # 6 parameters + lat + lon
         assert df.shape[1] == 10
+
+
+def test_read_file_by_grid_columnar(tmp_path):
+    """
+    Tests that DataGrid memory-maps the columnar format
+    """
+    lat_lons = np.array([[-3.0, 100.0], [10.5, 100.0], [10.5, 200.25]])
+    parameters = {
+        "salinity": np.arange(12, dtype=np.float32).reshape(3, 4),
+        "temperature": -np.arange(12, dtype=np.float32).reshape(3, 4),
+    }
+    write_data_grid_columnar(str(tmp_path), lat_lons, parameters, range(-4, 0))
+    data_grid = DataGrid(str(tmp_path))
+    assert isinstance(data_grid.parameters["salinity"], np.memmap)
+    # The data of the cells is provided the same way as for the pickle
+    cell_df = data_grid.provide_data_grid((10.5, 100.0))
+    assert list(cell_df.columns) == [
+        "TLONG",
+        "TLAT",
+        "salinity",
+        "temperature",
+        "months_since_war",
+    ]
+    assert list(cell_df["salinity"]) == [4, 5, 6, 7]
+    with pytest.raises(KeyError):
+        data_grid.provide_data_grid((0.0, 0.0))
+    grid_lat_lons, data = data_grid.provide_data_array(["temperature", "salinity"])
+    np.testing.assert_array_equal(grid_lat_lons, lat_lons)
+    assert data.shape == (3, 4, 2)
+    np.testing.assert_array_equal(data[2, :, 0], [-8, -9, -10, -11])
+
+
+def test_read_file_by_grid_filtered(tmp_path):
+    """
+    Tests that DataGrid only loads the cells, parameters and months
+    that are requested, for both formats
+    """
+    lat_lons = np.array([[-3.0, 100.0], [10.5, 100.0], [10.5, 355.0], [50.0, 5.0]])
+    parameters = {
+        "salinity": np.arange(16, dtype=np.float32).reshape(4, 4),
+        "temperature": -np.arange(16, dtype=np.float32).reshape(4, 4),
+    }
+    write_data_grid_columnar(
+        str(tmp_path / "columnar"), lat_lons, parameters, range(-4, 0)
+    )
+    grid_dict = {
+        tuple(lat_lon): pd.DataFrame(
+            {
+                "TLONG": lat_lon[1],
+                "TLAT": lat_lon[0],
+                "salinity": parameters["salinity"][i],
+                "temperature": parameters["temperature"][i],
+                "months_since_war": range(-4, 0),
+            }
+        )
+        for i, lat_lon in enumerate(lat_lons.tolist())
+    }
+    pd.to_pickle(grid_dict, tmp_path / "grid.pkl")
+    for file in [str(tmp_path / "columnar"), str(tmp_path / "grid.pkl")]:
+        # The box crosses 0 degrees longitude and the first month is -3
+        data_grid = DataGrid(
+            file,
+            bounding_box=(0, 60, 350, 10),
+            variables=["temperature"],
+            month_range=(-2, 10),
+        )
+        grid_lat_lons, data = data_grid.provide_data_array(["temperature"])
+        np.testing.assert_array_equal(grid_lat_lons, lat_lons[2:])
+        np.testing.assert_array_equal(data[:, :, 0], parameters["temperature"][2:, 1:])
+        np.testing.assert_array_equal(data_grid.months, [-2, -1, 0])
+        cell_df = data_grid.provide_data_grid((50.0, 5.0))
+        assert list(cell_df.columns) == [
+            "TLONG",
+            "TLAT",
+            "temperature",
+            "months_since_war",
+        ]
+        assert list(cell_df["temperature"]) == [-13, -14, -15]
+        with pytest.raises(KeyError):
+            data_grid.provide_data_grid((10.5, 100.0))
+
+
+def test_read_file_by_lme_cache(tmp_path, monkeypatch):
+    """
+    Tests that the parsed LME csv is cached and that the cache is rebuilt
+    once the csv changes
+    """
+    file = str(tmp_path / "lme.csv")
+    shutil.copy("data/lme_data/seaweed_environment_data_in_nuclear_war.csv", file)
+    data_LME = DataLME(file)
+    assert os.path.exists(file + ".cache.npz")
+    expected_df = data_LME.provide_data_lme(5)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the csv should not be parsed")
+
+    # The second time the csv is not parsed at all
+    with monkeypatch.context() as patch:
+        patch.setattr(pd, "read_csv", fail)
+        cached_df = DataLME(file).provide_data_lme(5)
+    pd.testing.assert_frame_equal(cached_df, expected_df)
+    # Touching the file does not change the content
+    os.utime(file, ns=(0, 0))
+    with monkeypatch.context() as patch:
+        patch.setattr(pd, "read_csv", fail)
+        DataLME(file)
+    # The cache got the new modification time, so the csv is not hashed again
+    with monkeypatch.context() as patch:
+        patch.setattr(pd, "read_csv", fail)
+        patch.setattr(hashlib, "sha256", fail)
+        DataLME(file)
+    # A cache without the fingerprint is rebuilt
+    np.savez(file + ".cache.npz", size=os.path.getsize(file))
+    pd.testing.assert_frame_equal(DataLME(file).provide_data_lme(5), expected_df)
+    # A truncated cache is rebuilt
+    cache_size = os.path.getsize(file + ".cache.npz")
+    with open(file + ".cache.npz", "r+b") as handle:
+        handle.truncate(cache_size // 2)
+    pd.testing.assert_frame_equal(DataLME(file).provide_data_lme(5), expected_df)
+    assert os.path.getsize(file + ".cache.npz") == cache_size
+    # Changing the content rebuilds the cache
+    with open(file) as handle:
+        lines = handle.readlines()
+    lines = [line for line in lines if not line.startswith("5,")]
+    with open(file, "w") as handle:
+        handle.writelines(lines)
+    data_LME = DataLME(file)
+    assert 5 not in data_LME.lme_numbers
+    assert 5 not in DataLME(file).lme_numbers
+
+
+def test_read_area_file_cell_ids(tmp_path):
+    """
+    Tests that area files without cell ids get the position of the row as id
+    and that cells are found by their rounded coordinates
+    """
+    areas = pd.DataFrame(
+        {
+            "TLONG": [100.0, 200.25, 100.0],
+            "TLAT": [-3.0, -3.0, 10.50001],
+            "TAREA": [1.0, 2.0, 3.0],
+        }
+    ).set_index(["TLONG", "TLAT"])
+    areas.to_csv(tmp_path / "area_grid.csv", sep=";")
+    areas = read_area_file(str(tmp_path), "area_grid.csv")
+    assert list(areas["cell_id"]) == [0, 1, 2]
+    cell_ids = lookup_cell_ids(
+        areas, np.array([[10.5, 100.0], [-3.0, 100.0], [45.0, 100.0]])
+    )
+    np.testing.assert_array_equal(cell_ids, [2, 0, -1])
+    # An index of (lat, lon) tuples like in the results works as well
+    index = pd.MultiIndex.from_tuples([(-3.0, 200.25), (10.5, 100.0)])
+    np.testing.assert_array_equal(lookup_cell_ids(areas, index), [1, 2])
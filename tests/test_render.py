@@ -0,0 +1,36 @@
+"""
+Tests rendering the figures in worker processes
+"""
+import matplotlib
+import numpy as np
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+
+from src.plotting.render import render_figures  # noqa: E402
+
+
+def plot_line(values, file):
+    """
+    Plots a line and saves it
+    """
+    plt.plot(values)
+    plt.savefig(file, dpi=50)
+
+
+def test_render_figures(tmp_path):
+    """
+    Tests that the figures are the same in worker processes
+    and that no figures are left open
+    """
+    figures = {}
+    for n_jobs in [1, 2]:
+        arguments = [
+            (np.arange(5) * i, str(tmp_path / "{}_{}.png".format(n_jobs, i)))
+            for i in range(3)
+        ]
+        render_figures(plot_line, arguments, n_jobs=n_jobs)
+        figures[n_jobs] = [open(file, "rb").read() for _, file in arguments]
+    assert figures[1] == figures[2]
+    assert plt.get_fignums() == []
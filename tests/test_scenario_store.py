@@ -0,0 +1,123 @@
+"""
+Tests the store of the results of several scenarios
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.processing.scenario_store import ScenarioStore, read_scenario_store
+from src.utilities import weighted_quantiles
+
+
+def create_result_dfs():
+    """
+    Creates result dataframes for three scenarios. The second scenario has
+    the cells in a different order and one cell less than the others
+    """
+    rng = np.random.default_rng(1)
+    lat_lons = [(-50.0, 10.0), (-3.0, 100.0), (10.5, 100.0), (10.5, 200.25)]
+    dataframes = {}
+    for scenario in ["150tg", "5tg", "control"]:
+        index = pd.MultiIndex.from_tuples(lat_lons)
+        dataframes[scenario] = pd.DataFrame(
+            rng.random((len(lat_lons), 6)), index=index, columns=range(-3, 3)
+        )
+    dataframes["5tg"] = dataframes["5tg"].iloc[[3, 1, 0]]
+    return dataframes
+
+
+def test_scenario_store_alignment():
+    """
+    Tests that the scenarios are aligned on the cells they all have
+    """
+    dataframes = create_result_dfs()
+    store = ScenarioStore.from_dataframes(
+        dataframes, cell_ids={"5tg": np.array([30, 10, 0])}
+    )
+    assert store.values.shape == (3, 3, 6)
+    np.testing.assert_array_equal(
+        store.lat_lons, [[-50.0, 10.0], [-3.0, 100.0], [10.5, 200.25]]
+    )
+    np.testing.assert_array_equal(store.cell_ids, [0, 10, 30])
+    np.testing.assert_array_equal(store.months, range(-3, 3))
+    for i, (scenario, scenario_df) in enumerate(dataframes.items()):
+        np.testing.assert_array_equal(
+            store.values[i],
+            scenario_df.loc[[tuple(lat_lon) for lat_lon in store.lat_lons.tolist()]],
+        )
+
+
+def test_scenario_store_weighted_quantiles():
+    """
+    Tests that the quantiles of all scenarios at once are the same
+    as calculating them for one scenario after another
+    """
+    store = ScenarioStore.from_dataframes(create_result_dfs())
+    weights = np.array([1.0, np.nan, 2.0])
+    cells = store.lat_lons[:, 0] > -45
+    results = store.weighted_quantiles(weights, [0.25, 0.5], cells)
+    assert results.shape == (3, 2, 6)
+    for i in range(len(store.scenarios)):
+        expected = weighted_quantiles(store.values[i][[2]], weights[[2]], [0.25, 0.5])
+        np.testing.assert_array_equal(results[i], expected)
+    results = store.weighted_quantiles(weights, [0.5])
+    for i in range(len(store.scenarios)):
+        expected = weighted_quantiles(store.values[i][[0, 2]], weights[[0, 2]], [0.5])
+        np.testing.assert_array_equal(results[i], expected)
+
+
+def test_read_scenario_store(tmp_path):
+    """
+    Tests that the store is only saved if asked for and that the
+    saved store is created again when the results or the cell ids change
+    """
+    path = str(tmp_path)
+    dataframes = create_result_dfs()
+    for scenario, scenario_df in dataframes.items():
+        os.makedirs(os.path.join(path, scenario))
+        scenario_df.to_pickle(
+            os.path.join(path, scenario, "seaweed_growth_rate_global.pkl")
+        )
+    scenarios = list(dataframes.keys())
+    directory = os.path.join(path, "scenarios", "seaweed_growth_rate_global")
+    store = read_scenario_store("seaweed_growth_rate", "global", scenarios, path)
+    assert not os.path.exists(directory)
+    store = read_scenario_store(
+        "seaweed_growth_rate", "global", scenarios, path, cache=True
+    )
+    assert os.path.isfile(os.path.join(directory, "values.npy"))
+    loaded = read_scenario_store(
+        "seaweed_growth_rate", "global", scenarios, path, cache=True
+    )
+    assert isinstance(loaded.values, np.memmap)
+    np.testing.assert_array_equal(loaded.values, store.values)
+    assert loaded.scenarios == scenarios
+    # A newer result file replaces the store
+    changed_df = dataframes["control"] * 2
+    changed_file = os.path.join(path, "control", "seaweed_growth_rate_global.pkl")
+    changed_df.to_pickle(changed_file)
+    values_file = os.path.join(directory, "values.npy")
+    os.utime(changed_file, (os.path.getmtime(values_file) + 10,) * 2)
+    changed = read_scenario_store(
+        "seaweed_growth_rate", "global", scenarios, path, cache=True
+    )
+    np.testing.assert_array_equal(changed.values[2], store.values[2] * 2)
+    assert changed.cell_ids is None
+    # Newer cell ids replace the store
+    ids_file = os.path.join(path, scenarios[0], "cell_ids_global.npy")
+    np.save(ids_file, np.arange(len(dataframes[scenarios[0]])) + 10)
+    os.utime(ids_file, (os.path.getmtime(values_file) + 10,) * 2)
+    with_ids = read_scenario_store(
+        "seaweed_growth_rate", "global", scenarios, path, cache=True
+    )
+    assert with_ids.cell_ids is not None
+    np.save(ids_file, np.arange(len(dataframes[scenarios[0]])) + 20)
+    os.utime(ids_file, (os.path.getmtime(values_file) + 10,) * 2)
+    new_ids = read_scenario_store(
+        "seaweed_growth_rate", "global", scenarios, path, cache=True
+    )
+    np.testing.assert_array_equal(new_ids.cell_ids, with_ids.cell_ids + 10)
+    # Another selection of scenarios does not use the saved store
+    subset = read_scenario_store("seaweed_growth_rate", "global", ["control"], path)
+    assert subset.values.shape == (1, 4, 6)
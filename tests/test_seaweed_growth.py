@@ -1,18 +1,34 @@
 """
 Tests the growth functions
 """
+from dataclasses import FrozenInstanceError
+
+import numpy as np
 import pandas as pd
 import pytest
 
 from src.model.seaweed_growth import (
+    DEFAULT_PARAMETERS,
+    FACTOR_NAMES,
+    GrowthParameters,
+    ammonium_subfactor,
+    calculate_factors_into,
     calculate_illumination_factor,
     calculate_nutrient_factor,
     calculate_salinity_factor,
     calculate_temperature_factor,
     growth_factor_combination,
+    growth_factor_combination_array,
     growth_factor_combination_single_value,
+    growth_rate_ensemble,
+    illumination_array,
     illumination_single_value,
+    nitrate_subfactor,
+    nutrient_array,
+    phosphate_subfactor,
+    salinity_array,
     salinity_single_value,
+    temperature_array,
     temperature_single_value,
 )
 
@@ -165,3 +181,220 @@ def test_calculate_salinity_factor_unreasonable_values():
         calculate_salinity_factor(
             create_test_dataframe_non_reasonable_values()["salinity"]
         )
+
+
+def create_test_array_with_nan(lower, upper, shape=(20, 30)):
+    """
+    Creates a two dimensional array of random values between lower and upper,
+    including the edges of the range and some nan values
+    """
+    rng = np.random.default_rng(42)
+    values = rng.uniform(lower, upper, size=shape)
+    values[0, :3] = [lower, upper, np.nan]
+    values[rng.random(shape) < 0.1] = np.nan
+    return values
+
+
+def apply_single_value(function, *arrays):
+    """
+    Applies a single value function to every element of the arrays
+    """
+    return np.vectorize(function, otypes=[float])(*arrays)
+
+
+def test_array_functions_match_single_value():
+    """
+    Tests that the array functions give the same results as the
+    single value functions, which are the reference implementation
+    """
+    for array_function, single_value_function, lower, upper in [
+        (illumination_array, illumination_single_value, 0, 1361),
+        (temperature_array, temperature_single_value, -20, 50),
+        (salinity_array, salinity_single_value, 0, 100),
+    ]:
+        values = create_test_array_with_nan(lower, upper)
+        result = array_function(values)
+        assert result.shape == values.shape
+        np.testing.assert_allclose(
+            result, apply_single_value(single_value_function, values), rtol=1e-14
+        )
+
+
+def test_nutrient_array_matches_single_value():
+    """
+    Tests that the nutrient array function gives the same results as the
+    subfactor functions combined with the builtin min
+    """
+    nitrate = create_test_array_with_nan(0, 20)
+    ammonium = create_test_array_with_nan(0, 5)[::-1]
+    phosphate = create_test_array_with_nan(0, 2)[:, ::-1]
+    result = nutrient_array(nitrate, ammonium, phosphate)
+    expected = apply_single_value(
+        lambda n, a, p: min(
+            nitrate_subfactor(n), ammonium_subfactor(a), phosphate_subfactor(p)
+        ),
+        nitrate,
+        ammonium,
+        phosphate,
+    )
+    np.testing.assert_array_equal(result[0], expected)
+    np.testing.assert_array_equal(result[1], nitrate_subfactor(nitrate))
+    np.testing.assert_array_equal(result[2], ammonium_subfactor(ammonium))
+    np.testing.assert_array_equal(result[3], phosphate_subfactor(phosphate))
+
+
+def test_growth_factor_combination_array_matches_single_value():
+    """
+    Tests that the array version of the growth factor combination gives the
+    same results as the single value function and fails for unreasonable values
+    """
+    factors = [create_test_array_with_nan(0, 1)[::step] for step in [1, -1]] * 2
+    factors[2] = factors[2][:, ::-1]
+    result = growth_factor_combination_array(*factors)
+    np.testing.assert_array_equal(
+        result, apply_single_value(growth_factor_combination_single_value, *factors)
+    )
+    with pytest.raises(AssertionError):
+        growth_factor_combination_array([1, 1], [1, 1], [1, 1], [0.5, 2])
+    # Unreasonable factors do not matter if another factor is nan
+    assert np.isnan(growth_factor_combination_array(np.nan, 1, 1, 2))
+
+
+def test_array_functions_unreasonable_values():
+    """
+    Tests that the array functions fail for the same values as the
+    single value functions
+    """
+    unreasonable_df = create_test_dataframe_non_reasonable_values()
+    with pytest.raises(AssertionError):
+        illumination_array(unreasonable_df["illumination"])
+    with pytest.raises(AssertionError):
+        temperature_array(unreasonable_df["temperature"])
+    with pytest.raises(AssertionError):
+        salinity_array(unreasonable_df["salinity"])
+
+
+def test_calculate_functions_keep_index():
+    """
+    Tests that the calculate functions return series with the
+    index of their input
+    """
+    test_df = create_test_dataframe_reasonable_values()
+    test_df.index = pd.date_range("2001-01-01", periods=len(test_df), freq="D")
+    salinity_factor = calculate_salinity_factor(test_df["salinity"])
+    assert salinity_factor.index.equals(test_df.index)
+    nutrient_factors = calculate_nutrient_factor(
+        test_df["nitrate"], test_df["ammonium"], test_df["phosphate"]
+    )
+    for factor in nutrient_factors:
+        assert factor.index.equals(test_df.index)
+
+
+def test_calculate_factors_into():
+    """
+    Tests that the fused calculation fills the supplied arrays with the same
+    values as the single array functions
+    """
+    environment = {
+        "salinity": create_test_array_with_nan(0, 50),
+        "temperature": create_test_array_with_nan(-5, 35),
+        "nitrate": create_test_array_with_nan(0, 20),
+        "ammonium": create_test_array_with_nan(0, 5),
+        "phosphate": create_test_array_with_nan(0, 2),
+        "illumination": create_test_array_with_nan(0, 300),
+    }
+    shape = environment["salinity"].shape
+    buffers = np.full((len(FACTOR_NAMES),) + shape, -1.0)
+    out = dict(zip(FACTOR_NAMES, buffers))
+    assert calculate_factors_into(**environment, out=out) is out
+    # The results are written into the supplied arrays
+    assert not (buffers == -1).any()
+    np.testing.assert_array_equal(
+        out["salinity_factor"], salinity_array(environment["salinity"])
+    )
+    np.testing.assert_array_equal(
+        out["temp_factor"], temperature_array(environment["temperature"])
+    )
+    np.testing.assert_array_equal(
+        out["illumination_factor"], illumination_array(environment["illumination"])
+    )
+    nutrients = nutrient_array(
+        environment["nitrate"], environment["ammonium"], environment["phosphate"]
+    )
+    for name, nutrient in zip(FACTOR_NAMES[1:5], nutrients):
+        np.testing.assert_array_equal(out[name], nutrient)
+    np.testing.assert_array_equal(
+        out["seaweed_growth_rate"],
+        growth_factor_combination_array(
+            out["illumination_factor"],
+            out["temp_factor"],
+            out["nutrient_factor"],
+            out["salinity_factor"],
+        ),
+    )
+    # The growth rate is optional, but all factors are needed
+    del out["seaweed_growth_rate"]
+    calculate_factors_into(**environment, out=out)
+    del out["temp_factor"]
+    with pytest.raises(AssertionError):
+        calculate_factors_into(**environment, out=out)
+
+
+def test_growth_parameters():
+    """
+    Tests that the single value functions use the supplied constants
+    """
+    assert DEFAULT_PARAMETERS == GrowthParameters()
+    with pytest.raises(FrozenInstanceError):
+        DEFAULT_PARAMETERS.kt1 = 1
+    parameters = GrowthParameters(temperature_lower=10, illumination_saturation=50)
+    assert temperature_single_value(20) < 1
+    assert temperature_single_value(20, parameters) == 1
+    assert illumination_single_value(30) == 1
+    assert illumination_single_value(30, parameters) < 1
+    assert nitrate_subfactor(1, GrowthParameters(kno3=1)) == 0.5
+
+
+def test_growth_rate_ensemble():
+    """
+    Tests that several sets of constants evaluated at once give the same
+    results as evaluating them one by one
+    """
+    environment = {
+        "salinity": create_test_array_with_nan(0, 50),
+        "temperature": create_test_array_with_nan(-2, 35),
+        "nitrate": create_test_array_with_nan(0, 20),
+        "ammonium": create_test_array_with_nan(0, 5),
+        "phosphate": create_test_array_with_nan(0, 2),
+        "illumination": create_test_array_with_nan(0, 300),
+    }
+    parameter_sets = [
+        DEFAULT_PARAMETERS,
+        GrowthParameters(kt1=0.02, salinity_upper=38, kpo4=0.2),
+        GrowthParameters(illumination_saturation=30, illumination_inhibition=90),
+    ]
+    ensemble = growth_rate_ensemble(
+        **environment, parameter_sets=parameter_sets, factor_names=FACTOR_NAMES
+    )
+    assert ensemble["seaweed_growth_rate"].shape == (3, 20, 30)
+    shape = environment["salinity"].shape
+    for i, parameters in enumerate(parameter_sets):
+        out = {name: np.empty(shape) for name in FACTOR_NAMES}
+        calculate_factors_into(**environment, out=out, parameters=parameters)
+        for name in FACTOR_NAMES:
+            np.testing.assert_array_equal(ensemble[name][i], out[name])
+    temperature = apply_single_value(
+        lambda t: temperature_single_value(t, parameter_sets[1]),
+        environment["temperature"],
+    )
+    np.testing.assert_allclose(ensemble["temp_factor"][1], temperature, rtol=1e-14)
+    # Chunks of one set give the same results and only the requested factors
+    chunked = growth_rate_ensemble(
+        **environment,
+        parameter_sets=parameter_sets,
+        factor_names=["seaweed_growth_rate", "nitrate_subfactor"],
+        chunk_values=1,
+    )
+    assert list(chunked) == ["seaweed_growth_rate", "nitrate_subfactor"]
+    for name in chunked:
+        np.testing.assert_array_equal(chunked[name], ensemble[name])
@@ -1,6 +1,9 @@
 """
 Test the whole model
 """
+import pandas as pd
+import pytest
+
 from src.model.seaweed_model import SeaweedModel
 
 
@@ -48,6 +51,35 @@ def test_grid_data():
     assert section_1.seaweed_growth_rate is not None
 
 
+def test_grid_data_filtered():
+    """
+    Tests that a filtered model calculates the same as the complete one
+    """
+    file = "data/interim_data/150tg/data_gridded_all_parameters_US.pkl"
+    model = SeaweedModel()
+    model.add_data_by_grid(file)
+    model.calculate_factors()
+    filtered_model = SeaweedModel()
+    filtered_model.add_data_by_grid(
+        file, bounding_box=(20, 30, 270, 290), month_range=(0, 11)
+    )
+    filtered_model.calculate_factors()
+    growth_df = filtered_model.construct_df_for_parameter("seaweed_growth_rate")
+    assert 0 < len(growth_df.columns) < 2259
+    assert list(growth_df.index) == list(range(12))
+    # The sections are labelled with the months of the grid
+    section = filtered_model.sections[next(iter(filtered_model.sections))]
+    assert list(section.section_df.index) == list(range(12))
+    expected_df = model.construct_df_for_parameter("seaweed_growth_rate")
+    pd.testing.assert_frame_equal(growth_df, expected_df.loc[0:11, growth_df.columns])
+    # Without all parameters, only the data can be used
+    partial_model = SeaweedModel()
+    partial_model.add_data_by_grid(file, variables=["temperature"])
+    assert partial_model.construct_df_for_parameter("temperature").shape == (36, 2259)
+    with pytest.raises(AssertionError):
+        partial_model.calculate_factors()
+
+
 def test_calculating_factors_lme():
     """
     Test the calculation of factors
@@ -65,6 +97,28 @@ def test_calculating_factors_lme():
     assert section_1.temp_factor is not None
 
 
+def test_lme_parallel():
+    """
+    Tests that running the stages in worker processes gives the same result
+    """
+    models = []
+    for n_jobs in [1, 2]:
+        model = SeaweedModel()
+        model.add_data_by_lme(
+            [i for i in range(1, 5 + 1)],
+            "data/lme_data/seaweed_environment_data_in_nuclear_war.csv",
+        )
+        model.calculate_factors(n_jobs=n_jobs)
+        model.calculate_growth_rate(n_jobs=n_jobs)
+        model.create_section_dfs(n_jobs=n_jobs)
+        models.append(model)
+    assert list(models[1].sections.keys()) == list(models[0].sections.keys())
+    for name, section in models[0].sections.items():
+        parallel_df = models[1].sections[name].section_df
+        pd.testing.assert_frame_equal(parallel_df, section.section_df)
+        assert parallel_df.name == name
+
+
 def test_calculating_growth_rate():
     """
     Test the calculation of growth rate
@@ -0,0 +1,126 @@
+"""
+Tests the sensitivity analysis
+"""
+import numpy as np
+
+from src.model.seaweed_growth import (
+    ammonium_subfactor,
+    growth_factor_combination_single_value,
+    illumination_single_value,
+    nitrate_subfactor,
+    phosphate_subfactor,
+    salinity_single_value,
+    temperature_single_value,
+)
+from src.processing.sensitivity import (
+    GROWTH_MODEL_PROBLEM,
+    base_samples,
+    evaluate_model,
+    growth_model_array,
+    run_sobol_analysis,
+    saltelli_sample,
+    sobol_indices,
+)
+
+ISHIGAMI_PROBLEM = {
+    "num_vars": 3,
+    "names": ["x1", "x2", "x3"],
+    "bounds": [[-np.pi, np.pi]] * 3,
+}
+
+
+def ishigami(samples):
+    """
+    The Ishigami function, for which the Sobol indices are known analytically
+    """
+    return (
+        np.sin(samples[:, 0])
+        + 7 * np.sin(samples[:, 1]) ** 2
+        + 0.1 * samples[:, 2] ** 4 * np.sin(samples[:, 0])
+    )
+
+
+def growth_model_single_value(
+    nitrate, phosphate, ammonium, salinity, temperature, illumination
+):
+    """
+    The growth model for a single set of inputs, used as reference
+    """
+    nutrient_factor = min(
+        nitrate_subfactor(nitrate),
+        phosphate_subfactor(phosphate),
+        ammonium_subfactor(ammonium),
+    )
+    return growth_factor_combination_single_value(
+        illumination_single_value(illumination),
+        temperature_single_value(temperature),
+        nutrient_factor,
+        salinity_single_value(salinity),
+    )
+
+
+def test_growth_model_array():
+    """
+    Tests that the vectorized model gives the same results as the single values
+    """
+    samples = saltelli_sample(GROWTH_MODEL_PROBLEM, 50, seed=1)
+    assert samples.shape == (50 * 14, 6)
+    expected = [growth_model_single_value(*row) for row in samples]
+    np.testing.assert_allclose(growth_model_array(samples), expected, rtol=1e-14)
+
+
+def test_saltelli_sample():
+    """
+    Tests that the samples have the same order as the ones of SALib
+    """
+    a, b = base_samples(ISHIGAMI_PROBLEM, 8, seed=2)
+    assert (a >= -np.pi).all() and (b <= np.pi).all()
+    samples = saltelli_sample(ISHIGAMI_PROBLEM, 8, seed=2).reshape(8, 8, 3)
+    np.testing.assert_array_equal(samples[:, 0], a)
+    np.testing.assert_array_equal(samples[:, -1], b)
+    # AB_2 is A with the second column of B, BA_2 the other way around
+    np.testing.assert_array_equal(samples[:, 2, [0, 2]], a[:, [0, 2]])
+    np.testing.assert_array_equal(samples[:, 2, 1], b[:, 1])
+    np.testing.assert_array_equal(samples[:, 5, [0, 2]], b[:, [0, 2]])
+    np.testing.assert_array_equal(samples[:, 5, 1], a[:, 1])
+    first_order = saltelli_sample(ISHIGAMI_PROBLEM, 8, calc_second_order=False, seed=2)
+    assert first_order.shape == (8 * 5, 3)
+
+
+def test_sobol_indices_ishigami():
+    """
+    Tests the indices against the analytical values for the Ishigami function
+    """
+    outputs = ishigami(saltelli_sample(ISHIGAMI_PROBLEM, 2**13, seed=3))
+    results = sobol_indices(ISHIGAMI_PROBLEM, outputs, num_resamples=50, seed=3)
+    np.testing.assert_allclose(results["S1"], [0.3139, 0.4424, 0], atol=0.03)
+    np.testing.assert_allclose(results["ST"], [0.5576, 0.4424, 0.2437], atol=0.03)
+    assert abs(results["S2"][0, 2] - 0.2437) < 0.05
+    assert np.isnan(results["S2"][2, 0])
+    assert (results["S1_conf"] > 0).all()
+    assert (results["S1_conf"] < 0.05).all()
+    without_second_order = sobol_indices(
+        ISHIGAMI_PROBLEM,
+        ishigami(saltelli_sample(ISHIGAMI_PROBLEM, 2**13, False, seed=3)),
+        calc_second_order=False,
+        num_resamples=0,
+    )
+    assert "S2" not in without_second_order
+    assert np.isnan(without_second_order["ST_conf"]).all()
+
+
+def test_run_sobol_analysis():
+    """
+    Tests that the chunks and the worker processes do not change the results
+    """
+    a, b = base_samples(GROWTH_MODEL_PROBLEM, 1000, seed=4)
+    outputs = evaluate_model(a, b, chunk_size=300)
+    np.testing.assert_array_equal(
+        outputs.reshape(-1),
+        growth_model_array(saltelli_sample(GROWTH_MODEL_PROBLEM, 1000, seed=4)),
+    )
+    results = run_sobol_analysis(n=1000, num_resamples=20, seed=4, chunk_size=300)
+    parallel_results = run_sobol_analysis(n=1000, num_resamples=20, seed=4, n_jobs=2)
+    for name in ["S1", "S1_conf", "ST", "ST_conf", "S2", "S2_conf"]:
+        np.testing.assert_allclose(parallel_results[name], results[name], rtol=1e-12)
+    assert results["names"] == GROWTH_MODEL_PROBLEM["names"]
@@ -0,0 +1,72 @@
+"""
+Tests applying the plot style from the local copy
+"""
+import os
+import subprocess
+import sys
+
+import matplotlib
+import pytest
+
+from src.plotting.style import download_style, use_style
+
+
+def test_use_style(tmp_path):
+    """
+    Tests that the style sheet is applied once and that a missing style
+    sheet only gives a warning
+    """
+    file = str(tmp_path / "test.mplstyle")
+    with open(file, "w") as handle:
+        handle.write("lines.linewidth: 7.5\n")
+    with matplotlib.rc_context():
+        assert use_style(file)
+        assert matplotlib.rcParams["lines.linewidth"] == 7.5
+        hits = use_style.cache_info().hits
+        assert use_style(file)
+        assert use_style.cache_info().hits == hits + 1
+    with pytest.warns(UserWarning, match="does not exist"):
+        assert not use_style(str(tmp_path / "missing.mplstyle"))
+
+
+def test_download_style(tmp_path):
+    """
+    Tests that the style sheet is saved as the local copy, with a file URL
+    standing in for the server
+    """
+    source = tmp_path / "source.mplstyle"
+    source.write_text("lines.linewidth: 3.5\n")
+    file = str(tmp_path / "downloaded.mplstyle")
+    download_style(file, source.as_uri())
+    with open(file) as handle:
+        assert handle.read() == "lines.linewidth: 3.5\n"
+    # No temporary file is left behind
+    assert sorted(os.listdir(tmp_path)) == ["downloaded.mplstyle", "source.mplstyle"]
+
+
+def test_import_without_side_effects():
+    """
+    Tests that importing the postprocessing and the plots neither connects
+    to the network nor applies the style
+    """
+    code = (
+        "import socket\n"
+        "def connect(*args):\n"
+        "    raise OSError('no network')\n"
+        "socket.socket.connect = connect\n"
+        "socket.create_connection = connect\n"
+        "import src.processing.postprocessing\n"
+        "import src.plotting.plotter_grid\n"
+        "import src.plotting.plotter_lme\n"
+        "import src.plotting.plotter_methods\n"
+        "from src.plotting.style import use_style\n"
+        "assert use_style.cache_info().currsize == 0\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-W", "error", "-c", code],
+        cwd=root,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr